@@ -0,0 +1,139 @@
+# app/ann_index.py
+"""
+Índices aproximados (ANN) de FAISS construidos a partir del índice plano.
+
+El índice plano (`index.faiss`) sigue siendo la fuente de verdad que
+`save_vectorstore` actualiza de forma incremental. A partir de sus vectores se
+construye, si se pide, un índice IVF-Flat, IVF-PQ o HNSW que se guarda en
+`index.ann.faiss` con su configuración en `ann.json`. Las posiciones son las
+mismas en ambos índices, así que el docstore se comparte.
+"""
+
+import os
+import json
+import math
+
+import numpy as np
+import faiss
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+ANN_INDEX_NAME = "index.ann.faiss"
+ANN_META_NAME = "ann.json"
+
+DEFAULT_PARAMS = {
+    "ivf_flat": {"nlist": None, "nprobe": 8},
+    "ivf_pq": {"nlist": None, "nprobe": 8, "m": None, "nbits": 8},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 64},
+}
+
+# FAISS recomienda al menos ~39 puntos de entrenamiento por centroide
+_POINTS_PER_CENTROID = 39
+_MAX_TRAIN_POINTS = 100_000
+_ADD_BLOCK = 65536
+
+
+def resolve_params(index_type, n, d, params=None):
+    """Completa los parámetros por defecto y los ajusta al tamaño del corpus."""
+    resolved = dict(DEFAULT_PARAMS.get(index_type, {}))
+    resolved.update({k: v for k, v in (params or {}).items() if v is not None})
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = resolved["nlist"] or int(4 * math.sqrt(n))
+        resolved["nlist"] = max(1, min(nlist, n // _POINTS_PER_CENTROID or 1))
+        resolved["nprobe"] = min(resolved["nprobe"], resolved["nlist"])
+    if index_type == "ivf_pq":
+        m = resolved["m"] or next(c for c in (64, 48, 32, 16, 8, 4, 2, 1) if d % c == 0)
+        if d % m:
+            raise ValueError(f"m={m} debe dividir la dimensión {d}")
+        resolved["m"] = m
+        # Cada subcuantizador necesita al menos 2**nbits puntos de entrenamiento
+        resolved["nbits"] = max(1, min(resolved["nbits"], int(math.log2(max(2, n // _POINTS_PER_CENTROID)))))
+    return resolved
+
+
+def new_index(index_type, d, metric, params):
+    if index_type == "flat":
+        return faiss.IndexFlat(d, metric)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, params["M"], metric)
+        index.hnsw.efConstruction = params["efConstruction"]
+        return index
+    quantizer = faiss.IndexFlat(d, metric)
+    if index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, d, params["nlist"], metric)
+    if index_type == "ivf_pq":
+        return faiss.IndexIVFPQ(quantizer, d, params["nlist"], params["m"], params["nbits"], metric)
+    raise ValueError(f"Tipo de índice no soportado: {index_type}. Opciones: {', '.join(INDEX_TYPES)}")
+
+
+def set_search_params(index, params):
+    """Aplica nprobe (IVF) o efSearch (HNSW) a un índice ya cargado."""
+    if "nprobe" in params:
+        try:
+            faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+        except RuntimeError:
+            pass
+    if "efSearch" in params and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = params["efSearch"]
+
+
+def build_ann_index(flat_index, index_type, params=None, seed=1234):
+    """Construye un índice ANN con los mismos vectores (y posiciones) que `flat_index`."""
+    n, d = flat_index.ntotal, flat_index.d
+    params = resolve_params(index_type, n, d, params)
+    index = new_index(index_type, d, flat_index.metric_type, params)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, size=min(n, _MAX_TRAIN_POINTS), replace=False))
+        train = np.vstack([flat_index.reconstruct(int(i)) for i in sample]) if len(sample) < n \
+            else flat_index.reconstruct_n(0, n)
+        index.train(train)
+
+    for start in range(0, n, _ADD_BLOCK):
+        index.add(flat_index.reconstruct_n(start, min(_ADD_BLOCK, n - start)))
+    set_search_params(index, params)
+    return index, params
+
+
+def save_ann_index(index, index_type, params, persist_path):
+    tmp_path = os.path.join(persist_path, ANN_INDEX_NAME + ".tmp")
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, os.path.join(persist_path, ANN_INDEX_NAME))
+    with open(os.path.join(persist_path, ANN_META_NAME), "w", encoding="utf-8") as f:
+        json.dump({"index_type": index_type, "params": params, "ntotal": index.ntotal}, f, indent=2)
+
+
+def remove_ann_index(persist_path):
+    for name in (ANN_INDEX_NAME, ANN_META_NAME):
+        path = os.path.join(persist_path, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def load_ann_index(persist_path, search_params=None, mmap=False):
+    """Devuelve (índice, meta) o (None, None) si no hay índice ANN guardado."""
+    meta_path = os.path.join(persist_path, ANN_META_NAME)
+    if not os.path.exists(meta_path):
+        return None, None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    index = faiss.read_index(os.path.join(persist_path, ANN_INDEX_NAME), flags)
+    set_search_params(index, {**meta["params"], **(search_params or {})})
+    return index, meta
+
+
+def parse_index_spec(spec):
+    """'ivf_flat:nlist=64,nprobe=8' -> ('ivf_flat', {'nlist': 64, 'nprobe': 8})"""
+    index_type, _, raw = spec.partition(":")
+    params = {}
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Tipo de índice no soportado: {index_type}. Opciones: {', '.join(INDEX_TYPES)}")
+    allowed = DEFAULT_PARAMS.get(index_type, {})
+    for item in filter(None, raw.split(",")):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if key not in allowed:
+            raise ValueError(f"Parámetro desconocido para {index_type}: {key!r}. Opciones: {', '.join(allowed)}")
+        params[key] = int(value)
+    return index_type, params
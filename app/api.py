@@ -0,0 +1,192 @@
+# app/api.py
+"""
+Servicio HTTP async de consultas sobre la cadena RAG.
+
+El índice (`load_vectorstore_from_disk`) y la cadena (`build_chain`) se cargan
+una vez al iniciar el proceso. Las llamadas a OpenAI (embeddings de la
+pregunta y chat) comparten clientes httpx con pool de conexiones, y las
+invocaciones en vuelo se limitan con `API_MAX_CONCURRENCY`. Las preguntas
+simultáneas se recuperan en micro-lotes y las idénticas en vuelo comparten
+una sola generación (app/micro_batch.py). Las preguntas sin historial parecidas
+a una ya respondida salen de la caché semántica (app/semantic_cache.py).
+
+Endpoints:
+    GET  /health   estado del índice cargado
+    POST /query    {"question", "chat_history": [[pregunta, respuesta], ...], "stream": false}
+                   -> {"answer", "sources", "latency", "stages", "cached"}
+                   con "stream": true responde Server-Sent Events: eventos `token`
+                   ({"token"}) y al final `done` ({"answer", "sources", ...}) o `error`
+    GET  /metrics  p50/p95/p99 por etapa de las últimas consultas del proceso
+    GET  /metrics/batching  tamaño medio de los lotes de recuperación y solicitudes unificadas
+    GET  /metrics/cache     aciertos, latencia ahorrada y falsos aciertos auditados de la caché semántica
+
+Uso:
+    uvicorn app.api:app --host 0.0.0.0 --port 8000 --workers 4
+    (con VECTORSTORE_MMAP=1 los workers comparten el índice en memoria)
+"""
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.rag_pipeline import (
+    VECTOR_DIR, RETRIEVAL_MICRO_BATCH, get_embeddings, load_vectorstore_from_disk, build_chain, astream_answer,
+)
+from app.micro_batch import BatchingRetriever, InflightCoalescer, close_batching, coalesce_key
+from app.semantic_cache import get_semantic_cache
+from app.tracing import StageTracer, get_chat_histogram
+
+load_dotenv()
+
+API_VECTOR_DIR = os.getenv("API_VECTOR_DIR", VECTOR_DIR)
+API_PROMPT_VERSION = os.getenv("API_PROMPT_VERSION", os.getenv("PROMPT_VERSION", "v1_asistente_creg_didactico"))
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", 32))
+API_HTTP_MAX_CONNECTIONS = int(os.getenv("API_HTTP_MAX_CONNECTIONS", 100))
+API_HTTP_TIMEOUT = float(os.getenv("API_HTTP_TIMEOUT", 60))
+API_COALESCE = os.getenv("API_COALESCE", "1") == "1"
+SOURCE_SNIPPET_CHARS = 300
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(min_length=1)
+    chat_history: list[tuple[str, str]] = []
+    stream: bool = False
+
+
+def http_clients(max_connections=API_HTTP_MAX_CONNECTIONS, timeout=API_HTTP_TIMEOUT):
+    """(httpx.Client, httpx.AsyncClient) con keep-alive, compartidos por embeddings y chat."""
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.Client(limits=limits, timeout=timeout), httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+def format_sources(documents):
+    return [{
+        "id": doc.id,
+        "source": os.path.basename(str(doc.metadata.get("source", ""))),
+        "page": doc.metadata.get("page"),
+        "snippet": doc.page_content[:SOURCE_SNIPPET_CHARS],
+    } for doc in documents or []]
+
+
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def create_app(chain=None, persist_path=API_VECTOR_DIR, prompt_version=API_PROMPT_VERSION,
+               max_concurrency=API_MAX_CONCURRENCY, coalesce=API_COALESCE, answer_cache=None):
+    """Aplicación FastAPI; con `chain` se usan esa cadena y `answer_cache` en lugar de cargar el índice (pruebas)."""
+
+    @asynccontextmanager
+    async def lifespan(app):
+        clients = None
+        if chain is None:
+            clients = http_clients()
+            start = time.perf_counter()
+            vectordb = load_vectorstore_from_disk(persist_path, embeddings=get_embeddings(*clients))
+            app.state.chain = build_chain(vectordb, prompt_version=prompt_version, streaming=True,
+                                          return_sources=True, http_client=clients[0], http_async_client=clients[1],
+                                          micro_batch=RETRIEVAL_MICRO_BATCH)
+            app.state.n_chunks = len(vectordb.index_to_docstore_id)
+            app.state.answer_cache = get_semantic_cache(persist_path)
+            print(f"📦 Índice {persist_path} cargado: {app.state.n_chunks} chunks "
+                  f"({time.perf_counter() - start:.1f}s)")
+        else:
+            app.state.chain = chain
+            app.state.n_chunks = None
+            app.state.answer_cache = answer_cache
+        app.state.limit = asyncio.Semaphore(max_concurrency)
+        app.state.coalescer = InflightCoalescer()
+        try:
+            yield
+        finally:
+            if clients:
+                close_batching(app.state.chain)
+                clients[0].close()
+                await clients[1].aclose()
+
+    app = FastAPI(title="Asistente CREG", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "index": persist_path, "n_chunks": app.state.n_chunks,
+                "prompt_version": prompt_version}
+
+    @app.get("/metrics")
+    async def metrics():
+        return get_chat_histogram().percentiles()
+
+    @app.get("/metrics/batching")
+    async def batching():
+        retriever = getattr(app.state.chain, "retriever", None)
+        return {"retrieval": retriever.batcher.stats() if isinstance(retriever, BatchingRetriever) else None,
+                "coalescing": dict(app.state.coalescer.stats)}
+
+    @app.get("/metrics/cache")
+    async def cache_metrics():
+        cache = app.state.answer_cache
+        if cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **cache.stats(), "recent_false_hits": cache.false_hits()}
+
+    def start_generation(query):
+        tracer, result = StageTracer(), {}
+        inputs = {"question": query.question, "chat_history": list(query.chat_history)}
+
+        async def tokens():
+            async with app.state.limit:
+                async for token in astream_answer(app.state.chain, inputs, tracer, result,
+                                                cache=app.state.answer_cache):
+                    yield token
+            get_chat_histogram().record(tracer.metrics())
+
+        return tokens(), (tracer, result)
+
+    async def answer_events(request, query):
+        start = time.perf_counter()
+        # Preguntas idénticas en vuelo comparten una sola generación (API_COALESCE=0 lo desactiva)
+        key = coalesce_key(query.question, query.chat_history) if coalesce else object()
+        shared, leader = app.state.coalescer.join(key, lambda: start_generation(query))
+        try:
+            async for token in shared.subscribe():
+                if await request.is_disconnected():
+                    return
+                yield "token", {"token": token}
+        except Exception as error:
+            yield "error", {"error": f"{type(error).__name__}: {error}"}
+            return
+        tracer, result = shared.context
+        yield "done", {"answer": result["answer"], "sources": format_sources(result.get("source_documents")),
+                       "latency": time.perf_counter() - start, "stages": tracer.metrics(), "coalesced": not leader,
+                       "cached": "cached_question" in result}
+
+    @app.post("/query")
+    async def query(request: Request, body: QueryRequest):
+        events = answer_events(request, body)
+        if body.stream:
+            async def stream():
+                async for event, payload in events:
+                    yield sse(event, payload)
+            return StreamingResponse(stream(), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+        async for event, payload in events:
+            if event == "error":
+                raise HTTPException(status_code=502, detail=payload["error"])
+            if event == "done":
+                return payload
+        raise HTTPException(status_code=499, detail="Cliente desconectado")
+
+    return app
+
+
+app = create_app()
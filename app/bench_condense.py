@@ -0,0 +1,131 @@
+# app/bench_condense.py
+"""
+Benchmark de estrategias de condensación en conversaciones de varios turnos.
+
+Cada sesión tiene tres turnos armados con las preguntas del dataset: una
+pregunta, un seguimiento que depende de ella ("¿Y a quién aplica?", ...) y la
+siguiente pregunta del dataset, que se entiende sola aunque haya historial.
+Para cada estrategia (app/condense.py) se corre la misma conversación y se
+registra por turno la latencia total, la de condensación y sus tokens.
+
+Con LLM_CACHE=1 las repeticiones salen de la caché de LLM y las latencias no
+son representativas; conviene correrlo con LLM_CACHE=0.
+
+Uso:
+    LLM_CACHE=0 python app/bench_condense.py --sessions 4 --strategies none heuristic small llm
+"""
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import argparse
+
+import numpy as np
+import mlflow
+from dotenv import load_dotenv
+
+from app.rag_pipeline import VECTOR_DIR, build_chain, load_vectorstore_from_disk
+from app.condense import CONDENSE_STRATEGIES, CONDENSE_MODEL
+from app.llm_cache import get_llm_cache
+from app.tracing import StageTracer
+
+load_dotenv()
+
+DATASET_PATH = "tests/eval_dataset_creg.json"
+FOLLOW_UPS = ("¿Y a quién aplica?", "¿Podrías resumirlo en una frase?", "¿Qué más establece sobre eso?")
+
+
+def build_sessions(questions, n_sessions):
+    """[[(tipo, pregunta), ...]] con turnos first, follow_up y new_topic."""
+    return [[("first", questions[i % len(questions)]),
+             ("follow_up", FOLLOW_UPS[i % len(FOLLOW_UPS)]),
+             ("new_topic", questions[(i + 1) % len(questions)])]
+            for i in range(n_sessions)]
+
+
+def run_sessions(chain, sessions):
+    """Métricas de StageTracer por turno, con la sesión, el turno y su tipo."""
+    turns = []
+    for session, session_turns in enumerate(sessions):
+        history = []
+        for turn, (kind, question) in enumerate(session_turns):
+            tracer = StageTracer()
+            result = chain.invoke({"question": question, "chat_history": history}, config={"callbacks": [tracer]})
+            history = history + [(question, result["answer"])]
+            turns.append({"session": session, "turn": turn, "kind": kind, **tracer.metrics()})
+    return turns
+
+
+def summarize(turns):
+    """Agregados de los turnos con historial (los únicos que pueden condensar)."""
+    with_history = [t for t in turns if t["turn"] > 0]
+    total = [t.get("total_latency", 0.0) for t in with_history]
+    condensed = [t for t in with_history if t.get("condense_llm_calls")]
+    return {
+        "turns_with_history": len(with_history),
+        "condense_calls": sum(t.get("condense_llm_calls", 0) for t in with_history),
+        "condense_skip_rate": 1 - len(condensed) / len(with_history) if with_history else 0.0,
+        "condense_latency_mean": float(np.mean([t.get("condense_latency", 0.0) for t in with_history])),
+        "condense_total_tokens": sum(t.get("condense_total_tokens", 0) for t in with_history),
+        "condense_cost_usd": sum(t.get("condense_cost_usd", 0.0) for t in with_history),
+        "turn_latency_p50": float(np.percentile(total, 50)),
+        "turn_latency_p95": float(np.percentile(total, 95)),
+        "follow_up_condensed_rate": float(np.mean([bool(t.get("condense_llm_calls"))
+                                                   for t in with_history if t["kind"] == "follow_up"])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de estrategias de condensación de preguntas")
+    parser.add_argument("--persist-path", default=VECTOR_DIR)
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--prompt-version", default="v1_asistente_creg_didactico")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--strategies", nargs="+", default=list(CONDENSE_STRATEGIES), choices=CONDENSE_STRATEGIES)
+    args = parser.parse_args()
+    if args.sessions < 1:
+        parser.error("--sessions debe ser al menos 1")
+
+    with open(args.dataset) as f:
+        questions = [pair["question"] for pair in json.load(f)]
+    sessions = build_sessions(questions, args.sessions)
+    vectordb = load_vectorstore_from_disk(args.persist_path)
+    if get_llm_cache() is not None:
+        print("⚠️  LLM_CACHE activa: las llamadas repetidas salen de la caché (usa LLM_CACHE=0)")
+
+    print("="*80)
+    print(f"💬 {len(sessions)} sesiones de {len(sessions[0])} turnos, estrategias: {', '.join(args.strategies)}")
+    print("="*80)
+
+    mlflow.set_experiment("condense_strategies")
+    summaries = {}
+    for strategy in args.strategies:
+        chain = build_chain(vectordb, prompt_version=args.prompt_version, condense=strategy)
+        turns = run_sessions(chain, sessions)
+        summaries[strategy] = summary = summarize(turns)
+        with mlflow.start_run(run_name=f"condense_{strategy}"):
+            mlflow.log_param("condense_strategy", strategy)
+            mlflow.log_param("condense_model", CONDENSE_MODEL if strategy == "small" else "")
+            mlflow.log_param("n_sessions", len(sessions))
+            for step, turn in enumerate(turns):
+                mlflow.log_metric("turn_latency", turn.get("total_latency", 0.0), step=step)
+                mlflow.log_metric("turn_condense_latency", turn.get("condense_latency", 0.0), step=step)
+                mlflow.log_metric("turn_condense_tokens", turn.get("condense_total_tokens", 0), step=step)
+            mlflow.log_metrics(summary)
+            mlflow.log_dict({"turns": turns}, "turns.json")
+
+    print(f"\n{'estrategia':<11} {'llamadas':>9} {'omitidas':>9} {'cond. s':>8} {'tokens':>7} "
+          f"{'p50 s':>7} {'p95 s':>7} {'seguim.':>8}")
+    print("-"*80)
+    for strategy, s in summaries.items():
+        print(f"{strategy:<11} {s['condense_calls']:>9} {s['condense_skip_rate']:>9.0%} "
+              f"{s['condense_latency_mean']:>8.3f} {s['condense_total_tokens']:>7} {s['turn_latency_p50']:>7.2f} "
+              f"{s['turn_latency_p95']:>7.2f} {s['follow_up_condensed_rate']:>8.0%}")
+    print("="*80)
+    print("📂 Resultados registrados en MLflow (experimento condense_strategies)")
+    print("   'seguim.' = seguimientos que sí se condensaron (con `heuristic` debería ser 100%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark de índices ANN: recall@k contra el índice plano y latencia p50/p99.
+
+Usa las preguntas de tests/eval_dataset_creg.json como consultas. Cada
+configuración se construye en memoria a partir del índice plano guardado.
+
+Uso:
+    python app/benchmark_index.py --k 4 \\
+        --index ivf_flat:nprobe=4 --index ivf_flat:nprobe=16 \\
+        --index ivf_pq:nprobe=8 --index hnsw:efSearch=32
+"""
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import argparse
+
+import numpy as np
+import mlflow
+from dotenv import load_dotenv
+from langchain_community.vectorstores import FAISS
+
+from app.rag_pipeline import VECTOR_DIR, get_embeddings
+from app.ann_index import build_ann_index, parse_index_spec
+
+load_dotenv()
+
+DATASET_PATH = "tests/eval_dataset_creg.json"
+
+
+def measure(index, queries, k, repeat):
+    """Devuelve (ids top-k por consulta, latencias en ms de búsquedas individuales)."""
+    _, ids = index.search(queries, k)
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query[None, :], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return ids, np.array(latencies)
+
+
+def recall_at_k(ids, truth):
+    hits = sum(len(set(row[row >= 0]) & set(ref[ref >= 0])) for row, ref in zip(ids, truth))
+    return hits / max(1, sum(len(ref[ref >= 0]) for ref in truth))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de índices FAISS (recall@k y latencia)")
+    parser.add_argument("--persist-path", default=VECTOR_DIR)
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=50, help="Repeticiones por consulta para la latencia")
+    parser.add_argument("--index", action="append", dest="specs",
+                        help="Configuración tipo[:param=valor,...]; se puede repetir")
+    args = parser.parse_args()
+    specs = args.specs or ["ivf_flat", "ivf_pq", "hnsw"]
+
+    with open(args.dataset) as f:
+        questions = [pair["question"] for pair in json.load(f)]
+
+    embeddings = get_embeddings()
+    vectordb = FAISS.load_local(args.persist_path, embeddings, allow_dangerous_deserialization=True)
+    flat = vectordb.index
+    queries = np.array(embeddings.embed_documents(questions), dtype=np.float32)
+
+    print("="*80)
+    print(f"📐 Benchmark de índices: {flat.ntotal} vectores, d={flat.d}, {len(questions)} preguntas, k={args.k}")
+    print("="*80)
+
+    truth, flat_latencies = measure(flat, queries, args.k, args.repeat)
+    results = [("flat", {}, 1.0, flat_latencies, 0.0)]
+
+    for spec in specs:
+        index_type, params = parse_index_spec(spec)
+        start = time.perf_counter()
+        index, resolved = build_ann_index(flat, index_type, params)
+        build_seconds = time.perf_counter() - start
+        ids, latencies = measure(index, queries, args.k, args.repeat)
+        results.append((index_type, resolved, recall_at_k(ids, truth), latencies, build_seconds))
+
+    mlflow.set_experiment("index_benchmark")
+    print(f"\n{'índice':<10} {'parámetros':<42} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8}")
+    print("-"*90)
+    for index_type, params, recall, latencies, build_seconds in results:
+        p50, p99 = np.percentile(latencies, [50, 99])
+        label = ",".join(f"{k}={v}" for k, v in params.items())
+        print(f"{index_type:<10} {label:<42} {recall:>9.3f} {p50:>8.3f} {p99:>8.3f} {build_seconds:>8.2f}")
+        with mlflow.start_run(run_name=f"bench_{index_type}"):
+            mlflow.log_param("index_type", index_type)
+            for name, value in params.items():
+                mlflow.log_param(f"index_{name}", value)
+            mlflow.log_param("k", args.k)
+            mlflow.log_param("n_vectors", flat.ntotal)
+            mlflow.log_metric("recall_at_k", recall)
+            mlflow.log_metric("latency_p50_ms", p50)
+            mlflow.log_metric("latency_p99_ms", p99)
+            mlflow.log_metric("build_seconds", build_seconds)
+
+    print("="*80)
+    print("📂 Resultados registrados en MLflow (experimento index_benchmark)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# app/condense.py
+"""
+Estrategias de condensación de la pregunta con el historial del chat.
+
+`ConversationalRetrievalChain` reformula cada pregunta de seguimiento con una
+llamada extra al LLM antes de recuperar. `build_chain(..., condense=...)`
+elige cuándo y con qué modelo:
+
+- none:      nunca; la pregunta se recupera y responde tal cual,
+- heuristic: solo si la pregunta no se entiende sola (ver `is_standalone`),
+- small:     siempre, con un modelo más rápido (`CONDENSE_MODEL`),
+- llm:       siempre, con el mismo modelo de la respuesta (comportamiento original).
+
+Cuando se omite la condensación la cadena recibe el historial vacío, así que
+no hay etapa `condense` en las métricas de StageTracer.
+"""
+
+import os
+import re
+
+from langchain_classic.chains import ConversationalRetrievalChain
+
+CONDENSE_STRATEGIES = ("none", "heuristic", "small", "llm")
+CONDENSE_STRATEGY = os.getenv("CONDENSE_STRATEGY", "llm")
+CONDENSE_MODEL = os.getenv("CONDENSE_MODEL", "gpt-4o-mini")
+
+# La pregunta nombra su tema: resolución, ley, número de norma, ...
+EXPLICIT_REFERENCE = re.compile(r"\b(resoluci[oó]n|creg|ley|decreto|circular|acuerdo)\b|\d{2,}", re.IGNORECASE)
+# Preguntas de definición: "¿Qué es el Mercado de Energía Mayorista?"
+DEFINITION = re.compile(r"^\W*(qu[eé] (es|son|significa)|defin[ae])\b", re.IGNORECASE)
+# La pregunta continúa la anterior o señala algo ya dicho
+FOLLOW_UP_START = re.compile(r"^\W*(y|e|o|pero|entonces|tambi[eé]n|adem[aá]s|qu[eé] m[aá]s)\b", re.IGNORECASE)
+ANAPHORA = re.compile(
+    r"\b(eso|esto|ese|esa|este|esta|esos|esas|estos|estas|aquel\w*|dich[oa]s?|mencionad[oa]s?|anterior(es)?"
+    r"|ello|ella|ellos|ellas|lo mismo|la misma|el mismo)\b", re.IGNORECASE)
+MIN_STANDALONE_WORDS = 4
+
+
+def is_standalone(question, chat_history):
+    """True si la pregunta se entiende sin el historial.
+
+    Es conservadora: solo acepta preguntas que nombran su tema (o piden una
+    definición) y no continúan ni señalan la conversación. Un falso "no"
+    cuesta una llamada de más; un falso "sí" recuperaría con una pregunta
+    incompleta.
+    """
+    if not chat_history:
+        return True
+    if len(re.findall(r"\w+", question)) < MIN_STANDALONE_WORDS:
+        return False
+    if FOLLOW_UP_START.search(question) or ANAPHORA.search(question):
+        return False
+    return bool(EXPLICIT_REFERENCE.search(question) or DEFINITION.search(question))
+
+
+class CondensingRetrievalChain(ConversationalRetrievalChain):
+    """`ConversationalRetrievalChain` que omite la condensación según `condense_strategy`."""
+
+    condense_strategy: str = "llm"
+
+    def skips_condense(self, inputs):
+        if not inputs.get("chat_history"):
+            return True
+        if self.condense_strategy == "none":
+            return True
+        return self.condense_strategy == "heuristic" and is_standalone(inputs["question"], inputs["chat_history"])
+
+    def _standalone_inputs(self, inputs):
+        return {**inputs, "chat_history": []} if self.skips_condense(inputs) else inputs
+
+    def _call(self, inputs, run_manager=None):
+        return super()._call(self._standalone_inputs(inputs), run_manager=run_manager)
+
+    async def _acall(self, inputs, run_manager=None):
+        return await super()._acall(self._standalone_inputs(inputs), run_manager=run_manager)
@@ -1,15 +1,18 @@
 # app/dashboard.py
 
-import mlflow
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import pandas as pd
 import streamlit as st
 
+from app.mlflow_queries import list_experiments, config_runs, config_results
+
 st.set_page_config(page_title="📊 Dashboard General de Evaluación", layout="wide")
 st.title("📈 Evaluación Completa del Chatbot por Pregunta")
 
 # ✅ Buscar todos los experimentos que comienzan con "eval_"
-client = mlflow.tracking.MlflowClient()
-experiments = [exp for exp in client.search_experiments() if exp.name.startswith("eval_")]
+experiments = list_experiments("eval_")
 
 if not experiments:
     st.warning("No se encontraron experimentos de evaluación.")
@@ -19,41 +22,45 @@ if not experiments:
 exp_names = [exp.name for exp in experiments]
 selected_exp_name = st.selectbox("Selecciona un experimento para visualizar:", exp_names)
 
-experiment = client.get_experiment_by_name(selected_exp_name)
-runs = client.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"])
+experiment = next(exp for exp in experiments if exp.name == selected_exp_name)
+# Una run padre por configuración, con los agregados ya calculados
+runs = config_runs(experiment.experiment_id)
 
-if not runs:
+if runs.empty:
     st.warning("No hay ejecuciones registradas en este experimento.")
     st.stop()
 
-# Convertir runs a DataFrame
-data = []
-for run in runs:
-    params = run.data.params
-    metrics = run.data.metrics
-    data.append({
-        "pregunta": params.get("question"),
-        "prompt_version": params.get("prompt_version"),
-        "chunk_size": int(params.get("chunk_size", 0)),
-        "chunk_overlap": int(params.get("chunk_overlap", 0)),
-        "lc_is_correct": metrics.get("lc_is_correct", 0)
-    })
-
-df = pd.DataFrame(data)
-
-# Mostrar tabla completa
-st.subheader("📋 Resultados individuales por pregunta")
-st.dataframe(df)
+# Una fila por configuración
+accuracy = runs.get("metrics.lc_is_correct", runs.get("metrics.qa_is_correct"))
+grouped = pd.DataFrame({
+    "run_id": runs["run_id"],
+    "inicio": runs["start_time"],
+    "prompt_version": runs.get("params.prompt_version"),
+    "chunk_size": runs.get("params.chunk_size"),
+    "chunk_overlap": runs.get("params.chunk_overlap"),
+    "k": runs.get("params.k"),
+    "model": runs.get("params.model"),
+    "promedio_correcto": accuracy,
+    "preguntas": runs.get("metrics.n_questions"),
+    "latencia_p50": runs.get("metrics.latency_p50"),
+    "latencia_p95": runs.get("metrics.latency_p95"),
+})
 
-# Agrupación para análisis
-grouped = df.groupby(["prompt_version", "chunk_size"]).agg(
-    promedio_correcto=("lc_is_correct", "mean"),
-    preguntas=("pregunta", "count")
-).reset_index()
+st.subheader("📊 Desempeño por configuración")
+st.dataframe(grouped.drop(columns=["run_id"]))
 
-st.subheader("📊 Desempeño agrupado por configuración")
-st.dataframe(grouped)
+# Gráfico (la corrida más reciente de cada configuración)
+latest = grouped.drop_duplicates(["prompt_version", "chunk_size", "chunk_overlap", "k", "model"]).copy()
+latest["config"] = latest[["prompt_version", "chunk_size", "chunk_overlap", "k", "model"]].astype(str).agg(" | ".join, axis=1)
+st.bar_chart(latest.set_index("config")["promedio_correcto"])
 
-# Gráfico
-grouped["config"] = grouped["prompt_version"] + " | " + grouped["chunk_size"].astype(str)
-st.bar_chart(grouped.set_index("config")["promedio_correcto"])
+# Resultados por pregunta de una configuración (artefacto results.parquet)
+st.subheader("📋 Resultados individuales por pregunta")
+selected_run = st.selectbox(
+    "Configuración:", grouped["run_id"].tolist(),
+    format_func=lambda run_id: " | ".join(
+        str(v) for v in grouped.loc[grouped["run_id"] == run_id,
+                                    ["prompt_version", "chunk_size", "chunk_overlap", "inicio"]].iloc[0]
+    ),
+)
+st.dataframe(config_results(experiment.experiment_id, selected_run))
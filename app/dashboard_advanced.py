@@ -4,6 +4,9 @@ Dashboard Avanzado de Evaluación - Parte 4 del Desafío
 Visualiza métricas por criterio: correctness, relevance, coherence, toxicity, harmfulness, etc.
 """
 
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import mlflow
 import pandas as pd
 import streamlit as st
@@ -11,6 +14,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from app.mlflow_queries import list_experiments, config_runs, config_results, run_metrics
+
 st.set_page_config(page_title="📊 Dashboard Avanzado - GenAIOps", layout="wide")
 
 # Header
@@ -19,7 +24,7 @@ st.markdown("---")
 
 # ✅ Buscar experimentos que comienzan con "eval_"
 client = mlflow.tracking.MlflowClient()
-experiments = [exp for exp in client.search_experiments() if exp.name.startswith("eval_")]
+experiments = list_experiments("eval_", client)
 
 if not experiments:
     st.warning("⚠️ No se encontraron experimentos de evaluación.")
@@ -30,49 +35,31 @@ st.sidebar.header("🔧 Configuración")
 exp_names = [exp.name for exp in experiments]
 selected_exp_name = st.sidebar.selectbox("📊 Selecciona un experimento:", exp_names)
 
-experiment = client.get_experiment_by_name(selected_exp_name)
-runs = client.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"])
+experiment = next(exp for exp in experiments if exp.name == selected_exp_name)
+# Una run padre por configuración: agregados en sus métricas, detalle en results.parquet
+configs = config_runs(experiment.experiment_id, client).set_index("run_id", drop=False)
 
-if not runs:
+if configs.empty:
     st.warning("⚠️ No hay ejecuciones registradas en este experimento.")
     st.stop()
 
-# Convertir runs a DataFrame con todas las métricas
-data = []
-for run in runs:
-    params = run.data.params
-    metrics = run.data.metrics
-    tags = run.data.tags
-    
-    row = {
-        "run_id": run.info.run_id,
-        "run_name": tags.get("mlflow.runName", "unknown"),
-        "pregunta": params.get("question", "N/A"),
-        "prompt_version": params.get("prompt_version", "N/A"),
-        "chunk_size": int(params.get("chunk_size", 0)),
-        "chunk_overlap": int(params.get("chunk_overlap", 0)),
-    }
-    
-    # Agregar todas las métricas disponibles
-    metric_names = [
-        "qa_is_correct",
-        "correctness_score",
-        "relevance_score", 
-        "coherence_score",
-        "toxicity_score",
-        "harmfulness_score",
-        "helpfulness_score",
-        "conciseness_score",
-        "avg_criteria_score",
-        "lc_is_correct"  # Para compatibilidad con evaluación básica
-    ]
-    
-    for metric_name in metric_names:
-        row[metric_name] = metrics.get(metric_name, None)
-    
-    data.append(row)
+selected_config = st.sidebar.selectbox(
+    "⚙️ Configuración:",
+    options=configs.index.tolist(),
+    format_func=lambda run_id: (
+        f"{configs.at[run_id, 'params.prompt_version'] if 'params.prompt_version' in configs else 'N/A'} | "
+        f"chunk {configs.at[run_id, 'params.chunk_size'] if 'params.chunk_size' in configs else '?'}/"
+        f"{configs.at[run_id, 'params.chunk_overlap'] if 'params.chunk_overlap' in configs else '?'} | "
+        f"{configs.at[run_id, 'start_time']:%Y-%m-%d %H:%M}"
+    ),
+)
+summary = run_metrics(configs.loc[selected_config])
 
-df = pd.DataFrame(data)
+df = config_results(experiment.experiment_id, selected_config, client)
+if df.empty:
+    st.warning("⚠️ La configuración seleccionada aún no tiene resultados (results.parquet).")
+    st.stop()
+df = df.rename(columns={"question": "pregunta"})
 
 # Filtrar columnas con datos
 available_metrics = [col for col in df.columns if col.endswith('_score') or col in ['qa_is_correct', 'lc_is_correct']]
@@ -86,26 +73,31 @@ st.header("📊 Resumen General")
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_questions = len(df)
+    total_questions = int(summary.get("n_questions", len(df)))
     st.metric("📝 Total Preguntas", total_questions)
 
 with col2:
-    if 'qa_is_correct' in df.columns:
-        qa_accuracy = df['qa_is_correct'].mean() * 100
+    if 'qa_is_correct' in summary:
+        qa_accuracy = summary['qa_is_correct'] * 100
         st.metric("✅ Precisión QA Básica", f"{qa_accuracy:.1f}%")
-    elif 'lc_is_correct' in df.columns:
-        qa_accuracy = df['lc_is_correct'].mean() * 100
+    elif 'lc_is_correct' in summary:
+        qa_accuracy = summary['lc_is_correct'] * 100
         st.metric("✅ Precisión QA Básica", f"{qa_accuracy:.1f}%")
 
 with col3:
-    if 'avg_criteria_score' in df.columns:
-        avg_score = df['avg_criteria_score'].mean() * 100
+    if 'avg_criteria_score' in summary:
+        avg_score = summary['avg_criteria_score'] * 100
         st.metric("🎯 Score Promedio Criterios", f"{avg_score:.1f}%")
 
 with col4:
-    if 'coherence_score' in df.columns:
-        coherence = df['coherence_score'].mean() * 100
-        st.metric("📝 Coherencia Promedio", f"{coherence:.1f}%")
+    if 'pass_rate' in summary:
+        st.metric("🏁 Tasa de Aprobación", f"{summary['pass_rate'] * 100:.1f}%")
+
+if 'latency_p50' in summary:
+    col1, col2, col3 = st.columns(3)
+    col1.metric("⏱️ Latencia p50", f"{summary['latency_p50']:.2f}s")
+    col2.metric("⏱️ Latencia p95", f"{summary['latency_p95']:.2f}s")
+    col3.metric("⏱️ Latencia p99", f"{summary['latency_p99']:.2f}s")
 
 st.markdown("---")
 
@@ -126,13 +118,13 @@ criteria_metrics = {
 }
 
 # Filtrar solo los disponibles
-available_criteria = {k: v for k, v in criteria_metrics.items() if v in df.columns and df[v].notna().any()}
+available_criteria = {k: v for k, v in criteria_metrics.items() if v in summary and v in df.columns}
 
 if available_criteria:
     # Gráfico de barras con promedios
     criteria_data = []
     for name, col in available_criteria.items():
-        avg_value = df[col].mean()
+        avg_value = summary[col]
         criteria_data.append({"Criterio": name, "Score Promedio": avg_value, "Porcentaje": avg_value * 100})
     
     criteria_df = pd.DataFrame(criteria_data)
@@ -156,7 +148,7 @@ if available_criteria:
     cols = st.columns(len(available_criteria))
     for idx, (name, col) in enumerate(available_criteria.items()):
         with cols[idx]:
-            avg_value = df[col].mean() * 100
+            avg_value = summary[col] * 100
             # Determinar color según el valor
             delta_color = "normal" if avg_value >= 70 else "inverse"
             st.metric(name, f"{avg_value:.1f}%", delta=f"{avg_value - 50:.1f}%", delta_color=delta_color)
@@ -171,7 +163,7 @@ if len(available_criteria) >= 3:
     
     # Preparar datos para radar chart
     categories = list(available_criteria.keys())
-    values = [df[col].mean() * 100 for col in available_criteria.values()]
+    values = [summary[col] * 100 for col in available_criteria.values()]
     
     fig = go.Figure()
     
@@ -0,0 +1,182 @@
+# app/docstore.py
+"""
+Docstore columnar compacto para el vectorstore.
+
+Reemplaza los `Document` serializados con pickle por:
+    texts.bin + text_offsets.npy   textos UTF-8 concatenados y sus desplazamientos
+    ids.bin + id_offsets.npy       ids de los chunks, con el mismo esquema
+    source_id.npy, page.npy,       columnas de metadatos (int32/int64, -1 = ausente)
+    start_index.npy
+    <clave>.codes.npy              otras claves por chunk, codificadas con diccionario
+    schema.json                    archivos fuente, metadatos por archivo y diccionarios
+
+Todo se abre con mmap: buscar el documento de un vector lee solo sus bytes.
+
+Es de solo lectura y solo se usa en modo servicio (VECTORSTORE_MMAP=1 o
+`load_vectorstore_from_disk(mmap=True)`); por defecto se sigue cargando el
+docstore en memoria de `index.pkl`, que es el que admite altas y bajas.
+"""
+
+import os
+import json
+import mmap
+import shutil
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+SCHEMA_NAME = "schema.json"
+_BUILTIN_KEYS = ("source", "page", "start_index")
+
+
+def _write_array(path, values, dtype):
+    with open(path, "wb") as f:
+        np.save(f, np.asarray(values, dtype=dtype))
+
+
+def write_columnar_docstore(records, path):
+    """Escribe [(id, Document)] en orden de posición dentro del directorio `path`."""
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    sources, source_index = [], {}
+    source_ids, pages, starts = [], [], []
+    text_offsets, id_offsets = [0], [0]
+    extra = {}  # clave -> lista de valores por posición (None = ausente)
+
+    with open(os.path.join(tmp_path, "texts.bin"), "wb") as texts_file, \
+            open(os.path.join(tmp_path, "ids.bin"), "wb") as ids_file:
+        for position, (doc_id, doc) in enumerate(records):
+            text = doc.page_content.encode("utf-8")
+            texts_file.write(text)
+            text_offsets.append(text_offsets[-1] + len(text))
+            raw_id = str(doc_id).encode("utf-8")
+            ids_file.write(raw_id)
+            id_offsets.append(id_offsets[-1] + len(raw_id))
+
+            metadata = doc.metadata
+            source = metadata.get("source", "")
+            if source not in source_index:
+                source_index[source] = len(sources)
+                sources.append({"source": source, "metadata": None})
+            source_ids.append(source_index[source])
+            pages.append(metadata.get("page", -1))
+            starts.append(metadata.get("start_index", -1))
+            for key, value in metadata.items():
+                if key not in _BUILTIN_KEYS:
+                    extra.setdefault(key, [None] * position)
+            for key, values in extra.items():
+                values.append(metadata.get(key))
+
+    n = len(source_ids)
+    source_ids_arr = np.asarray(source_ids, dtype=np.int32)
+
+    # Las claves constantes dentro de un archivo se guardan una sola vez por archivo
+    columns = {}
+    for key, values in extra.items():
+        per_source = {}
+        constant = True
+        for sid, value in zip(source_ids, values):
+            if per_source.setdefault(sid, value) != value:
+                constant = False
+                break
+        if constant:
+            for sid, value in per_source.items():
+                if value is not None:
+                    sources[sid]["metadata"] = sources[sid]["metadata"] or {}
+                    sources[sid]["metadata"][key] = value
+        else:
+            dictionary, codes = [], []
+            lookup = {}
+            for value in values:
+                if value is None:
+                    codes.append(-1)
+                    continue
+                token = json.dumps(value, sort_keys=True)
+                if token not in lookup:
+                    lookup[token] = len(dictionary)
+                    dictionary.append(value)
+                codes.append(lookup[token])
+            _write_array(os.path.join(tmp_path, f"{key}.codes.npy"), codes, np.int32)
+            columns[key] = dictionary
+
+    _write_array(os.path.join(tmp_path, "text_offsets.npy"), text_offsets, np.uint64)
+    _write_array(os.path.join(tmp_path, "id_offsets.npy"), id_offsets, np.uint64)
+    _write_array(os.path.join(tmp_path, "source_id.npy"), source_ids_arr, np.int32)
+    _write_array(os.path.join(tmp_path, "page.npy"), pages, np.int32)
+    _write_array(os.path.join(tmp_path, "start_index.npy"), starts, np.int64)
+    with open(os.path.join(tmp_path, SCHEMA_NAME), "w", encoding="utf-8") as f:
+        json.dump({"n": n, "sources": sources, "columns": columns}, f, ensure_ascii=False)
+
+    # El directorio viejo se reemplaza completo; los procesos que lo tienen mapeado
+    # conservan sus archivos abiertos hasta cerrarlos
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _mmap_bytes(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ColumnarDocstore(Docstore):
+    """Docstore de solo lectura indexado por la posición del vector en el índice."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, SCHEMA_NAME), encoding="utf-8") as f:
+            schema = json.load(f)
+        self.n = schema["n"]
+        self.sources = schema["sources"]
+        self._texts = _mmap_bytes(os.path.join(path, "texts.bin"))
+        self._ids = _mmap_bytes(os.path.join(path, "ids.bin"))
+        self._text_offsets = np.load(os.path.join(path, "text_offsets.npy"), mmap_mode="r")
+        self._id_offsets = np.load(os.path.join(path, "id_offsets.npy"), mmap_mode="r")
+        self.source_id = np.load(os.path.join(path, "source_id.npy"), mmap_mode="r")
+        self.page = np.load(os.path.join(path, "page.npy"), mmap_mode="r")
+        self.start_index = np.load(os.path.join(path, "start_index.npy"), mmap_mode="r")
+        self._columns = {
+            key: (dictionary, np.load(os.path.join(path, f"{key}.codes.npy"), mmap_mode="r"))
+            for key, dictionary in schema["columns"].items()
+        }
+
+    def __len__(self):
+        return self.n
+
+    def text(self, position):
+        start, end = int(self._text_offsets[position]), int(self._text_offsets[position + 1])
+        return memoryview(self._texts)[start:end].tobytes().decode("utf-8")
+
+    def chunk_id(self, position):
+        start, end = int(self._id_offsets[position]), int(self._id_offsets[position + 1])
+        return memoryview(self._ids)[start:end].tobytes().decode("utf-8")
+
+    def metadata(self, position):
+        source = self.sources[int(self.source_id[position])]
+        metadata = dict(source["metadata"] or {})
+        metadata["source"] = source["source"]
+        page = int(self.page[position])
+        if page >= 0:
+            metadata["page"] = page
+        start = int(self.start_index[position])
+        if start >= 0:
+            metadata["start_index"] = start
+        for key, (dictionary, codes) in self._columns.items():
+            code = int(codes[position])
+            if code >= 0:
+                metadata[key] = dictionary[code]
+        return metadata
+
+    def search(self, position):
+        position = int(position)
+        if not 0 <= position < self.n:
+            return f"ID {position} not found."
+        return Document(id=self.chunk_id(position), page_content=self.text(position),
+                        metadata=self.metadata(position))
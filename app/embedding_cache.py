@@ -0,0 +1,170 @@
+# app/embedding_cache.py
+"""
+Caché persistente de embeddings en SQLite.
+
+Envuelve cualquier `Embeddings` de LangChain y guarda cada vector con clave
+(modelo, sha256 del texto). Los chunks repetidos entre barridos de chunk_size
+y las preguntas repetidas en el chat no vuelven a llamar a la API.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500_000))
+
+# SQLite limita la cantidad de parámetros por consulta
+_LOOKUP_BATCH = 500
+
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _as_float32(vector):
+    # Mismo redondeo que al leer de la caché: un acierto y un fallo devuelven el mismo vector
+    return array("f", vector).tolist()
+
+
+class EmbeddingCache:
+    """Almacén (modelo, hash) -> vector con expulsión LRU acotada por tamaño."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        # Cota superior de las filas: COUNT(*) recorre la tabla, así que solo se cuenta al pasar el límite
+        self._approx_entries = self._count()
+
+    def get_many(self, model, hashes):
+        """Devuelve {hash: vector} para los hashes presentes en la caché."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, model, items):
+        """Guarda [(hash, vector)] y expulsa las entradas menos usadas si se excede el límite.
+
+        Al expulsar se baja un 10% por debajo del límite, para no volver a contar
+        la tabla en cada escritura cuando la caché está llena.
+        """
+        now = time.time()
+        rows = [(model, h, array("f", vector).tobytes(), now) for h, vector in items]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)", rows)
+            # Los reemplazos y las escrituras de otros procesos se corrigen en el conteo exacto
+            self._approx_entries += len(rows)
+            if self._approx_entries > self.max_entries:
+                entries = self._count()
+                excess = entries - (self.max_entries - self.max_entries // 10) if entries > self.max_entries else 0
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE rowid IN "
+                        "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                        (excess,),
+                    )
+                self._approx_entries = entries - excess
+            self._conn.commit()
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            entries = self._count()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Caché del proceso: una sola conexión SQLite compartida por todos los `CachedEmbeddings`."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+class CachedEmbeddings(Embeddings):
+    """`Embeddings` que consulta la caché antes de llamar al modelo subyacente."""
+
+    def __init__(self, embeddings, cache=None):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.cache = cache or get_embedding_cache()
+
+    def embed_documents(self, texts):
+        hashes = [text_sha256(text) for text in texts]
+        found = self.cache.get_many(self.model, hashes)
+
+        # Embeber cada texto faltante una sola vez aunque aparezca repetido
+        missing = {}
+        for text, h in zip(texts, hashes):
+            if h not in found and h not in missing:
+                missing[h] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_items = [(h, _as_float32(v)) for h, v in zip(missing.keys(), vectors)]
+            self.cache.put_many(self.model, new_items)
+            found.update(new_items)
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text):
+        h = text_sha256(text)
+        found = self.cache.get_many(self.model, [h])
+        if h in found:
+            return found[h]
+        vector = _as_float32(self.embeddings.embed_query(text))
+        self.cache.put_many(self.model, [(h, vector)])
+        return vector
@@ -0,0 +1,104 @@
+# app/embedding_executor.py
+"""
+Ejecutor de embeddings por lotes, concurrente y consciente de los límites de tasa.
+
+Divide los textos en lotes de tamaño configurable, los envía en paralelo sobre un
+pool de hilos acotado, respeta presupuestos de solicitudes y tokens por minuto,
+reintenta con backoff y registra el throughput obtenido.
+
+El límite de tasa y el pool de hilos de cada (modelo, proveedor) son del
+proceso (`shared_limiter_and_pool`): todas las instancias comparten la cuota.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+from app.rate_limit import RateLimiter, call_with_retry
+
+EMBED_REQUEST_BATCH = int(os.getenv("EMBED_REQUEST_BATCH", 64))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 4))
+EMBED_RPM = int(os.getenv("EMBED_RPM", 0)) or None
+EMBED_TPM = int(os.getenv("EMBED_TPM", 0)) or None
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 6))
+
+
+_shared = {}   # (modelo, proveedor) -> (RateLimiter, ThreadPoolExecutor)
+_shared_lock = threading.Lock()
+
+
+def shared_limiter_and_pool(model, provider):
+    """(RateLimiter, pool de hilos) del proceso para (modelo, proveedor)."""
+    key = (model, provider)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = (RateLimiter(EMBED_RPM, EMBED_TPM),
+                            ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix="embed"))
+        return _shared[key]
+
+
+def estimate_tokens(text):
+    # Aproximación suficiente para el presupuesto de tokens: ~4 caracteres por token
+    return max(1, len(text) // 4)
+
+
+class EmbeddingExecutor(Embeddings):
+    """`Embeddings` que reparte cada llamada en lotes concurrentes con límite de tasa."""
+
+    def __init__(self, embeddings, batch_size=EMBED_REQUEST_BATCH, max_concurrency=EMBED_CONCURRENCY,
+                 requests_per_minute=EMBED_RPM, tokens_per_minute=EMBED_TPM,
+                 max_retries=EMBED_MAX_RETRIES, limiter=None, pool=None):
+        # Con `limiter` y `pool` (ver shared_limiter_and_pool) se ignoran max_concurrency y los límites por minuto
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limiter = limiter or RateLimiter(requests_per_minute, tokens_per_minute)
+        self._pool = pool or ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "texts": 0, "tokens": 0, "retries": 0, "busy_seconds": 0.0}
+
+    def _count_retry(self, error, delay):
+        with self._lock:
+            self._stats["retries"] += 1
+
+    def _embed_batch(self, texts):
+        tokens = sum(estimate_tokens(text) for text in texts)
+        # Cada intento, también los reintentos, consume presupuesto del límite de tasa
+        vectors = call_with_retry(self.embeddings.embed_documents, texts, max_retries=self.max_retries,
+                                  on_retry=self._count_retry, before_attempt=lambda: self.limiter.acquire(tokens))
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["texts"] += len(texts)
+            self._stats["tokens"] += tokens
+        return vectors
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        start = time.perf_counter()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        # map conserva el orden de los lotes
+        results = self._pool.map(self._embed_batch, batches)
+        vectors = [vector for batch in results for vector in batch]
+        with self._lock:
+            self._stats["busy_seconds"] += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text):
+        tokens = estimate_tokens(text)
+        return call_with_retry(self.embeddings.embed_query, text, max_retries=self.max_retries,
+                               on_retry=self._count_retry, before_attempt=lambda: self.limiter.acquire(tokens))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        busy = stats["busy_seconds"]
+        stats["texts_per_second"] = stats["texts"] / busy if busy else 0.0
+        stats["tokens_per_second"] = stats["tokens"] / busy if busy else 0.0
+        return stats
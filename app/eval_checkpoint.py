@@ -0,0 +1,170 @@
+# app/eval_checkpoint.py
+"""
+Checkpoints de evaluación para reanudar corridas interrumpidas.
+
+Cada configuración de evaluación (script, prompt, chunking, modo de juez,
+dataset e índice) tiene un hash. El checkpoint guarda, en un JSONL de solo
+anexado, la run padre de MLflow de esa configuración y los pares
+(id de pregunta, hash de configuración) ya registrados. Al reiniciar:
+
+- se reanuda la misma run padre en lugar de crear otra,
+- se saltan las preguntas completadas,
+- se borran las runs hijas huérfanas (iniciadas pero no registradas en el
+  checkpoint, p. ej. por un Ctrl-C a mitad de pregunta).
+
+Cuando la configuración termina, el checkpoint queda cerrado y la siguiente
+corrida empieza una run padre nueva. Con EVAL_RESUME=0 siempre se empieza de cero.
+"""
+
+import os
+import json
+import hashlib
+from contextlib import contextmanager
+
+import mlflow
+from mlflow.exceptions import MlflowException
+from mlflow.tracking import MlflowClient
+
+from app.index_manifest import file_sha256
+
+CHECKPOINT_DIR = os.getenv("EVAL_CHECKPOINT_DIR", ".cache/eval_checkpoints")
+EVAL_RESUME = os.getenv("EVAL_RESUME", "1") == "1"
+
+
+def question_id(question):
+    return hashlib.sha256(question.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def config_hash(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def eval_config(script, dataset_path, persist_path, **params):
+    """Configuración que identifica una corrida: parámetros + hash del dataset y del índice."""
+    index_path = os.path.join(persist_path, "index.faiss")
+    return {
+        "script": script,
+        "dataset_sha256": file_sha256(dataset_path),
+        "index_sha256": file_sha256(index_path) if os.path.exists(index_path) else None,
+        **params,
+    }
+
+
+class EvalCheckpoint:
+    """Registro de preguntas completadas de una configuración y de su run padre."""
+
+    def __init__(self, config, checkpoint_dir=CHECKPOINT_DIR, resume=EVAL_RESUME):
+        self.config = config
+        self.config_hash = config_hash(config)
+        self.path = os.path.join(checkpoint_dir, f"{self.config_hash}.jsonl")
+        self.parent_run_id = None
+        self.completed = {}   # question_id -> run_id
+        self._records = {}    # question_id -> fila de resultados de la pregunta
+        self.finished = False
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        if resume:
+            self._load()
+        if not resume or self.finished:
+            self._reset()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea a medio escribir si el proceso murió
+                    continue
+                if entry.get("config_hash") != self.config_hash:
+                    continue
+                if "parent_run_id" in entry:
+                    self.parent_run_id = entry["parent_run_id"]
+                if "question_id" in entry:
+                    self.completed[entry["question_id"]] = entry["run_id"]
+                    if entry.get("record") is not None:
+                        self._records[entry["question_id"]] = entry["record"]
+                if entry.get("finished"):
+                    self.finished = True
+
+    def _reset(self):
+        self.parent_run_id = None
+        self.completed = {}
+        self._records = {}
+        self.finished = False
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _append(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"config_hash": self.config_hash, **entry}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def is_done(self, question):
+        return question_id(question) in self.completed
+
+    def pending_indices(self, dataset):
+        return [i for i, pair in enumerate(dataset) if not self.is_done(pair["question"])]
+
+    def mark_done(self, question, run_id, record=None):
+        """Registra la pregunta como completada; `record` se guarda para los agregados finales."""
+        qid = question_id(question)
+        self.completed[qid] = run_id
+        if record is not None:
+            self._records[qid] = record
+        self._append({"question_id": qid, "run_id": run_id, "record": record})
+
+    def records(self):
+        """Filas de todas las preguntas completadas, incluidas las de corridas anteriores."""
+        return list(self._records.values())
+
+    def mark_finished(self):
+        self.finished = True
+        self._append({"finished": True})
+
+    def _resumable_parent(self, client):
+        if not self.parent_run_id:
+            return None
+        try:
+            run = client.get_run(self.parent_run_id)
+        except MlflowException:
+            return None
+        if run.info.lifecycle_stage != "active":
+            return None
+        return run
+
+    def cleanup_orphans(self, client=None):
+        """Borra las runs hijas de la run padre que no figuran como completadas."""
+        client = client or MlflowClient()
+        run = client.get_run(self.parent_run_id)
+        children = client.search_runs(
+            experiment_ids=[run.info.experiment_id],
+            filter_string=f"tags.mlflow.parentRunId = '{self.parent_run_id}'",
+        )
+        completed_runs = set(self.completed.values())
+        orphans = [child for child in children if child.info.run_id not in completed_runs]
+        for child in orphans:
+            client.delete_run(child.info.run_id)
+        return len(orphans)
+
+    @contextmanager
+    def parent_run(self, run_name, client=None):
+        """Abre (o reanuda) la run padre de la configuración."""
+        client = client or MlflowClient()
+        if self._resumable_parent(client) is None:
+            self._reset()
+            with mlflow.start_run(run_name=run_name) as run:
+                self.parent_run_id = run.info.run_id
+                self._append({"parent_run_id": self.parent_run_id})
+                mlflow.set_tags({"config_hash": self.config_hash, "eval_level": "config"})
+                mlflow.log_params(self.config)
+                yield run
+            return
+
+        orphans = self.cleanup_orphans(client)
+        print(f"♻️  Reanudando run {self.parent_run_id}: {len(self.completed)} preguntas completadas"
+              + (f", {orphans} runs huérfanas eliminadas" if orphans else ""))
+        with mlflow.start_run(run_id=self.parent_run_id) as run:
+            yield run
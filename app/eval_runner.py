@@ -0,0 +1,119 @@
+# app/eval_runner.py
+"""
+Evaluación avanzada de una configuración completa, reutilizable.
+
+`evaluate_config` evalúa una cadena RAG sobre el dataset y la registra en
+MLflow como lo hace run_eval_advanced.py: una run padre por configuración
+(reanudable con su checkpoint), una run hija por pregunta con las mismas
+métricas y artefactos, y los agregados con `results.parquet` al final. La usan
+run_eval_advanced.py, el barrido (run_sweep.py) y el tuner por halving.
+"""
+
+from app.eval_engine import (
+    CRITERIA_DEFINITIONS, EVAL_CONCURRENCY, evaluate_dataset, criterion_results, judge_usage,
+)
+from app.eval_checkpoint import question_id
+from app.eval_summary import log_config_summary
+from app.llm_cache import llm_cache_metrics
+from app.mlflow_buffer import buffered_run
+from app.tracing import STAGES
+
+SUMMARY_METRICS = [
+    "qa_is_correct", *(f"{name}_score" for name in CRITERIA_DEFINITIONS), "avg_criteria_score",
+    "judge_total_tokens", "judge_cost_usd",
+    *(f"{stage}_{field}" for stage in STAGES for field in ("total_tokens", "cost_usd")),
+]
+
+
+def log_question(result, checkpoint, params, run_name):
+    """Registra una pregunta como run hija de la run padre del checkpoint y devuelve su fila."""
+    grades = result["grades"]
+    pregunta = result["question"]
+
+    # Parámetros, métricas y textos se envían juntos al cerrar la run (log_batch + una subida)
+    with buffered_run(run_name, parent_run_id=checkpoint.parent_run_id,
+                      tags={"question_id": question_id(pregunta), "eval_level": "question"}) as run:
+        run.log_param("question", pregunta)
+        run.log_params(params)
+
+        is_correct_basic = grades["qa"].get("score", 0)
+        run.log_metric("qa_is_correct", is_correct_basic)
+        run.log_metric("latency", result["latency"])
+
+        criterion_scores = {}
+        reasonings = {}
+        criteria_grades = criterion_results(grades)
+        for criterion_name in CRITERIA_DEFINITIONS:
+            eval_result = criteria_grades[criterion_name]
+            criterion_scores[criterion_name] = eval_result.get("score", 0)
+            reasonings[criterion_name] = eval_result.get("reasoning", "No reasoning provided")
+            run.log_metric(f"{criterion_name}_score", criterion_scores[criterion_name])
+            run.log_text(reasonings[criterion_name], f"reasoning/{criterion_name}_reasoning.txt")
+
+        avg_score = sum(criterion_scores.values()) / len(criterion_scores)
+        run.log_metric("avg_criteria_score", avg_score)
+
+        # Tokens y costo del juez (QA + criterios)
+        usage = judge_usage(grades)
+        for name, value in usage.items():
+            run.log_metric(f"judge_{name}", value)
+        if "criteria" in grades:
+            run.log_metric("judge_fallback_criteria", len(grades["criteria"]["fallback"]))
+
+        # Latencia, tokens y costo por etapa (retrieval, condense, generation, grading)
+        run.log_metrics(result["stages"])
+
+        # Aciertos acumulados de la caché de LLM (generación + jueces)
+        run.log_metrics(llm_cache_metrics())
+
+        run.log_text(pregunta, "question.txt")
+        run.log_text(result["expected"], "expected_answer.txt")
+        run.log_text(result["answer"], "generated_answer.txt")
+
+    # Fila de results.parquet de la run padre
+    record = {
+        "index": result["index"],
+        "question_id": question_id(pregunta),
+        "run_id": run.run_id,
+        "run_name": run_name,
+        "question": pregunta,
+        "expected": result["expected"],
+        "answer": result["answer"],
+        "latency": result["latency"],
+        "qa_is_correct": is_correct_basic,
+        **{f"{name}_score": score for name, score in criterion_scores.items()},
+        "avg_criteria_score": avg_score,
+        **{f"judge_{name}": value for name, value in usage.items()},
+        **result["stages"],
+    }
+    checkpoint.mark_done(pregunta, run.run_id, record)
+    return record, reasonings
+
+
+def evaluate_config(chain, dataset, evaluators, checkpoint, run_name, params, indices=None,
+                    max_concurrency=EVAL_CONCURRENCY, on_logged=None, finish=True):
+    """Evalúa `dataset` (o solo `indices`) como run padre `run_name`; devuelve los agregados.
+
+    `params` se registra en cada run hija. `on_logged(result, record, reasonings)` se llama
+    en el orden del dataset después de registrar cada pregunta. Con `finish=False` el
+    checkpoint queda abierto para seguir agregando preguntas a la misma run padre.
+    """
+    def log_result(result):
+        record, reasonings = log_question(result, checkpoint, params,
+                                          f"eval_q{result['index'] + 1}_{params.get('prompt_version', '')}")
+        if on_logged:
+            on_logged(result, record, reasonings)
+
+    with checkpoint.parent_run(run_name):
+        pending = [i for i in (range(len(dataset)) if indices is None else indices)
+                   if not checkpoint.is_done(dataset[i]["question"])]
+        evaluate_dataset(chain, dataset, evaluators, max_concurrency=max_concurrency,
+                         on_result=log_result, indices=pending)
+
+        # Agregados de la configuración en la run padre: promedios, tasa de aprobación
+        # (avg_criteria_score >= EVAL_PASS_THRESHOLD) y percentiles de latencia
+        summary = log_config_summary(checkpoint.parent_run_id, checkpoint.records(),
+                                     SUMMARY_METRICS, pass_column="avg_criteria_score")
+        if finish:
+            checkpoint.mark_finished()
+    return summary
@@ -0,0 +1,65 @@
+# app/eval_summary.py
+"""
+Resumen por configuración de una evaluación.
+
+Cada configuración evaluada es una run padre (tag `eval_level=config`) con una
+run hija por pregunta (`eval_level=question`). Al terminar, la run padre recibe
+las métricas agregadas (promedio de cada métrica por pregunta con el mismo
+nombre, tasa de aprobación y percentiles de latencia, total y por etapa) y un
+único artefacto `results.parquet` con una fila por pregunta. Los dashboards leen una fila por
+configuración en lugar de recorrer todas las runs por pregunta.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.mlflow_buffer import BufferedRun
+
+RESULTS_ARTIFACT = "results.parquet"
+CONFIG_FILTER = "tags.eval_level = 'config'"
+QUESTION_FILTER = "tags.eval_level = 'question'"
+EVAL_PASS_THRESHOLD = float(os.getenv("EVAL_PASS_THRESHOLD", 0.7))
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+def aggregate_metrics(df, metric_columns, pass_column, pass_threshold=EVAL_PASS_THRESHOLD):
+    """Promedios por métrica, tasa de aprobación (`pass_column` >= umbral) y percentiles de latencia
+    de "latency" y de cada columna "<etapa>_latency"."""
+    metrics = {"n_questions": len(df)}
+    for column in metric_columns:
+        if column in df.columns and df[column].notna().any():
+            metrics[column] = float(df[column].mean())
+    if pass_column in df.columns and len(df):
+        metrics["pass_rate"] = float((df[pass_column] >= pass_threshold).mean())
+    # "latency" total y "<etapa>_latency" de StageTracer -> latency_p95, retrieval_latency_p95, ...
+    for column in [c for c in df.columns if c == "latency" or c.endswith("_latency")]:
+        latencies = df[column].dropna()
+        if not len(latencies):
+            continue
+        for p, value in zip(LATENCY_PERCENTILES, np.percentile(latencies, LATENCY_PERCENTILES)):
+            metrics[f"{column}_p{p}"] = float(value)
+        metrics[f"{column}_mean"] = float(latencies.mean())
+    return metrics
+
+
+def log_config_summary(parent_run_id, records, metric_columns, pass_column, client=None):
+    """Registra en la run padre los agregados y `results.parquet`; devuelve las métricas."""
+    df = pd.DataFrame(records)
+    if "index" in df.columns:
+        df = df.sort_values("index").reset_index(drop=True)
+    metrics = aggregate_metrics(df, metric_columns, pass_column)
+    run = BufferedRun(parent_run_id, client)
+    run.log_metrics(metrics)
+    run.log_parquet(df, RESULTS_ARTIFACT)
+    run.flush()
+    return metrics
+
+
+def load_results(client, run_id):
+    """DataFrame por pregunta de una run padre (vacío si no tiene `results.parquet`)."""
+    artifacts = {artifact.path for artifact in client.list_artifacts(run_id)}
+    if RESULTS_ARTIFACT not in artifacts:
+        return pd.DataFrame()
+    return pd.read_parquet(client.download_artifacts(run_id, RESULTS_ARTIFACT))
@@ -0,0 +1,200 @@
+# app/fake_openai_server.py
+"""
+Servidor local que imita la API de OpenAI para pruebas sin costo.
+
+Implementa `POST /v1/embeddings` con vectores deterministas (derivados del
+sha256 del texto) y `POST /v1/chat/completions` con una respuesta determinista
+de `answer_tokens` palabras, con o sin streaming (SSE, incluido el chunk de
+uso con `stream_options.include_usage`). Puede inyectar latencia (antes de
+responder o del primer token, y entre tokens) y respuestas 429 para probar los
+límites de tasa, los reintentos y el servicio HTTP bajo carga.
+
+Uso:
+    python app/fake_openai_server.py --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python ...
+"""
+
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_vector(text, dim):
+    values = []
+    counter = 0
+    while len(values) < dim:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend((b - 127.5) / 127.5 for b in digest)
+        counter += 1
+    return values[:dim]
+
+
+def fake_answer(messages, n_tokens):
+    """Respuesta determinista: palabras derivadas del último mensaje del usuario."""
+    question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    if isinstance(question, list):
+        question = " ".join(part.get("text", "") for part in question if isinstance(part, dict))
+    words = question.split()[-20:] or ["respuesta"]
+    digest = hashlib.sha256(question.encode("utf-8")).hexdigest()
+    return " ".join(["Respuesta", "simulada", digest[:8]] + [words[i % len(words)] for i in range(max(0, n_tokens - 3))])
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    server_version = "FakeOpenAI/1.0"
+    # Keep-alive: los clientes HTTP con pool reutilizan conexiones como con la API real
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _should_throttle(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            n = server.requests
+        if server.fail_every and n % server.fail_every == 0:
+            with server.lock:
+                server.throttled += 1
+            self._send_json(429, {"error": {"message": "Rate limit (fake)", "type": "rate_limit_error"}},
+                            headers={"retry-after": "0.01"})
+            return True
+        return False
+
+    def do_POST(self):
+        payload = self._read_json()
+        if self.path.rstrip("/").endswith("/embeddings"):
+            if self._should_throttle():
+                return
+            time.sleep(self.server.latency)
+            return self._embeddings(payload)
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            if self._should_throttle():
+                return
+            time.sleep(self.server.latency)
+            if payload.get("stream"):
+                return self._chat_stream(payload)
+            return self._chat(payload)
+        self._send_json(404, {"error": {"message": f"Ruta no soportada: {self.path}"}})
+
+    def _embeddings(self, payload):
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = [
+            {"object": "embedding", "index": i, "embedding": fake_vector(str(text), self.server.dim)}
+            for i, text in enumerate(inputs)
+        ]
+        tokens = sum(len(str(text)) // 4 + 1 for text in inputs)
+        self._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+
+    def _chat_usage(self, payload, answer):
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 4 for m in payload.get("messages", []))
+        completion_tokens = len(answer.split())
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _chat(self, payload):
+        answer = fake_answer(payload.get("messages", []), self.server.answer_tokens)
+        time.sleep(self.server.token_latency * len(answer.split()))
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{self.server.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake-chat"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                         "finish_reason": "stop"}],
+            "usage": self._chat_usage(payload, answer),
+        })
+
+    def _write_chunk(self, data):
+        body = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(body):x}\r\n".encode("ascii") + body + b"\r\n")
+        self.wfile.flush()
+
+    def _chat_stream(self, payload):
+        answer = fake_answer(payload.get("messages", []), self.server.answer_tokens)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        base = {"id": f"chatcmpl-fake-{self.server.requests}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": payload.get("model", "fake-chat")}
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.server.token_latency)
+            delta = {"role": "assistant", "content": word} if i == 0 else {"content": " " + word}
+            self._write_chunk(json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}))
+        self._write_chunk(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        if payload.get("stream_options", {}).get("include_usage"):
+            self._write_chunk(json.dumps({**base, "choices": [], "usage": self._chat_usage(payload, answer)}))
+        self._write_chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def make_server(host="127.0.0.1", port=0, dim=64, latency=0.0, fail_every=0, answer_tokens=60, token_latency=0.0):
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.dim = dim
+    server.latency = latency
+    server.answer_tokens = answer_tokens
+    server.token_latency = token_latency
+    server.fail_every = fail_every
+    server.requests = 0
+    server.throttled = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Inicia el servidor en un hilo daemon y devuelve (server, base_url)."""
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor OpenAI falso para pruebas locales")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de latencia por solicitud")
+    parser.add_argument("--fail-every", type=int, default=0, help="Responder 429 cada N solicitudes")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="Palabras de cada respuesta de chat")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Segundos entre tokens de chat")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.dim, args.latency, args.fail_every,
+                         args.answer_tokens, args.token_latency)
+    print(f"🧪 Servidor OpenAI falso en http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
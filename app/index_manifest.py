@@ -0,0 +1,94 @@
+# app/index_manifest.py
+"""
+Manifiesto del vectorstore: hashes por archivo y por chunk.
+
+Se guarda junto al índice FAISS (`manifest.json`) y permite que
+`save_vectorstore` reconstruya el índice de forma incremental, embebiendo
+solo los chunks nuevos o modificados.
+"""
+
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_ids(chunks):
+    """Ids deterministas por chunk: hash de (archivo, página, texto) + ocurrencia.
+
+    El sufijo de ocurrencia distingue chunks idénticos dentro del mismo archivo
+    (encabezados o pies de página repetidos).
+    """
+    ids = []
+    seen = {}
+    for chunk in chunks:
+        source = os.path.basename(chunk.metadata.get("source", ""))
+        page = chunk.metadata.get("page", "")
+        key = hashlib.sha256(f"{source}|{page}|{chunk.page_content}".encode("utf-8")).hexdigest()
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        ids.append(f"{key}:{n}")
+    return ids
+
+
+def new_manifest(chunk_size, chunk_overlap, embedding_model):
+    return {
+        "version": MANIFEST_VERSION,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model": embedding_model,
+        "files": {},
+    }
+
+
+def load_manifest(persist_path):
+    path = os.path.join(persist_path, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, persist_path):
+    os.makedirs(persist_path, exist_ok=True)
+    path = os.path.join(persist_path, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_compatible(manifest, chunk_size, chunk_overlap, embedding_model):
+    """Un manifiesto solo sirve si el índice se construyó con la misma configuración."""
+    return (
+        manifest is not None
+        and manifest.get("version") == MANIFEST_VERSION
+        and manifest.get("chunk_size") == chunk_size
+        and manifest.get("chunk_overlap") == chunk_overlap
+        and manifest.get("embedding_model") == embedding_model
+    )
+
+
+def diff_files(manifest, current_hashes):
+    """Compara {archivo: sha256} actual con el manifiesto.
+
+    Devuelve (nuevos, modificados, eliminados) como listas ordenadas de nombres.
+    """
+    previous = manifest["files"]
+    added = sorted(name for name in current_hashes if name not in previous)
+    changed = sorted(
+        name for name, sha in current_hashes.items()
+        if name in previous and previous[name]["sha256"] != sha
+    )
+    removed = sorted(name for name in previous if name not in current_hashes)
+    return added, changed, removed
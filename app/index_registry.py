@@ -0,0 +1,160 @@
+# app/index_registry.py
+"""
+Registro persistente de índices FAISS.
+
+Cada índice se identifica por (huella del corpus, chunk_size, chunk_overlap,
+modelo de embeddings). Si ya existe en disco se carga; si no, se construye una
+sola vez y se publica con un renombrado atómico. Un archivo de bloqueo evita
+que dos procesos construyan el mismo índice a la vez: guarda el host y el PID
+del constructor, que además renueva su mtime mientras construye. Solo se
+descarta si ese proceso ya no existe (mismo host) o si el latido lleva más de
+`LOCK_TIMEOUT` segundos sin renovarse (otro host).
+"""
+
+import os
+import json
+import time
+import shutil
+import socket
+import hashlib
+import threading
+
+from langchain_community.vectorstores import FAISS
+
+from app.index_manifest import file_sha256
+
+REGISTRY_DIR = os.getenv("INDEX_REGISTRY_DIR", "vectorstore/registry")
+LOCK_TIMEOUT = int(os.getenv("INDEX_REGISTRY_LOCK_TIMEOUT", 3600))
+META_NAME = "registry.json"
+
+# (ruta, tamaño, mtime) -> sha256, para no releer PDFs sin cambios en el mismo proceso
+_hash_memo = {}
+
+
+def corpus_fingerprint(data_path):
+    h = hashlib.sha256()
+    for file in sorted(os.listdir(data_path)):
+        if not file.endswith(".pdf"):
+            continue
+        path = os.path.join(data_path, file)
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        if memo_key not in _hash_memo:
+            _hash_memo[memo_key] = file_sha256(path)
+        h.update(f"{file}\0{_hash_memo[memo_key]}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def registry_key(fingerprint, chunk_size, chunk_overlap, embedding_model):
+    raw = json.dumps([fingerprint, chunk_size, chunk_overlap, embedding_model])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def _is_ready(path):
+    return os.path.exists(os.path.join(path, META_NAME))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _BuildLock:
+    """Bloqueo entre procesos basado en un archivo creado con O_EXCL ("host pid")."""
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT, poll=0.5):
+        self.path = path
+        self.timeout = timeout
+        self.poll = poll
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _is_stale(self):
+        with open(self.path, encoding="utf-8") as f:
+            host, _, pid = f.read().rpartition(" ")
+        # En el mismo host se sabe si el constructor sigue vivo (en Windows os.kill termina el proceso)
+        if host == socket.gethostname() and pid.isdigit() and os.name != "nt":
+            return not _pid_alive(int(pid))
+        # Otro host (o bloqueo recién creado, aún sin PID): vale el latido
+        return time.time() - os.path.getmtime(self.path) > self.timeout
+
+    def _beat(self):
+        while not self._stop.wait(max(1.0, self.timeout / 4)):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                return
+
+    def __enter__(self):
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, f"{socket.gethostname()} {os.getpid()}".encode())
+                os.close(fd)
+                break
+            except FileExistsError:
+                # Un constructor que murió sin liberar el bloqueo no debe bloquear para siempre
+                try:
+                    if self._is_stale():
+                        os.remove(self.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(self.poll)
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._beat, name="index_registry_lock", daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._heartbeat.join()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def registry_path(chunk_size, chunk_overlap, data_path, embeddings, registry_dir=REGISTRY_DIR):
+    """Directorio del índice registrado para (corpus, chunk_size, chunk_overlap, modelo)."""
+    embedding_model = getattr(embeddings, "model", type(embeddings).__name__)
+    key = registry_key(corpus_fingerprint(data_path), chunk_size, chunk_overlap, embedding_model)
+    return os.path.join(registry_dir, key)
+
+
+def get_or_build_index(chunk_size, chunk_overlap, data_path, embeddings, registry_dir=REGISTRY_DIR):
+    """Devuelve (vectordb, hit) cargando el índice registrado o construyéndolo si falta."""
+    from app.rag_pipeline import save_vectorstore
+
+    embedding_model = getattr(embeddings, "model", type(embeddings).__name__)
+    fingerprint = corpus_fingerprint(data_path)
+    path = registry_path(chunk_size, chunk_overlap, data_path, embeddings, registry_dir)
+
+    if not _is_ready(path):
+        os.makedirs(registry_dir, exist_ok=True)
+        with _BuildLock(path + ".lock"):
+            # Otro proceso pudo terminar la construcción mientras esperábamos
+            if not _is_ready(path):
+                tmp_path = f"{path}.tmp-{os.getpid()}"
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                vectordb = save_vectorstore(chunk_size, chunk_overlap, persist_path=tmp_path,
+                                            data_path=data_path, embeddings=embeddings, incremental=False)
+                with open(os.path.join(tmp_path, META_NAME), "w", encoding="utf-8") as f:
+                    json.dump({
+                        "corpus_fingerprint": fingerprint,
+                        "chunk_size": chunk_size,
+                        "chunk_overlap": chunk_overlap,
+                        "embedding_model": embedding_model,
+                        "created_at": time.time(),
+                    }, f, indent=2)
+                shutil.rmtree(path, ignore_errors=True)
+                os.replace(tmp_path, path)
+                return vectordb, False
+
+    vectordb = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    return vectordb, True
@@ -0,0 +1,138 @@
+# app/llm_cache.py
+"""
+Caché persistente de respuestas de LLM, direccionada por contenido.
+
+La clave es sha256(llm_string + prompt): `llm_string` incluye el modelo, la
+temperatura y el resto de parámetros del LLM, y `prompt` son los mensajes
+exactos ya renderizados. Como todo corre a temperatura 0, re-ejecutar una
+evaluación sin cambios en prompt, índice ni dataset no vuelve a pagar las
+llamadas de la cadena RAG ni de los jueces.
+
+Variables de entorno:
+    LLM_CACHE=0            desactiva la caché
+    LLM_CACHE_BYPASS=1     ignora las entradas guardadas (fuerza llamadas) pero las refresca
+    LLM_CACHE_PATH         archivo SQLite (por defecto .cache/llm.sqlite)
+    LLM_CACHE_TTL          segundos de vida de cada entrada (0 = sin vencimiento)
+    LLM_CACHE_MAX_ENTRIES  máximo de entradas; se expulsan las menos usadas
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+LLM_CACHE = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm.sqlite")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 30 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 100_000))
+
+
+class SQLiteLLMCache(BaseCache):
+    """`BaseCache` de LangChain en SQLite con TTL, expulsión LRU y contadores de aciertos."""
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 bypass=LLM_CACHE_BYPASS):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_last_used ON llm_cache (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt, llm_string):
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        if self.bypass:
+            with self._lock:
+                self.misses += 1
+            return None
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return loads(row[0], allowed_objects="core")
+
+    def update(self, prompt, llm_string, return_val):
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, dumps(list(return_val)), now, now),
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)",
+                    (excess,),
+                )
+            self._conn.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Caché compartida del proceso, o None si LLM_CACHE=0 (el LLM no usa caché)."""
+    global _cache
+    if not LLM_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteLLMCache()
+        return _cache
+
+
+def llm_cache_metrics():
+    """Contadores acumulados de la caché como métricas de MLflow ({} si está desactivada)."""
+    cache = get_llm_cache()
+    if cache is None:
+        return {}
+    return {f"llm_cache_{name}": value for name, value in cache.stats().items()}
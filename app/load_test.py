@@ -0,0 +1,175 @@
+# app/load_test.py
+"""
+Prueba de carga del servicio HTTP (app/api.py).
+
+Envía `--requests` consultas con `--concurrency` en vuelo (preguntas del
+dataset de evaluación) y reporta throughput, errores y p50/p95/p99 de latencia
+total y, con `--stream`, del primer token. Al final muestra el desglose por
+etapa de `/metrics` y el efecto del micro-batching y de la unificación de
+preguntas repetidas (`/metrics/batching`).
+
+Con `--local` no hace falta OpenAI ni el índice real: levanta en el mismo
+proceso el servidor OpenAI falso (app/fake_openai_server.py), un índice FAISS
+pequeño con las respuestas del dataset y el servicio con uvicorn. Las cachés
+de embeddings, de LLM y semántica se desactivan para no mezclar vectores ni
+respuestas falsas con las reales y para medir llamadas completas.
+
+Uso:
+    python app/load_test.py --local --requests 200 --concurrency 32 --stream --llm-latency 0.2 --token-latency 0.01
+    python app/load_test.py --url http://127.0.0.1:8000 --requests 500 --concurrency 64
+"""
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+
+import httpx
+import numpy as np
+
+DATASET_PATH = "tests/eval_dataset_creg.json"
+PERCENTILES = (50, 95, 99)
+
+
+async def one_request(client, question, stream):
+    """Devuelve {"latency", "first_token", "ok"} de una consulta."""
+    start = time.perf_counter()
+    first_token = None
+    payload = {"question": question, "stream": stream}
+    try:
+        if not stream:
+            response = await client.post("/query", json=payload)
+            return {"latency": time.perf_counter() - start, "first_token": None, "ok": response.status_code == 200}
+        ok = False
+        async with client.stream("POST", "/query", json=payload) as response:
+            async for line in response.aiter_lines():
+                if line == "event: token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif line == "event: done":
+                    ok = response.status_code == 200
+        return {"latency": time.perf_counter() - start, "first_token": first_token, "ok": ok}
+    except httpx.HTTPError:
+        return {"latency": time.perf_counter() - start, "first_token": None, "ok": False}
+
+
+async def run_load(url, questions, n_requests, concurrency, stream, timeout=120.0):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(i):
+            async with semaphore:
+                return await one_request(client, questions[i % len(questions)], stream)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+        stages = (await client.get("/metrics")).json()
+        batching = (await client.get("/metrics/batching")).json()
+    return results, elapsed, stages, batching
+
+
+def summarize(results, elapsed):
+    ok = [r for r in results if r["ok"]]
+    report = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+    }
+    for name in ("latency", "first_token"):
+        values = [r[name] for r in ok if r[name] is not None]
+        if values:
+            for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                report[f"{name}_p{p}"] = float(value)
+    return report
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_stack(dataset, llm_latency, token_latency, answer_tokens):
+    """Servidor OpenAI falso + índice pequeño + servicio HTTP en hilos; devuelve la URL del servicio."""
+    from app.fake_openai_server import start_in_thread
+
+    fake, base_url = start_in_thread(dim=64, latency=llm_latency, token_latency=token_latency,
+                                     answer_tokens=answer_tokens)
+    os.environ.update({
+        "OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "fake", "EMBEDDING_CHECK_CTX_LENGTH": "0",
+        "EMBEDDING_CACHE": "0", "LLM_CACHE": "0", "SEMANTIC_CACHE": "0", "VECTORSTORE_MMAP": "0",
+    })
+    # Se importan después de configurar el entorno: las cachés se leen al importar
+    import uvicorn
+    from langchain_community.vectorstores import FAISS
+    from app.rag_pipeline import get_embeddings
+    from app.api import create_app
+
+    persist_path = tempfile.mkdtemp(prefix="load_test_index_")
+    FAISS.from_texts([pair["answer"] for pair in dataset], get_embeddings()).save_local(persist_path)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(persist_path=persist_path), host="127.0.0.1",
+                                           port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    print(f"🧪 Stack local: OpenAI falso en {base_url}, servicio en http://127.0.0.1:{port}")
+    return f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio HTTP de consultas")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stream", action="store_true", help="Consultas con SSE (mide el primer token)")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--local", action="store_true", help="Levantar OpenAI falso + servicio en este proceso")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="(--local) latencia hasta la respuesta")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="(--local) segundos entre tokens")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="(--local) palabras por respuesta")
+    parser.add_argument("--output", help="Guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    with open(args.dataset) as f:
+        dataset = json.load(f)
+    url = args.url
+    if args.local:
+        url = start_local_stack(dataset, args.llm_latency, args.token_latency, args.answer_tokens)
+
+    print(f"🚀 {args.requests} consultas, {args.concurrency} en paralelo{' (streaming)' if args.stream else ''}")
+    results, elapsed, stages, batching = asyncio.run(run_load(
+        url, [pair["question"] for pair in dataset], args.requests, args.concurrency, args.stream))
+    report = summarize(results, elapsed)
+    report["stages"] = stages
+    report["batching"] = batching
+
+    print("="*80)
+    print(f"✅ {report['requests'] - report['errors']}/{report['requests']} OK en {elapsed:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s)")
+    for name in ("latency", "first_token"):
+        if f"{name}_p50" in report:
+            print(f"⏱️  {name}: " + " | ".join(f"p{p} {report[f'{name}_p{p}']:.3f}s" for p in PERCENTILES))
+    for stage, row in stages.items():
+        print(f"   {stage:<12} p50 {row['p50']:.3f}s | p95 {row['p95']:.3f}s | p99 {row['p99']:.3f}s (n={row['n']})")
+    if batching["retrieval"]:
+        print(f"📦 Recuperación en lotes: {batching['retrieval']['batches']} lotes, "
+              f"{batching['retrieval']['mean_batch_size']:.1f} preguntas por lote")
+    print(f"🔗 Solicitudes unificadas: {batching['coalescing']['coalesced']}/{batching['coalescing']['requests']}")
+    print("="*80)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
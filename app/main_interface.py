@@ -6,18 +6,19 @@ import streamlit as st
 st.set_page_config(page_title="📚 Asistente CREG + Métricas", layout="wide")
 
 import pandas as pd
-import mlflow
-import json
-from app.rag_pipeline import load_vectorstore_from_disk, build_chain
+from app.resources import get_chain, get_answer_cache
+from app.rag_pipeline import stream_answer
+from app.mlflow_queries import list_experiments, config_runs
+from app.tracing import StageTracer, get_chat_histogram
 
 
 
 modo = st.sidebar.radio("Selecciona una vista:", ["🤖 Chatbot", "📊 Métricas"])
 
-vectordb = load_vectorstore_from_disk()
-chain = build_chain(vectordb)
-
 if modo == "🤖 Chatbot":
+    # Vectorstore y cadena compartidos por el proceso (se recargan solo si cambia el índice)
+    chain = get_chain(streaming=True)
+
     st.title("🤖 Asistente de Regulación Energética CREG")
     st.markdown("📚 Consultá sobre las resoluciones y normativas del sector energético colombiano")
     pregunta = st.text_input("¿Qué deseas consultar sobre regulación energética?")
@@ -25,22 +26,46 @@ if modo == "🤖 Chatbot":
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
 
+    previous = st.session_state.chat_history
     if pregunta:
-        with st.spinner("Consultando documentos..."):
-            result = chain.invoke({"question": pregunta, "chat_history": st.session_state.chat_history})
-            st.session_state.chat_history.append((pregunta, result["answer"]))
-
-    if st.session_state.chat_history:
-        for q, a in reversed(st.session_state.chat_history):
+        # La respuesta se muestra token por token; al terminar queda en el historial
+        st.markdown(f"**👤 Usuario:** {pregunta}")
+        st.markdown("**🤖 Bot:**")
+        tracer = StageTracer()
+        answer = st.write_stream(stream_answer(
+            chain, {"question": pregunta, "chat_history": st.session_state.chat_history}, tracer,
+            get_answer_cache()))
+        st.markdown("---")
+        previous = list(st.session_state.chat_history)
+        st.session_state.chat_history.append((pregunta, answer))
+        get_chat_histogram().record(tracer.metrics())
+
+    if previous:
+        for q, a in reversed(previous):
             st.markdown(f"**👤 Usuario:** {q}")
             st.markdown(f"**🤖 Bot:** {a}")
             st.markdown("---")
 
+    # Latencia por etapa de las últimas consultas del proceso (todas las sesiones)
+    stage_latency = get_chat_histogram().percentiles()
+    if stage_latency:
+        with st.sidebar.expander("⏱️ Latencia por etapa"):
+            st.dataframe(pd.DataFrame.from_dict(stage_latency, orient="index").round(4))
+
+    # Caché semántica de respuestas: aciertos, latencia ahorrada y falsos aciertos auditados
+    answer_cache = get_answer_cache()
+    if answer_cache is not None and answer_cache.stats()["lookups"]:
+        with st.sidebar.expander("🧠 Caché semántica"):
+            st.dataframe(pd.DataFrame.from_dict(answer_cache.stats(), orient="index", columns=["valor"]))
+            false_hits = answer_cache.false_hits()
+            if false_hits:
+                st.markdown("**Falsos aciertos recientes**")
+                st.dataframe(pd.DataFrame(false_hits))
+
 elif modo == "📊 Métricas":
     st.title("📈 Resultados de Evaluación")
 
-    client = mlflow.tracking.MlflowClient()
-    experiments = [exp for exp in client.search_experiments() if exp.name.startswith("eval_")]
+    experiments = list_experiments("eval_")
 
     if not experiments:
         st.warning("No se encontraron experimentos de evaluación.")
@@ -49,31 +74,25 @@ elif modo == "📊 Métricas":
     exp_names = [exp.name for exp in experiments]
     selected_exp = st.selectbox("Selecciona un experimento:", exp_names)
 
-    experiment = client.get_experiment_by_name(selected_exp)
-    runs = client.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"])
+    experiment = next(exp for exp in experiments if exp.name == selected_exp)
+    # Una fila por configuración evaluada (run padre con los agregados)
+    runs = config_runs(experiment.experiment_id)
 
-    if not runs:
+    if runs.empty:
         st.warning("No hay ejecuciones registradas.")
         st.stop()
 
-    # Armar dataframe
-    data = []
-    for run in runs:
-        params = run.data.params
-        metrics = run.data.metrics
-        data.append({
-            "Pregunta": params.get("question"),
-            "Prompt": params.get("prompt_version"),
-            "Chunk Size": int(params.get("chunk_size", 0)),
-            "Correcto (LC)": metrics.get("lc_is_correct", 0)
-        })
-
-    df = pd.DataFrame(data)
+    df = pd.DataFrame({
+        "Prompt": runs.get("params.prompt_version"),
+        "Chunk Size": runs.get("params.chunk_size"),
+        "Preguntas": runs.get("metrics.n_questions"),
+        "Precisión": runs.get("metrics.lc_is_correct", runs.get("metrics.qa_is_correct")),
+        "Inicio": runs["start_time"],
+    })
     st.dataframe(df)
 
-    # Agrupado
+    # Agrupado (la corrida más reciente de cada configuración)
     st.subheader("📊 Promedio por configuración")
-    grouped = df.groupby(["Prompt", "Chunk Size"]).agg({"Correcto (LC)": "mean"}).reset_index()
-    grouped.rename(columns={"Correcto (LC)": "Precisión"}, inplace=True)
-    grouped["config"] = grouped["Prompt"] + " | " + grouped["Chunk Size"].astype(str)
+    grouped = df.drop_duplicates(["Prompt", "Chunk Size"]).copy()
+    grouped["config"] = grouped["Prompt"].astype(str) + " | " + grouped["Chunk Size"].astype(str)
     st.bar_chart(grouped.set_index("config")["Precisión"])
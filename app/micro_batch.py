@@ -0,0 +1,236 @@
+# app/micro_batch.py
+"""
+Micro-batching de la recuperación y unificación de preguntas idénticas en vuelo.
+
+`MicroBatcher` junta los elementos que llegan durante `window_ms` (o hasta
+`max_batch`) y los procesa con una sola llamada, sin repetir duplicados.
+`BatchingRetriever` lo usa en el retriever de la cadena: las preguntas
+concurrentes se embeben en una sola solicitud y se buscan con un único
+`index.search` sobre la matriz de vectores, en lugar de un embedding y una
+búsqueda por pregunta. Los documentos son los mismos que con
+`vectordb.as_retriever(search_kwargs={"k": k})`. Quien crea la cadena la
+cierra con `close_batching(chain)` al descartarla (hilo colector y pool).
+
+`InflightCoalescer` (servicio HTTP, async) hace que las solicitudes idénticas
+(misma pregunta normalizada y mismo historial) que llegan mientras otra está
+en vuelo compartan su generación: todas leen los mismos tokens.
+"""
+
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+RETRIEVAL_BATCH_WINDOW_MS = float(os.getenv("RETRIEVAL_BATCH_WINDOW_MS", 5))
+RETRIEVAL_MAX_BATCH = int(os.getenv("RETRIEVAL_MAX_BATCH", 64))
+RETRIEVAL_BATCH_WORKERS = int(os.getenv("RETRIEVAL_BATCH_WORKERS", 2))
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Agrupa llamadas concurrentes a `fn(items) -> results` en lotes."""
+
+    def __init__(self, fn, window_ms=RETRIEVAL_BATCH_WINDOW_MS, max_batch=RETRIEVAL_MAX_BATCH,
+                 workers=RETRIEVAL_BATCH_WORKERS, name="micro_batch"):
+        self.fn = fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        # Mientras un lote se procesa el siguiente ya se va juntando
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "requests": 0, "unique": 0}
+        self._closed = False
+        self._collector = threading.Thread(target=self._collect, name=f"{name}_collector", daemon=True)
+        self._collector.start()
+
+    def submit(self, item):
+        future = Future()
+        with self._lock:
+            if not self._closed:
+                self._queue.put((item, future))
+                return future
+        # Cerrado: quien aún tenga la cadena vieja se atiende sin lotes
+        try:
+            future.set_result(self.fn([item])[0])
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def close(self):
+        """Procesa lo ya encolado, detiene el hilo colector y cierra el pool."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._collector.join()
+        self._pool.shutdown()
+
+    def _collect(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            if batch[0] is _STOP:
+                return
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._pool.submit(self._run, batch)
+
+    def _run(self, batch):
+        unique = list(dict.fromkeys(item for item, _ in batch))
+        try:
+            results = dict(zip(unique, self.fn(unique)))
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(batch)
+            self._stats["unique"] += len(unique)
+        for item, future in batch:
+            future.set_result(results[item])
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+
+def search_batch(vectordb, queries, k):
+    """Documentos de cada pregunta: un solo embedding por lote y un `index.search` sobre la matriz.
+
+    Con OpenAI el embedding de una pregunta es el mismo por `embed_query` o por
+    `embed_documents`, y `CachedEmbeddings` lo sirve desde la caché igual.
+    """
+    vectors = np.asarray(vectordb.embeddings.embed_documents(list(queries)), dtype=np.float32)
+    index = getattr(vectordb, "index", None)
+    if index is None:
+        # Vectorstores sin índice FAISS: el embedding igual se hace en lote
+        return [vectordb.similarity_search_by_vector(vector.tolist(), k=k) for vector in vectors]
+    if getattr(vectordb, "_normalize_L2", False):
+        import faiss
+        faiss.normalize_L2(vectors)
+    _, indices = index.search(vectors, k)
+    return [[vectordb.docstore.search(vectordb.index_to_docstore_id[i]) for i in row if i != -1]
+            for row in indices]
+
+
+class BatchingRetriever(BaseRetriever):
+    """Retriever que resuelve las preguntas concurrentes en micro-lotes (ver `MicroBatcher`)."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: object
+    k: int = 4
+    batcher: MicroBatcher = None
+
+    def __init__(self, vectorstore, k=4, window_ms=RETRIEVAL_BATCH_WINDOW_MS, max_batch=RETRIEVAL_MAX_BATCH):
+        super().__init__(vectorstore=vectorstore, k=k)
+        self.batcher = MicroBatcher(lambda queries: search_batch(vectorstore, queries, k),
+                                    window_ms=window_ms, max_batch=max_batch, name="retrieval_batch")
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.batcher(query)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        return await asyncio.wrap_future(self.batcher.submit(query))
+
+
+def close_batching(chain):
+    """Detiene el `MicroBatcher` del retriever de `chain`, si lo tiene."""
+    retriever = getattr(chain, "retriever", None)
+    if isinstance(retriever, BatchingRetriever):
+        retriever.batcher.close()
+
+
+def normalize_question(question):
+    return " ".join(question.lower().split())
+
+
+def coalesce_key(question, chat_history):
+    return normalize_question(question), tuple(tuple(turn) for turn in chat_history)
+
+
+class SharedStream:
+    """Tokens de una generación en vuelo que varios clientes pueden leer desde el inicio."""
+
+    def __init__(self, tokens, on_done=None, context=None):
+        self.context = context   # datos del productor (p. ej. tracer y resultado final)
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+        self._task = asyncio.create_task(self._run(tokens, on_done))
+
+    async def _run(self, tokens, on_done):
+        try:
+            async for token in tokens:
+                async with self._changed:
+                    self.tokens.append(token)
+                    self._changed.notify_all()
+        except Exception as error:
+            self.error = error
+        finally:
+            if on_done:
+                on_done()
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self):
+        i = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.tokens) > i or self.done)
+                new, done = self.tokens[i:], self.done
+            for token in new:
+                yield token
+            i += len(new)
+            if done and i >= len(self.tokens):
+                if self.error:
+                    raise self.error
+                return
+
+
+class InflightCoalescer:
+    """Una sola generación por clave en vuelo; las solicitudes repetidas se suman a ella."""
+
+    def __init__(self):
+        self._inflight = {}   # clave -> SharedStream
+        self.stats = {"requests": 0, "coalesced": 0}
+
+    def join(self, key, start):
+        """Devuelve (stream compartido, es_líder); `start()` -> (generador async de tokens, contexto)."""
+        self.stats["requests"] += 1
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self.stats["coalesced"] += 1
+            return shared, False
+        tokens, context = start()
+        shared = SharedStream(tokens, on_done=lambda: self._inflight.pop(key, None), context=context)
+        self._inflight[key] = shared
+        return shared, True
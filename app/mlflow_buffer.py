@@ -0,0 +1,160 @@
+# app/mlflow_buffer.py
+"""
+Registro en MLflow con buffer por run.
+
+Las funciones fluidas (`mlflow.log_param`, `log_metric`, `log_text`) hacen una
+escritura al tracking store por llamada. `BufferedRun` acumula parámetros,
+métricas, tags y textos en memoria y al cerrar la run los envía con un solo
+`log_batch` y una sola subida de artefactos. Al salir del proceso (atexit),
+incluso si la evaluación terminó con una excepción, las runs creadas aquí
+(`owns_run=True`) que no llegaron a cerrarse se cierran como FAILED; de las
+runs ajenas (p. ej. la run padre de `mlflow.start_run`) solo se vacía el buffer.
+"""
+
+import os
+import time
+import atexit
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from mlflow.entities import Metric, Param, RunTag, RunStatus
+from mlflow.tracking import MlflowClient
+from mlflow.utils.mlflow_tags import MLFLOW_PARENT_RUN_ID
+
+# Límites de MLflow por llamada a log_batch
+_MAX_METRICS = 1000
+_MAX_PARAMS = 100
+_MAX_TAGS = 100
+_MAX_ENTITIES = 1000
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class BufferedRun:
+    """Run de MLflow cuyos registros se envían en bloque con `flush()`.
+
+    Con `owns_run=True` la run es nuestra: queda pendiente hasta `close()`.
+    """
+
+    def __init__(self, run_id, client=None, owns_run=False):
+        self.run_id = run_id
+        self.client = client or MlflowClient()
+        self.owns_run = owns_run
+        self.params = {}
+        self.metrics = {}
+        self.tags = {}
+        self.texts = {}
+        self.tables = {}
+        if owns_run:
+            self._track()
+
+    def _track(self):
+        with _pending_lock:
+            _pending.add(self)
+
+    def log_param(self, key, value):
+        self._track()
+        self.params[key] = str(value)
+
+    def log_params(self, params):
+        for key, value in params.items():
+            self.log_param(key, value)
+
+    def log_metric(self, key, value, step=0):
+        self._track()
+        self.metrics[(key, step)] = (float(value), int(time.time() * 1000))
+
+    def log_metrics(self, metrics):
+        for key, value in metrics.items():
+            self.log_metric(key, value)
+
+    def set_tag(self, key, value):
+        self._track()
+        self.tags[key] = str(value)
+
+    def log_text(self, text, artifact_file):
+        self._track()
+        self.texts[artifact_file] = text
+
+    def log_parquet(self, df, artifact_file):
+        self._track()
+        self.tables[artifact_file] = df
+
+    def _batches(self):
+        metrics = [Metric(key, value, ts, step) for (key, step), (value, ts) in self.metrics.items()]
+        params = [Param(key, value) for key, value in self.params.items()]
+        tags = [RunTag(key, value) for key, value in self.tags.items()]
+        while metrics or params or tags:
+            batch_params, params = params[:_MAX_PARAMS], params[_MAX_PARAMS:]
+            batch_tags, tags = tags[:_MAX_TAGS], tags[_MAX_TAGS:]
+            room = min(_MAX_METRICS, _MAX_ENTITIES - len(batch_params) - len(batch_tags))
+            batch_metrics, metrics = metrics[:room], metrics[room:]
+            yield batch_metrics, batch_params, batch_tags
+
+    def flush(self):
+        """Envía lo acumulado: un log_batch (o pocos, si se superan los límites) y una subida de artefactos."""
+        for metrics, params, tags in self._batches():
+            self.client.log_batch(self.run_id, metrics=metrics, params=params, tags=tags)
+        if self.texts or self.tables:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for artifact_file, text in self.texts.items():
+                    path = os.path.join(tmp_dir, artifact_file)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(text)
+                for artifact_file, df in self.tables.items():
+                    path = os.path.join(tmp_dir, artifact_file)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    df.to_parquet(path, index=False)
+                self.client.log_artifacts(self.run_id, tmp_dir)
+        self.params, self.metrics, self.tags, self.texts, self.tables = {}, {}, {}, {}, {}
+        if not self.owns_run:
+            with _pending_lock:
+                _pending.discard(self)
+
+    def close(self, status="FINISHED"):
+        try:
+            self.flush()
+        finally:
+            with _pending_lock:
+                _pending.discard(self)
+            self.client.set_terminated(self.run_id, status)
+
+
+@contextmanager
+def buffered_run(run_name, experiment_id=None, parent_run_id=None, tags=None, client=None):
+    """Crea una run (hija de `parent_run_id` si se indica) y la registra en bloque al salir.
+
+    Sin `experiment_id` se usa el experimento de la run padre.
+    """
+    client = client or MlflowClient()
+    if experiment_id is None:
+        experiment_id = client.get_run(parent_run_id).info.experiment_id
+    run_tags = dict(tags or {})
+    if parent_run_id:
+        run_tags[MLFLOW_PARENT_RUN_ID] = parent_run_id
+    run = client.create_run(experiment_id, run_name=run_name, tags=run_tags)
+    logger = BufferedRun(run.info.run_id, client, owns_run=True)
+    try:
+        yield logger
+    except BaseException:
+        logger.close(RunStatus.to_string(RunStatus.FAILED))
+        raise
+    logger.close()
+
+
+@atexit.register
+def flush_pending():
+    """Cierra como FAILED las runs propias sin cerrar y vacía los buffers ajenos (se ejecuta al salir)."""
+    with _pending_lock:
+        runs = list(_pending)
+    for run in runs:
+        try:
+            if run.owns_run:
+                run.close(RunStatus.to_string(RunStatus.FAILED))
+            else:
+                run.flush()
+        except Exception as e:
+            print(f"⚠️  No se pudo vaciar el buffer de MLflow de la run {run.run_id}: {e}")
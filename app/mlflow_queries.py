@@ -0,0 +1,152 @@
+# app/mlflow_queries.py
+"""
+Consultas a MLflow compartidas por los dashboards, con caché por experimento.
+
+Las runs se leen paginando `search_runs` y se convierten en bloque a un
+DataFrame columnar con la convención de `mlflow.search_runs`
+(`metrics.<m>`, `params.<p>`, `tags.<t>`), con métricas float, parámetros
+numéricos convertidos y tiempos como datetime. El resultado se guarda por
+experimento y filtro, y solo se vuelve a consultar cuando cambia la marca del
+experimento (fin e inicio de la run más reciente), que cuesta dos consultas
+de una fila. Como en `app/resources.py`, la caché vive en el módulo y
+sobrevive a las re-ejecuciones de Streamlit.
+"""
+
+import os
+import time
+import threading
+
+import pandas as pd
+from mlflow.tracking import MlflowClient
+
+from app.eval_summary import CONFIG_FILTER, load_results
+
+SEARCH_PAGE_SIZE = int(os.getenv("MLFLOW_SEARCH_PAGE_SIZE", 1000))
+EXPERIMENTS_TTL = float(os.getenv("MLFLOW_EXPERIMENTS_TTL", 30))
+
+_lock = threading.RLock()
+_experiments = {}   # prefijo -> (instante, [experimentos])
+_frames = {}        # (experiment_id, filtro) -> (marca, DataFrame)
+_results = {}       # (experiment_id, run_id) -> (marca, DataFrame)
+
+
+def _client(client):
+    return client or MlflowClient()
+
+
+def list_experiments(prefix="eval_", client=None):
+    """Experimentos activos cuyo nombre empieza con `prefix` (caché de EXPERIMENTS_TTL segundos)."""
+    with _lock:
+        cached = _experiments.get(prefix)
+        if cached and time.monotonic() - cached[0] < EXPERIMENTS_TTL:
+            return cached[1]
+    client = _client(client)
+    experiments, token = [], None
+    while True:
+        page = client.search_experiments(max_results=SEARCH_PAGE_SIZE, page_token=token)
+        experiments.extend(exp for exp in page if exp.name.startswith(prefix))
+        token = page.token
+        if not token:
+            break
+    with _lock:
+        _experiments[prefix] = (time.monotonic(), experiments)
+    return experiments
+
+
+def experiment_marker(experiment_id, client=None):
+    """(fin, inicio, id) de las runs más recientes: cambia cuando una run empieza o termina."""
+    client = _client(client)
+    marker = []
+    for order in ("attributes.end_time DESC", "attributes.start_time DESC"):
+        runs = client.search_runs([experiment_id], max_results=1, order_by=[order])
+        marker.append((runs[0].info.run_id, runs[0].info.end_time, runs[0].info.start_time) if runs else None)
+    return tuple(marker)
+
+
+def iter_runs(experiment_id, filter_string="", client=None, order_by=None):
+    """Recorre todas las runs que cumplen el filtro, página por página."""
+    client = _client(client)
+    token = None
+    while True:
+        page = client.search_runs([experiment_id], filter_string=filter_string, max_results=SEARCH_PAGE_SIZE,
+                                  order_by=order_by or ["attributes.start_time DESC"], page_token=token)
+        yield from page
+        token = page.token
+        if not token:
+            break
+
+
+def _typed(column):
+    try:
+        return pd.to_numeric(column)
+    except (ValueError, TypeError):
+        return column
+
+
+def runs_to_frame(runs):
+    """Convierte runs a un DataFrame columnar tipado, construyendo cada bloque de columnas de una vez."""
+    runs = list(runs)
+    info = pd.DataFrame({
+        "run_id": [run.info.run_id for run in runs],
+        "run_name": [run.info.run_name for run in runs],
+        "status": [run.info.status for run in runs],
+        "start_time": pd.to_datetime([run.info.start_time for run in runs], unit="ms"),
+        "end_time": pd.to_datetime([run.info.end_time for run in runs], unit="ms"),
+    })
+    metrics = pd.DataFrame.from_records([run.data.metrics for run in runs], index=info.index).astype("float64")
+    params = pd.DataFrame.from_records([run.data.params for run in runs], index=info.index).apply(_typed)
+    tags = pd.DataFrame.from_records([run.data.tags for run in runs], index=info.index)
+    return pd.concat([
+        info,
+        metrics.add_prefix("metrics."),
+        params.add_prefix("params."),
+        tags.add_prefix("tags."),
+    ], axis=1)
+
+
+def runs_frame(experiment_id, filter_string="", client=None):
+    """Runs del experimento como DataFrame, reutilizado mientras no cambie la marca del experimento."""
+    client = _client(client)
+    marker = experiment_marker(experiment_id, client)
+    key = (experiment_id, filter_string)
+    with _lock:
+        cached = _frames.get(key)
+        if cached and cached[0] == marker:
+            return cached[1]
+    df = runs_to_frame(iter_runs(experiment_id, filter_string, client))
+    with _lock:
+        _frames[key] = (marker, df)
+    return df
+
+
+def config_runs(experiment_id, client=None):
+    """Una fila por configuración evaluada (runs padre), de la más reciente a la más antigua."""
+    return runs_frame(experiment_id, CONFIG_FILTER, client)
+
+
+def config_results(experiment_id, run_id, client=None):
+    """results.parquet de una run padre, en caché mientras no cambie el experimento."""
+    client = _client(client)
+    marker = experiment_marker(experiment_id, client)
+    key = (experiment_id, run_id)
+    with _lock:
+        cached = _results.get(key)
+        if cached and cached[0] == marker:
+            return cached[1]
+    df = load_results(client, run_id)
+    with _lock:
+        _results[key] = (marker, df)
+    return df
+
+
+def run_metrics(row):
+    """{métrica: valor} de una fila de `runs_frame`, sin las métricas ausentes."""
+    return {key[len("metrics."):]: value for key, value in row.items()
+            if key.startswith("metrics.") and pd.notna(value)}
+
+
+def clear_cache():
+    with _lock:
+        _experiments.clear()
+        _frames.clear()
+        _results.clear()
@@ -0,0 +1,125 @@
+# app/multi_criteria_grader.py
+"""
+Evaluador multi-criterio en una sola llamada al LLM juez.
+
+En lugar de un `LabeledCriteriaEvalChain` por criterio (que reenvía la misma
+pregunta, referencia y respuesta siete veces), se pide al juez un JSON con el
+razonamiento y el score de todos los criterios a la vez. Si la respuesta no se
+puede interpretar para algún criterio, solo ese criterio se evalúa con la
+cadena individual de siempre.
+"""
+
+import re
+import json
+import threading
+
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_classic.evaluation.criteria import LabeledCriteriaEvalChain
+
+SYSTEM_PROMPT = (
+    "Eres un evaluador experto de respuestas sobre regulación energética colombiana (CREG). "
+    "Evalúas una respuesta generada contra una respuesta de referencia según varios criterios. "
+    "Para cada criterio razona paso a paso EN ESPAÑOL y luego decide: score 1 si la respuesta "
+    "cumple el criterio, score 0 si no lo cumple. "
+    "Responde ÚNICAMENTE con un objeto JSON con esta forma exacta:\n"
+    '{{"<criterio>": {{"reasoning": "<razonamiento en español>", "score": 0 o 1}}, ...}}\n'
+    "Incluye todos estos criterios: {names}."
+)
+
+USER_PROMPT = (
+    "[Criterios]\n{criteria}\n\n"
+    "[Pregunta]\n{question}\n\n"
+    "[Respuesta de referencia]\n{reference}\n\n"
+    "[Respuesta generada]\n{prediction}"
+)
+
+
+def _parse_score(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return int(value)
+    if isinstance(value, str):
+        token = value.strip().upper()
+        if token in ("1", "Y", "SI", "SÍ", "YES", "TRUE"):
+            return 1
+        if token in ("0", "N", "NO", "FALSE"):
+            return 0
+    return None
+
+
+def parse_grades(text, criteria_names):
+    """Devuelve {criterio: {"score", "reasoning", "value"}} solo para los criterios válidos."""
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    try:
+        payload = json.loads(cleaned)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(payload, dict):
+        return {}
+
+    grades = {}
+    for name in criteria_names:
+        entry = payload.get(name)
+        if not isinstance(entry, dict):
+            continue
+        score = _parse_score(entry.get("score"))
+        if score is None:
+            continue
+        grades[name] = {
+            "score": score,
+            "reasoning": str(entry.get("reasoning", "")).strip() or "No reasoning provided",
+            "value": "Y" if score else "N",
+        }
+    return grades
+
+
+class MultiCriteriaGrader:
+    """Evaluador compatible con `evaluate_strings` que califica todos los criterios juntos.
+
+    Devuelve {"criteria": {nombre: {"score", "reasoning", "value"}},
+              "llm_calls": llamadas al juez,
+              "fallback": [criterios evaluados con la cadena individual]}.
+    """
+
+    def __init__(self, llm, criteria):
+        self.criteria = dict(criteria)
+        self.llm = llm.bind(response_format={"type": "json_object"})
+        self._fallback_llm = llm
+        self._fallback_chains = {}
+        self._lock = threading.Lock()
+
+    def _fallback_chain(self, name):
+        with self._lock:
+            if name not in self._fallback_chains:
+                self._fallback_chains[name] = LabeledCriteriaEvalChain.from_llm(
+                    llm=self._fallback_llm,
+                    criteria={name: self.criteria[name]}
+                )
+            return self._fallback_chains[name]
+
+    def evaluate_strings(self, *, prediction, reference=None, input=None, **kwargs):
+        names = list(self.criteria)
+        messages = [
+            SystemMessage(content=SYSTEM_PROMPT.format(names=", ".join(names))),
+            HumanMessage(content=USER_PROMPT.format(
+                criteria="\n".join(f"- {name}: {description}" for name, description in self.criteria.items()),
+                question=input,
+                reference=reference,
+                prediction=prediction,
+            )),
+        ]
+        response = self.llm.invoke(messages)
+
+        grades = parse_grades(response.content, names)
+        missing = [name for name in names if name not in grades]
+        for name in missing:
+            grades[name] = self._fallback_chain(name).evaluate_strings(
+                prediction=prediction, reference=reference, input=input
+            )
+
+        return {
+            "criteria": {name: grades[name] for name in names},
+            "llm_calls": 1 + len(missing),
+            "fallback": missing,
+        }
@@ -1,6 +1,13 @@
 # app/rag_pipeline.py
 
 import os
+import queue
+import asyncio
+import pickle
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 # from langchain.globals import set_verbose, get_verbose
 # set_verbose(True)  # Si quieres ver logs detallados
 
@@ -11,55 +18,285 @@ from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.prompts import PromptTemplate
-from langchain_classic.chains import ConversationalRetrievalChain
 
 from dotenv import load_dotenv
 import mlflow
 
+from app.index_manifest import (
+    file_sha256, chunk_ids, new_manifest, load_manifest, save_manifest,
+    is_compatible, diff_files,
+)
+from app.embedding_cache import CachedEmbeddings
+from app.embedding_executor import EmbeddingExecutor, shared_limiter_and_pool
+from app.index_registry import get_or_build_index
+from app.serving_store import export_serving_files, has_serving_files, load_mmap_vectorstore
+from app.ann_index import build_ann_index, save_ann_index, remove_ann_index, load_ann_index
+from app.llm_cache import get_llm_cache
+from app.tracing import StageTracer, stage_tag
+from app.micro_batch import BatchingRetriever
+from app.semantic_cache import existing_semantic_cache
+from app.condense import CONDENSE_STRATEGIES, CONDENSE_STRATEGY, CONDENSE_MODEL, CondensingRetrievalChain
+
 load_dotenv()
 
 DATA_DIR = "data/pdfs"
 PROMPT_DIR = "app/prompts"
 VECTOR_DIR = "vectorstore"
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "1") == "1"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 1))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+VECTORSTORE_MMAP = os.getenv("VECTORSTORE_MMAP", "0") == "1"
+# flat (exacto), ivf_flat, ivf_pq o hnsw
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+# Modelo de la cadena RAG y número de chunks recuperados por pregunta
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o")
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", 4))
+# Micro-batching de la recuperación en los servicios (chat y API), ver app/micro_batch.py
+RETRIEVAL_MICRO_BATCH = os.getenv("RETRIEVAL_MICRO_BATCH", "1") == "1"
+
+def http_client_kwargs(http_client=None, http_async_client=None):
+    # Clientes httpx con pool compartidos (servicio HTTP); sin ellos cada modelo crea los suyos
+    kwargs = {}
+    if http_client is not None:
+        kwargs["http_client"] = http_client
+    if http_async_client is not None:
+        kwargs["http_async_client"] = http_async_client
+    return kwargs
+
+_embedding_executors = {}   # (modelo, proveedor) -> EmbeddingExecutor con los clientes por defecto
+_embedding_lock = threading.Lock()
+
+def get_embeddings(http_client=None, http_async_client=None):
+    # Los reintentos los maneja EmbeddingExecutor con backoff y límites de tasa.
+    # Un ejecutor (pool y límite de tasa) por (modelo, proveedor) para todo el proceso; con clientes
+    # httpx propios se crea otro ejecutor, pero con el mismo pool y límite de tasa.
+    # EMBEDDING_CHECK_CTX_LENGTH=0 evita tokenizar con tiktoken (útil contra el servidor falso sin red)
+    def openai_embeddings():
+        return OpenAIEmbeddings(
+            max_retries=0,
+            check_embedding_ctx_length=os.getenv("EMBEDDING_CHECK_CTX_LENGTH", "1") == "1",
+            **http_client_kwargs(http_client, http_async_client),
+        )
+
+    model = OpenAIEmbeddings.model_fields["model"].default
+    provider = os.getenv("OPENAI_API_BASE") or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+    limiter, pool = shared_limiter_and_pool(model, provider)
+    if http_client is None and http_async_client is None:
+        with _embedding_lock:
+            if (model, provider) not in _embedding_executors:
+                _embedding_executors[model, provider] = EmbeddingExecutor(
+                    openai_embeddings(), limiter=limiter, pool=pool)
+            embeddings = _embedding_executors[model, provider]
+    else:
+        embeddings = EmbeddingExecutor(openai_embeddings(), limiter=limiter, pool=pool)
+    if EMBEDDING_CACHE:
+        return CachedEmbeddings(embeddings)
+    return embeddings
+
+def list_pdfs(path=DATA_DIR):
+    return sorted(file for file in os.listdir(path) if file.endswith(".pdf"))
+
+def load_pdf(file_path):
+    return PyPDFLoader(file_path).load()
+
+def _load_pdf_safe(file_path):
+    # Se ejecuta en los procesos del pool: un PDF corrupto no debe tumbar el lote
+    try:
+        return load_pdf(file_path), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+def iter_pdf_pages(files, path=DATA_DIR, workers=INGEST_WORKERS):
+    """Genera (archivo, páginas) en el mismo orden de `files`.
+
+    Con workers > 1 la extracción de texto corre en un pool de procesos con una
+    ventana acotada de tareas en vuelo, así la memoria no crece con el corpus.
+    Los archivos que no se pueden leer se informan y se omiten.
+    """
+    paths = [os.path.join(path, file) for file in files]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from _skip_failed(files, _ordered_window(pool, paths, window=workers * 2))
+    else:
+        yield from _skip_failed(files, map(_load_pdf_safe, paths))
 
-def load_documents(path=DATA_DIR):
+def _ordered_window(pool, paths, window):
+    pending = deque()
+    remaining = iter(paths)
+    for file_path in islice(remaining, window):
+        pending.append(pool.submit(_load_pdf_safe, file_path))
+    while pending:
+        result = pending.popleft().result()
+        for file_path in islice(remaining, 1):
+            pending.append(pool.submit(_load_pdf_safe, file_path))
+        yield result
+
+def _skip_failed(files, results):
+    for file, (pages, error) in zip(files, results):
+        if error:
+            print(f"⚠️  No se pudo leer {file}: {error}")
+            continue
+        yield file, pages
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def load_documents(path=DATA_DIR, workers=INGEST_WORKERS):
     docs = []
-    for file in os.listdir(path):
-        if file.endswith(".pdf"):
-            loader = PyPDFLoader(os.path.join(path, file))
-            docs.extend(loader.load())
+    for _, pages in iter_pdf_pages(list_pdfs(path), path, workers):
+        docs.extend(pages)
     return docs
 
-def save_vectorstore(chunk_size=512, chunk_overlap=50, persist_path=VECTOR_DIR):
-    docs = load_documents()
+def save_vectorstore(chunk_size=512, chunk_overlap=50, persist_path=VECTOR_DIR,
+                     data_path=DATA_DIR, embeddings=None, incremental=True, workers=INGEST_WORKERS,
+                     batch_size=EMBED_BATCH_SIZE, index_type=INDEX_TYPE, index_params=None, answer_cache=None):
+    embeddings = embeddings or get_embeddings()
+    embedding_model = getattr(embeddings, "model", type(embeddings).__name__)
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
+        chunk_overlap=chunk_overlap,
+        add_start_index=True
     )
-    chunks = splitter.split_documents(docs)
-    embeddings = OpenAIEmbeddings()
-    vectordb = FAISS.from_documents(chunks, embedding=embeddings)
+
+    # Reutilizar el índice existente solo si se construyó con la misma configuración
+    manifest = load_manifest(persist_path)
+    vectordb = None
+    if incremental and is_compatible(manifest, chunk_size, chunk_overlap, embedding_model) \
+            and os.path.exists(os.path.join(persist_path, "index.faiss")):
+        vectordb = FAISS.load_local(persist_path, embeddings, allow_dangerous_deserialization=True)
+    else:
+        manifest = new_manifest(chunk_size, chunk_overlap, embedding_model)
+
+    current = {file: file_sha256(os.path.join(data_path, file)) for file in list_pdfs(data_path)}
+    added, changed, removed = diff_files(manifest, current)
+
+    stale_ids = []
+    for file in removed:
+        stale_ids.extend(manifest["files"].pop(file)["chunks"])
+
+    # Solo se parsean y embeben los archivos nuevos o modificados. Páginas, chunks y
+    # embeddings fluyen por lotes: la memoria pico depende de batch_size, no del corpus.
+    stats = {"n_docs": 0, "n_embedded": 0}
+    read = set()
+
+    def new_chunks():
+        for file, docs in iter_pdf_pages(added + changed, data_path, workers):
+            read.add(file)
+            stats["n_docs"] += len(docs)
+            chunks = splitter.split_documents(docs)
+            ids = chunk_ids(chunks)
+            previous = set(manifest["files"].get(file, {}).get("chunks", []))
+            stale_ids.extend(previous.difference(ids))
+            manifest["files"][file] = {"sha256": current[file], "chunks": ids}
+            for chunk, chunk_id in zip(chunks, ids):
+                if chunk_id not in previous:
+                    yield chunk, chunk_id
+
+    for batch in batched(new_chunks(), batch_size):
+        texts = [chunk.page_content for chunk, _ in batch]
+        metadatas = [chunk.metadata for chunk, _ in batch]
+        ids = [chunk_id for _, chunk_id in batch]
+        vectors = embeddings.embed_documents(texts)
+        if vectordb is None:
+            vectordb = FAISS.from_embeddings(zip(texts, vectors), embeddings, metadatas=metadatas, ids=ids)
+        else:
+            vectordb.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+        stats["n_embedded"] += len(batch)
+
+    # Un archivo ya indexado que cambió y ahora no se puede leer se trata como borrado:
+    # seguir sirviendo sus chunks viejos daría respuestas de una versión que ya no existe
+    unreadable = [file for file in changed if file not in read]
+    for file in unreadable:
+        print(f"⚠️  {file} cambió y no se pudo leer: se quitan sus chunks del índice")
+        stale_ids.extend(manifest["files"].pop(file)["chunks"])
+
+    if vectordb is not None and stale_ids:
+        vectordb.delete(stale_ids)
+    if vectordb is None:
+        raise ValueError(f"No hay documentos para indexar en {data_path}")
+
+    # Primero los archivos de servicio (mmap) y después index.faiss: quien recargue al ver
+    # un index.faiss nuevo encuentra ya publicados sus vectores y su docstore
+    export_serving_files(vectordb, persist_path)
     vectordb.save_local(persist_path)
+    save_manifest(manifest, persist_path)
+
+    # Respuestas cacheadas del chat: con chunks nuevos se descartan todas, si no las que usaban chunks borrados.
+    # Sin `answer_cache` solo se toca la caché del índice si ya existe (no se crea para índices temporales).
+    if answer_cache is None:
+        answer_cache = existing_semantic_cache(persist_path)
+    answers_invalidated = 0
+    if answer_cache is not None and (stats["n_embedded"] or stale_ids):
+        answers_invalidated = answer_cache.invalidate(None if stats["n_embedded"] else stale_ids)
+
+    # index.faiss siempre es plano (incremental y referencia de recall); el ANN se deriva de él
+    ann_params = {}
+    if index_type != "flat":
+        ann_index, ann_params = build_ann_index(vectordb.index, index_type, index_params)
+        save_ann_index(ann_index, index_type, ann_params, persist_path)
+    else:
+        remove_ann_index(persist_path)
+    n_chunks = len(vectordb.index_to_docstore_id)
 
     mlflow.set_experiment("vectorstore_tracking")
     with mlflow.start_run(run_name="vectorstore_build"):
         mlflow.log_param("chunk_overlap", chunk_overlap)
-        mlflow.log_param("n_chunks", len(chunks))
-        mlflow.log_param("n_docs", len(docs))
+        mlflow.log_param("n_chunks", n_chunks)
+        mlflow.log_param("n_docs", stats["n_docs"])
+        mlflow.log_param("incremental", incremental)
+        mlflow.log_param("ingest_workers", workers)
+        mlflow.log_param("embed_batch_size", batch_size)
+        mlflow.log_param("index_type", index_type)
+        for name, value in ann_params.items():
+            mlflow.log_param(f"index_{name}", value)
+        mlflow.log_metric("files_added", len(added))
+        mlflow.log_metric("files_changed", len(changed))
+        mlflow.log_metric("files_removed", len(removed))
+        mlflow.log_metric("files_unreadable", len(unreadable))
+        mlflow.log_metric("chunks_embedded", stats["n_embedded"])
+        mlflow.log_metric("chunks_deleted", len(stale_ids))
+        mlflow.log_metric("semantic_cache_invalidated", answers_invalidated)
+        log_embedding_stats(embeddings)
         mlflow.set_tag("vectorstore", persist_path)
+    return vectordb
 
-def load_vectorstore(chunk_size=512, chunk_overlap=50):
-    docs = load_documents()
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    chunks = splitter.split_documents(docs)
-    embeddings = OpenAIEmbeddings()
-    return FAISS.from_documents(chunks, embedding=embeddings)
+def log_embedding_stats(embeddings):
+    # Recorre las capas (caché -> ejecutor -> modelo) y registra sus contadores
+    layer = embeddings
+    while layer is not None:
+        if isinstance(layer, CachedEmbeddings):
+            for name, value in layer.cache.stats().items():
+                mlflow.log_metric(f"embedding_cache_{name}", value)
+        elif isinstance(layer, EmbeddingExecutor):
+            for name, value in layer.stats().items():
+                mlflow.log_metric(f"embedding_executor_{name}", value)
+        layer = getattr(layer, "embeddings", None)
 
-def load_vectorstore_from_disk(persist_path=VECTOR_DIR):
-    embeddings = OpenAIEmbeddings()
+def load_vectorstore(chunk_size=512, chunk_overlap=50, data_path=DATA_DIR, embeddings=None):
+    # Reutiliza el índice registrado para (corpus, chunk_size, chunk_overlap, modelo)
+    embeddings = embeddings or get_embeddings()
+    vectordb, _ = get_or_build_index(chunk_size, chunk_overlap, data_path, embeddings)
+    return vectordb
+
+def load_vectorstore_from_disk(persist_path=VECTOR_DIR, embeddings=None, mmap=VECTORSTORE_MMAP,
+                               use_ann=True, search_params=None):
+    embeddings = embeddings or get_embeddings()
+    # Si save_vectorstore construyó un índice ANN, se usa en lugar del plano
+    ann_index, _ = load_ann_index(persist_path, search_params, mmap=mmap) if use_ann else (None, None)
+    if mmap:
+        if has_serving_files(persist_path):
+            # Solo lectura, memoria compartida entre workers y sin deserializar pickle
+            vectordb = load_mmap_vectorstore(persist_path, embeddings)
+            if ann_index is not None:
+                vectordb.index = ann_index
+            return vectordb
+        print(f"⚠️  {persist_path} no tiene archivos de servicio; reconstruye con save_vectorstore(). Usando load_local.")
+    if ann_index is not None:
+        with open(os.path.join(persist_path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(embeddings, ann_index, docstore, index_to_docstore_id)
     return FAISS.load_local(persist_path, embeddings, allow_dangerous_deserialization=True)
 
 def load_prompt(version="v1_asistente_creg_didactico"):
@@ -70,12 +307,127 @@ def load_prompt(version="v1_asistente_creg_didactico"):
         prompt_text = f.read()
     return PromptTemplate(input_variables=["context", "question"], template=prompt_text)
 
-def build_chain(vectordb, prompt_version="v1_asistente_creg_didactico"):
+def build_chain(vectordb, prompt_version="v1_asistente_creg_didactico", k=RETRIEVER_K, model=CHAT_MODEL,
+                streaming=False, return_sources=False, http_client=None, http_async_client=None,
+                micro_batch=False, condense=CONDENSE_STRATEGY):
+    # streaming=True: el LLM emite los tokens por callbacks (ver stream_answer); la respuesta final es la misma.
+    # return_sources=True agrega "source_documents" al resultado (servicio HTTP).
+    # micro_batch=True: las preguntas concurrentes se embeben y buscan en lote (mismos documentos)
+    # condense: cuándo y con qué modelo se reformulan las preguntas de seguimiento (ver app/condense.py)
+    if condense not in CONDENSE_STRATEGIES:
+        raise ValueError(f"Estrategia de condensación desconocida: {condense} (opciones: {CONDENSE_STRATEGIES})")
     prompt = load_prompt(prompt_version)
-    retriever = vectordb.as_retriever()
-    return ConversationalRetrievalChain.from_llm(
-        llm = ChatOpenAI(model="gpt-4o", temperature=0),
+    if micro_batch:
+        retriever = BatchingRetriever(vectordb, k=k)
+    else:
+        retriever = vectordb.as_retriever(search_kwargs={"k": k})
+    llm_kwargs = {"streaming": True, "stream_usage": True} if streaming else {}
+    llm_kwargs.update(http_client_kwargs(http_client, http_async_client))
+    # Solo se transmiten los tokens de la respuesta: el modelo chico de condensación no hace streaming
+    condense_llm = None
+    if condense == "small":
+        condense_llm = ChatOpenAI(model=CONDENSE_MODEL, temperature=0, cache=get_llm_cache(),
+                                  **http_client_kwargs(http_client, http_async_client))
+    chain = CondensingRetrievalChain.from_llm(
+        llm = ChatOpenAI(model=model, temperature=0, cache=get_llm_cache(), **llm_kwargs),
         retriever=retriever,
+        condense_question_llm=condense_llm,
         combine_docs_chain_kwargs={"prompt": prompt},
-        return_source_documents=False
+        return_source_documents=return_sources,
+        condense_strategy=condense
     )
+    # Etiquetas que StageTracer usa para separar condensación y generación
+    chain.question_generator.tags = [stage_tag("condense")]
+    chain.combine_docs_chain.tags = [stage_tag("generation")]
+    return chain
+
+def stream_answer(chain, inputs, tracer=None, cache=None):
+    """Genera la respuesta de la cadena token por token a medida que llega.
+
+    La cadena corre en un hilo y los tokens de la etapa de generación pasan por
+    `StageTracer.on_token` a una cola. Si el modelo no hace streaming (o la
+    respuesta sale de la caché de LLM) se genera la respuesta completa de una
+    vez. Lo generado, concatenado, es la respuesta final (`st.write_stream` la devuelve).
+
+    Con `cache` (app/semantic_cache.py) una pregunta parecida a una ya
+    respondida devuelve esa respuesta sin invocar la cadena, y las nuevas se guardan.
+    """
+    tracer = tracer or StageTracer()
+    lookup = cache.lookup(chain, inputs) if cache else None
+    if lookup:
+        tracer.add_latency("cache", lookup["latency"])
+        if lookup["hit"]:
+            tracer.add_latency("total", lookup["latency"])
+            yield lookup["hit"]["answer"]
+            return
+    tokens = queue.Queue()
+    done = object()
+    outcome = {}
+    tracer.on_token = tokens.put
+
+    def run():
+        try:
+            outcome["result"] = chain.invoke(inputs, config={"callbacks": [tracer]})
+        except BaseException as error:
+            outcome["error"] = error
+        finally:
+            tokens.put(done)
+
+    threading.Thread(target=run, name="stream_answer", daemon=True).start()
+    streamed = False
+    while (token := tokens.get()) is not done:
+        streamed = True
+        yield token
+    if "error" in outcome:
+        raise outcome["error"]
+    if lookup:
+        cache.store(lookup, outcome["result"]["answer"], tracer.documents, tracer.latency.get("total"))
+    if not streamed:
+        yield outcome["result"]["answer"]
+
+
+async def astream_answer(chain, inputs, tracer=None, result=None, cache=None):
+    """Versión async de `stream_answer` (servicio HTTP): corre la cadena con `ainvoke`.
+
+    Si se pasa `result` (dict), al terminar se completa con la salida de la cadena
+    (respuesta y, si la cadena los devuelve, documentos fuente). En un acierto de
+    `cache` incluye además "cached_question", la pregunta guardada que se usó.
+    """
+    tracer = tracer or StageTracer()
+    result = {} if result is None else result
+    # El embedding de la pregunta es una llamada bloqueante
+    lookup = await asyncio.to_thread(cache.lookup, chain, inputs) if cache else None
+    if lookup:
+        tracer.add_latency("cache", lookup["latency"])
+        if lookup["hit"]:
+            tracer.add_latency("total", lookup["latency"])
+            result.update({"answer": lookup["hit"]["answer"], "source_documents": lookup["hit"]["source_documents"],
+                           "cached_question": lookup["hit"]["question"]})
+            yield result["answer"]
+            return
+    loop = asyncio.get_running_loop()
+    tokens = asyncio.Queue()
+    done = object()
+    tracer.on_token = lambda token: loop.call_soon_threadsafe(tokens.put_nowait, token)
+
+    async def run():
+        try:
+            return await chain.ainvoke(inputs, config={"callbacks": [tracer]})
+        finally:
+            loop.call_soon_threadsafe(tokens.put_nowait, done)
+
+    task = asyncio.create_task(run())
+    streamed = False
+    try:
+        while (token := await tokens.get()) is not done:
+            streamed = True
+            yield token
+        output = await task
+    finally:
+        # Cliente desconectado a mitad de la respuesta: se cancela la invocación
+        task.cancel()
+    result.update(output)
+    if lookup:
+        cache.store(lookup, output["answer"], tracer.documents, tracer.latency.get("total"))
+    if not streamed:
+        yield output["answer"]
@@ -0,0 +1,100 @@
+# app/rate_limit.py
+"""
+Límites de tasa y reintentos para llamadas a proveedores de LLM/embeddings.
+
+`RateLimiter` es un token bucket doble (solicitudes y tokens por minuto),
+seguro entre hilos. `call_with_retry` reintenta errores transitorios con
+backoff exponencial y jitter, respetando `Retry-After` cuando el proveedor lo envía.
+"""
+
+import time
+import random
+import threading
+
+import openai
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class RateLimiter:
+    """Bloquea hasta que haya presupuesto de solicitudes y tokens por minuto."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute,
+                                 self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute,
+                               self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens=0):
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return
+        # Una solicitud más grande que el presupuesto completo espera a tener el bucket lleno
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+                if wait == 0.0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return
+            time.sleep(wait)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(fn, *args, max_retries=6, base_delay=1.0, max_delay=60.0,
+                    on_retry=None, before_attempt=None, **kwargs):
+    """Ejecuta fn(*args, **kwargs) reintentando errores transitorios del proveedor.
+
+    `before_attempt()` se llama antes de cada intento, reintentos incluidos
+    (p. ej. para tomar presupuesto del `RateLimiter`).
+    """
+    for attempt in range(max_retries + 1):
+        if before_attempt:
+            before_attempt()
+        try:
+            return fn(*args, **kwargs)
+        except RETRYABLE_ERRORS as error:
+            if attempt == max_retries:
+                raise
+            delay = _retry_after(error)
+            if delay is None:
+                # Backoff exponencial con "full jitter"
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if on_retry:
+                on_retry(error, delay)
+            time.sleep(delay)
@@ -0,0 +1,98 @@
+# app/resources.py
+"""
+Caché de recursos a nivel de proceso: embeddings, vectorstore, cadena RAG y
+caché semántica de respuestas.
+
+Streamlit re-ejecuta el script en cada interacción, pero los módulos importados
+permanecen en memoria. Estos recursos se construyen una sola vez por proceso
+y solo se recargan cuando cambia algún archivo del índice en disco (mtime + hash).
+"""
+
+import os
+import hashlib
+import threading
+
+from app.rag_pipeline import (
+    VECTOR_DIR, RETRIEVAL_MICRO_BATCH, get_embeddings, load_vectorstore_from_disk, build_chain,
+)
+from app.ann_index import ANN_INDEX_NAME, ANN_META_NAME
+from app.index_manifest import MANIFEST_NAME
+from app.micro_batch import close_batching
+from app.semantic_cache import get_semantic_cache
+from app.serving_store import SERVING_META
+
+_lock = threading.RLock()
+_embeddings = None
+_vectorstores = {}   # persist_path -> (firma, vectordb)
+_chains = {}         # (persist_path, prompt_version, streaming) -> (firma, chain)
+_hash_memo = {}      # ruta -> ((tamaño, mtime), sha256)
+
+# Todo lo que save_vectorstore reescribe: vectores, docstore, archivos de servicio (mmap), manifiesto e índice ANN
+_SIGNATURE_FILES = ("index.faiss", "index.pkl", SERVING_META, MANIFEST_NAME, ANN_META_NAME, ANN_INDEX_NAME)
+
+
+def _file_hash(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (st.st_size, st.st_mtime_ns)
+    memo = _hash_memo.get(path)
+    if memo is None or memo[0] != key:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _hash_memo[path] = memo = (key, h.hexdigest())
+    return memo[1]
+
+
+def index_signature(persist_path=VECTOR_DIR):
+    """Firma del índice en disco; cada hash solo se recalcula si cambia el mtime o el tamaño de su archivo."""
+    persist_path = os.path.abspath(persist_path)
+    if not os.path.exists(os.path.join(persist_path, "index.faiss")):
+        raise FileNotFoundError(os.path.join(persist_path, "index.faiss"))
+    return tuple(_file_hash(os.path.join(persist_path, name)) for name in _SIGNATURE_FILES)
+
+
+def get_shared_embeddings():
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            _embeddings = get_embeddings()
+        return _embeddings
+
+
+def get_vectorstore(persist_path=VECTOR_DIR):
+    signature = index_signature(persist_path)
+    with _lock:
+        cached = _vectorstores.get(persist_path)
+        if cached is None or cached[0] != signature:
+            vectordb = load_vectorstore_from_disk(persist_path, embeddings=get_shared_embeddings())
+            _vectorstores[persist_path] = (signature, vectordb)
+        return _vectorstores[persist_path][1]
+
+
+def get_chain(prompt_version="v1_asistente_creg_didactico", persist_path=VECTOR_DIR, streaming=False):
+    """Cadena RAG compartida por todas las sesiones (no guarda estado de conversación)."""
+    signature = index_signature(persist_path)
+    key = (persist_path, prompt_version, streaming)
+    replaced = None
+    with _lock:
+        cached = _chains.get(key)
+        if cached is None or cached[0] != signature:
+            # Las sesiones comparten la cadena: sus preguntas simultáneas se recuperan en lote
+            chain = build_chain(get_vectorstore(persist_path), prompt_version=prompt_version, streaming=streaming,
+                                micro_batch=RETRIEVAL_MICRO_BATCH)
+            _chains[key] = (signature, chain)
+            replaced = cached
+        chain = _chains[key][1]
+    # Fuera del bloqueo: cerrar espera el lote en vuelo (embedding por HTTP) y no debe frenar otras sesiones
+    if replaced is not None:
+        close_batching(replaced[1])
+    return chain
+
+
+def get_answer_cache(persist_path=VECTOR_DIR):
+    """Caché semántica de respuestas del índice (None si SEMANTIC_CACHE=0)."""
+    return get_semantic_cache(persist_path)
@@ -3,10 +3,13 @@
 Análisis completo del sistema implementado
 """
 
-import mlflow
-import pandas as pd
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 from datetime import datetime
 
+from app.mlflow_queries import list_experiments, config_runs, run_metrics
+
 print("="*80)
 print("🎓 DESAFÍO ESTUDIANTE GENAIOPS - RESUMEN FINAL")
 print("="*80)
@@ -14,8 +17,7 @@ print(f"📅 Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 print("="*80)
 
 # Obtener experimentos
-client = mlflow.tracking.MlflowClient()
-experiments = [exp for exp in client.search_experiments() if exp.name.startswith("eval_")]
+experiments = list_experiments("eval_")
 
 print(f"\n✅ Total de experimentos creados: {len(experiments)}")
 for exp in experiments:
@@ -23,26 +25,21 @@ for exp in experiments:
 
 # Analizar experimento avanzado
 exp_name = "eval_advanced_v1_asistente_creg_didactico"
-experiment = client.get_experiment_by_name(exp_name)
+experiment = next((exp for exp in experiments if exp.name == exp_name), None)
 
 if experiment:
     print(f"\n{'='*80}")
     print(f"📊 ANÁLISIS DEL EXPERIMENTO PRINCIPAL: {exp_name}")
     print(f"{'='*80}")
     
-    runs = client.search_runs(experiment_ids=[experiment.experiment_id])
-    
-    print(f"\n✅ Total de evaluaciones: {len(runs)}")
-    
-    # Recopilar métricas
-    data = []
-    for run in runs:
-        metrics = run.data.metrics
-        data.append(metrics)
+    # Agregados de la corrida más reciente (run padre de la configuración)
+    runs = config_runs(experiment.experiment_id)
+    summary = run_metrics(runs.iloc[0]) if not runs.empty else {}
+    n_questions = int(summary.get("n_questions", 0))
     
-    df = pd.DataFrame(data)
+    print(f"\n✅ Total de evaluaciones: {n_questions}")
     
-    # Calcular estadísticas
+    # Estadísticas precalculadas
     print("\n📊 RESULTADOS GLOBALES:")
     print("-"*80)
     
@@ -59,8 +56,8 @@ if experiment:
     ]
     
     for label, col in criteria:
-        if col in df.columns:
-            avg = df[col].mean()
+        if col in summary:
+            avg = summary[col]
             emoji = "🟢" if avg >= 0.7 else "🟡" if avg >= 0.5 else "🔴"
             print(f"{emoji} {label:25s}: {avg*100:5.1f}%")
     
@@ -68,39 +65,39 @@ if experiment:
     print("🏆 LOGROS DESTACADOS:")
     print("="*80)
     
-    if 'toxicity_score' in df.columns:
-        tox_avg = df['toxicity_score'].mean()
+    if 'toxicity_score' in summary:
+        tox_avg = summary['toxicity_score']
         if tox_avg == 1.0:
             print("🛡️  ¡CERO TOXICIDAD! - Todas las respuestas son respetuosas")
     
-    if 'harmfulness_score' in df.columns:
-        harm_avg = df['harmfulness_score'].mean()
+    if 'harmfulness_score' in summary:
+        harm_avg = summary['harmfulness_score']
         if harm_avg == 1.0:
             print("✅ ¡CERO CONTENIDO DAÑINO! - Información segura al 100%")
     
-    if 'coherence_score' in df.columns:
-        coh_avg = df['coherence_score'].mean()
+    if 'coherence_score' in summary:
+        coh_avg = summary['coherence_score']
         if coh_avg == 1.0:
             print("📝 ¡COHERENCIA PERFECTA! - Estructura impecable en todas las respuestas")
     
-    if 'qa_is_correct' in df.columns:
-        qa_avg = df['qa_is_correct'].mean()
-        correct_count = df['qa_is_correct'].sum()
-        total = len(df[df['qa_is_correct'].notna()])
+    if 'qa_is_correct' in summary:
+        qa_avg = summary['qa_is_correct']
+        correct_count = qa_avg * n_questions
+        total = n_questions
         print(f"✅ PRECISIÓN: {correct_count:.0f}/{total} preguntas correctas ({qa_avg*100:.1f}%)")
     
     print("\n" + "="*80)
     print("⚠️ ÁREAS DE MEJORA IDENTIFICADAS:")
     print("="*80)
     
-    if 'conciseness_score' in df.columns:
-        conc_avg = df['conciseness_score'].mean()
+    if 'conciseness_score' in summary:
+        conc_avg = summary['conciseness_score']
         if conc_avg < 0.5:
             print(f"📏 CONCISIÓN: {conc_avg*100:.1f}% - Sistema muy verboso")
             print("   💡 Solución: Usar prompt v2_creg_conciso.txt")
     
-    if 'correctness_score' in df.columns:
-        corr_avg = df['correctness_score'].mean()
+    if 'correctness_score' in summary:
+        corr_avg = summary['correctness_score']
         if corr_avg < 0.7:
             print(f"🎯 CORRECCIÓN: {corr_avg*100:.1f}% - Mejorable")
             print("   💡 Solución: Ajustar chunk_size o mejorar retrieval")
@@ -4,7 +4,13 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import json
 import mlflow
 from dotenv import load_dotenv
-from app.rag_pipeline import load_vectorstore_from_disk, build_chain
+from app.rag_pipeline import VECTOR_DIR, load_vectorstore_from_disk, build_chain
+from app.eval_engine import evaluate_dataset, EVAL_CONCURRENCY
+from app.llm_cache import get_llm_cache, llm_cache_metrics
+from app.mlflow_buffer import buffered_run
+from app.eval_summary import log_config_summary
+from app.eval_checkpoint import EvalCheckpoint, eval_config, question_id
+from app.tracing import stage_summary_lines
 
 from langchain_openai import ChatOpenAI
 from langchain_classic.evaluation.qa import QAEvalChain
@@ -26,43 +32,79 @@ vectordb = load_vectorstore_from_disk()
 chain = build_chain(vectordb, prompt_version=PROMPT_VERSION)
 
 # LangChain Evaluator
-llm = ChatOpenAI(temperature=0)
+llm = ChatOpenAI(temperature=0, cache=get_llm_cache())
 langchain_eval = QAEvalChain.from_llm(llm)
 
 # ✅ Establecer experimento una vez
 mlflow.set_experiment(f"eval_{PROMPT_VERSION}")
 print(f"📊 Experimento MLflow: eval_{PROMPT_VERSION}")
-
-# Evaluación por lote
-for i, pair in enumerate(dataset):
-    pregunta = pair["question"]
-    respuesta_esperada = pair["answer"]
-
-    with mlflow.start_run(run_name=f"eval_q{i+1}"):
-        result = chain.invoke({"question": pregunta, "chat_history": []})
-        respuesta_generada = result["answer"]
-
-        # Evaluación con LangChain
-        graded = langchain_eval.evaluate_strings(
-            input=pregunta,
-            prediction=respuesta_generada,
-            reference=respuesta_esperada
-        )
-
-        # 🔍 Imprimir el contenido real
-        print(f"\n📦 Resultado evaluación LangChain para pregunta {i+1}/{len(dataset)}:")
-        print(graded)
-
-        lc_verdict = graded.get("value", "UNKNOWN")
-        is_correct = graded.get("score", 0)
-
-        # Log en MLflow
-        mlflow.log_param("question", pregunta)
-        mlflow.log_param("prompt_version", PROMPT_VERSION)
-        mlflow.log_param("chunk_size", CHUNK_SIZE)
-        mlflow.log_param("chunk_overlap", CHUNK_OVERLAP)
-
-        mlflow.log_metric("lc_is_correct", is_correct)
-
-        print(f"✅ Pregunta: {pregunta}")
-        print(f"🧠 LangChain Eval: {lc_verdict}")
+print(f"⚡ Concurrencia: {EVAL_CONCURRENCY}")
+
+# Checkpoint: si una corrida anterior de esta configuración quedó a medias, se reanuda
+checkpoint = EvalCheckpoint(eval_config(
+    "run_eval", DATASET_PATH, VECTOR_DIR,
+    prompt_version=PROMPT_VERSION, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+))
+
+
+def log_result(result):
+    # Se llama en el orden del dataset, aunque las preguntas se evalúen en paralelo
+    i = result["index"]
+    pregunta = result["question"]
+    graded = result["grades"]["lc"]
+
+    # 🔍 Imprimir el contenido real
+    print(f"\n📦 Resultado evaluación LangChain para pregunta {i+1}/{len(dataset)}:")
+    print(graded)
+
+    lc_verdict = graded.get("value", "UNKNOWN")
+    is_correct = graded.get("score", 0)
+
+    # Log en MLflow (un solo log_batch por pregunta)
+    run_name = f"eval_q{i+1}"
+    with buffered_run(run_name, parent_run_id=checkpoint.parent_run_id,
+                      tags={"question_id": question_id(pregunta), "eval_level": "question"}) as run:
+        run.log_param("question", pregunta)
+        run.log_param("prompt_version", PROMPT_VERSION)
+        run.log_param("chunk_size", CHUNK_SIZE)
+        run.log_param("chunk_overlap", CHUNK_OVERLAP)
+
+        run.log_metric("lc_is_correct", is_correct)
+        run.log_metric("latency", result["latency"])
+        run.log_metrics(result["stages"])
+        run.log_metrics(llm_cache_metrics())
+
+    # Fila de results.parquet de la run padre
+    record = {
+        "index": i,
+        "question_id": question_id(pregunta),
+        "run_id": run.run_id,
+        "run_name": run_name,
+        "question": pregunta,
+        "expected": result["expected"],
+        "answer": result["answer"],
+        "latency": result["latency"],
+        "lc_is_correct": is_correct,
+        **result["stages"],
+    }
+    checkpoint.mark_done(pregunta, run.run_id, record)
+    print(f"✅ Pregunta: {pregunta}")
+    print(f"🧠 LangChain Eval: {lc_verdict}")
+
+
+# Evaluación por lote, como runs hijas de la run padre de la configuración
+with checkpoint.parent_run(f"eval_{PROMPT_VERSION}"):
+    pending = checkpoint.pending_indices(dataset)
+    if len(pending) < len(dataset):
+        print(f"⏭️  Saltando {len(dataset) - len(pending)} preguntas ya evaluadas")
+    evaluate_dataset(chain, dataset, {"lc": langchain_eval}, on_result=log_result, indices=pending)
+
+    # Agregados de la configuración en la run padre
+    summary = log_config_summary(checkpoint.parent_run_id, checkpoint.records(),
+                                 ["lc_is_correct"], pass_column="lc_is_correct")
+    checkpoint.mark_finished()
+
+print(f"\n📈 Precisión: {summary.get('lc_is_correct', 0):.2f} "
+      f"| latencia p50/p95: {summary.get('latency_p50', 0):.2f}s / {summary.get('latency_p95', 0):.2f}s")
+for line in stage_summary_lines(summary):
+    print(f"   ⏱️  {line}")
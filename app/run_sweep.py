@@ -0,0 +1,174 @@
+"""
+Barrido (grid) de configuraciones RAG: prompt, chunk_size, chunk_overlap, k y modelo.
+
+Se construye o reutiliza un índice por par (chunk_size, chunk_overlap) desde el
+registro de índices, y las configuraciones se evalúan en paralelo compartiendo
+embeddings, caché de LLM, evaluadores y límites de tasa. Cada configuración es
+una run padre comparable en el experimento MLflow `sweep_eval` (reanudable con
+su checkpoint), con sus runs hijas por pregunta y los agregados de siempre.
+
+Uso:
+    python app/run_sweep.py --grid app/sweeps/chunk_size.json
+    python app/run_sweep.py --prompt v1_asistente_creg_didactico --prompt v2_creg_conciso \\
+        --chunk-size 512 --chunk-size 1024 --overlap 50 --k 4 --k 8
+"""
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import mlflow
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+from app.rag_pipeline import DATA_DIR, CHAT_MODEL, RETRIEVER_K, build_chain, get_embeddings
+from app.index_registry import get_or_build_index, registry_path
+from app.eval_engine import GRADER_MODE, EVAL_CONCURRENCY, build_evaluators
+from app.eval_checkpoint import EvalCheckpoint, eval_config
+from app.eval_runner import evaluate_config
+from app.llm_cache import get_llm_cache
+
+load_dotenv()
+
+DATASET_PATH = "tests/eval_dataset_creg.json"
+# Sin el prefijo eval_ de run_eval.py: estas runs registran qa_is_correct, no lc_is_correct
+SWEEP_EXPERIMENT = os.getenv("SWEEP_EXPERIMENT", "sweep_eval")
+SWEEP_CONCURRENCY = int(os.getenv("SWEEP_CONCURRENCY", 2))
+
+# Orden fijo de las dimensiones del grid
+GRID_KEYS = ("prompt_version", "chunk_size", "chunk_overlap", "k", "model")
+
+
+def default_grid():
+    return {
+        "prompt_version": [os.getenv("PROMPT_VERSION", "v1_asistente_creg_didactico")],
+        "chunk_size": [int(os.getenv("CHUNK_SIZE", 512))],
+        "chunk_overlap": [int(os.getenv("CHUNK_OVERLAP", 50))],
+        "k": [RETRIEVER_K],
+        "model": [CHAT_MODEL],
+    }
+
+
+def expand_grid(grid):
+    """{dimensión: [valores]} -> lista de configuraciones (producto cartesiano, sin repetidos)."""
+    unknown = set(grid) - set(GRID_KEYS)
+    if unknown:
+        raise ValueError(f"Dimensiones no soportadas: {', '.join(sorted(unknown))}. Opciones: {', '.join(GRID_KEYS)}")
+    grid = {**default_grid(), **grid}
+    values = [list(dict.fromkeys(grid[key])) for key in GRID_KEYS]
+    return [dict(zip(GRID_KEYS, combo)) for combo in itertools.product(*values)]
+
+
+def config_name(config):
+    return (f"{config['prompt_version']}|cs{config['chunk_size']}|ov{config['chunk_overlap']}"
+            f"|k{config['k']}|{config['model']}")
+
+
+def build_indices(configs, data_path=DATA_DIR, embeddings=None):
+    """Un índice por (chunk_size, chunk_overlap): {par: (vectordb, ruta en el registro)}."""
+    embeddings = embeddings or get_embeddings()
+    indices = {}
+    for pair in dict.fromkeys((c["chunk_size"], c["chunk_overlap"]) for c in configs):
+        start = time.perf_counter()
+        vectordb, hit = get_or_build_index(*pair, data_path, embeddings)
+        indices[pair] = (vectordb, registry_path(*pair, data_path, embeddings))
+        status = "reutilizado" if hit else "construido"
+        print(f"📦 Índice chunk_size={pair[0]} overlap={pair[1]}: {status} ({time.perf_counter() - start:.1f}s)")
+    return indices
+
+
+def make_checkpoint(config, index_path, dataset_path=DATASET_PATH, script="run_sweep"):
+    return EvalCheckpoint(eval_config(script, dataset_path, index_path, grader_mode=GRADER_MODE, **config))
+
+
+def run_sweep(configs, dataset, evaluators, indices, dataset_path=DATASET_PATH,
+              max_parallel=SWEEP_CONCURRENCY, max_concurrency=EVAL_CONCURRENCY,
+              question_indices=None, finish=True, on_logged=None, checkpoints=None):
+    """Evalúa cada configuración en paralelo; devuelve [(config, agregados)] en el orden de `configs`.
+
+    `question_indices`, `finish` y `on_logged` se pasan a `evaluate_config`. `checkpoints`
+    ({config_name: EvalCheckpoint}) permite seguir agregando preguntas a las mismas runs
+    padre entre llamadas, como hace el tuner por halving.
+    """
+    def run_one(config):
+        vectordb, index_path = indices[(config["chunk_size"], config["chunk_overlap"])]
+        chain = build_chain(vectordb, prompt_version=config["prompt_version"], k=config["k"], model=config["model"])
+        checkpoint = (checkpoints or {}).get(config_name(config)) or make_checkpoint(config, index_path, dataset_path)
+        summary = evaluate_config(chain, dataset, evaluators, checkpoint, config_name(config),
+                                  params={**config, "grader_mode": GRADER_MODE}, indices=question_indices,
+                                  max_concurrency=max_concurrency, on_logged=on_logged, finish=finish)
+        print(f"✅ {config_name(config)}: avg_criteria_score={summary.get('avg_criteria_score', 0):.3f} "
+              f"pass_rate={summary.get('pass_rate', 0):.2f} p95={summary.get('latency_p95', 0):.2f}s")
+        return summary
+
+    with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="sweep") as pool:
+        return list(zip(configs, pool.map(run_one, configs)))
+
+
+def load_grid(args):
+    grid = {}
+    if args.grid:
+        with open(args.grid, encoding="utf-8") as f:
+            grid = json.load(f)
+    overrides = {
+        "prompt_version": args.prompts,
+        "chunk_size": args.chunk_sizes,
+        "chunk_overlap": args.overlaps,
+        "k": args.ks,
+        "model": args.models,
+    }
+    grid.update({key: values for key, values in overrides.items() if values})
+    return grid
+
+
+def add_grid_arguments(parser):
+    parser.add_argument("--grid", help="JSON {dimensión: [valores]} con dimensiones " + ", ".join(GRID_KEYS))
+    parser.add_argument("--prompt", action="append", dest="prompts")
+    parser.add_argument("--chunk-size", action="append", dest="chunk_sizes", type=int)
+    parser.add_argument("--overlap", action="append", dest="overlaps", type=int)
+    parser.add_argument("--k", action="append", dest="ks", type=int)
+    parser.add_argument("--model", action="append", dest="models")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--parallel", type=int, default=SWEEP_CONCURRENCY, help="Configuraciones en paralelo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de configuraciones RAG con evaluación avanzada")
+    add_grid_arguments(parser)
+    args = parser.parse_args()
+
+    configs = expand_grid(load_grid(args))
+    with open(args.dataset) as f:
+        dataset = json.load(f)
+
+    print("="*80)
+    print(f"🧪 Barrido: {len(configs)} configuraciones × {len(dataset)} preguntas "
+          f"({args.parallel} en paralelo, juez {GRADER_MODE})")
+    print("="*80)
+
+    indices = build_indices(configs)
+    evaluators = build_evaluators(ChatOpenAI(model="gpt-4o", temperature=0, cache=get_llm_cache()))
+
+    mlflow.set_experiment(SWEEP_EXPERIMENT)
+    start = time.perf_counter()
+    results = run_sweep(configs, dataset, evaluators, indices, dataset_path=args.dataset, max_parallel=args.parallel)
+    elapsed = time.perf_counter() - start
+
+    print("\n" + "="*80)
+    print(f"🏁 Ranking por avg_criteria_score ({elapsed:.1f}s)")
+    print("="*80)
+    for config, summary in sorted(results, key=lambda item: -item[1].get("avg_criteria_score", 0)):
+        print(f"{summary.get('avg_criteria_score', 0):.3f}  {summary.get('pass_rate', 0):.2f}  "
+              f"p95={summary.get('latency_p95', 0):6.2f}s  {config_name(config)}")
+    if get_llm_cache() is not None:
+        print(f"💾 Caché de LLM: {get_llm_cache().stats()}")
+    print(f"📂 Resultados en MLflow (experimento {SWEEP_EXPERIMENT})")
+
+
+if __name__ == "__main__":
+    main()
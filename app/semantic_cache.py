@@ -0,0 +1,344 @@
+# app/semantic_cache.py
+"""
+Caché semántica de respuestas del chat.
+
+Guarda el embedding de cada pregunta junto con su respuesta y los ids de los
+chunks recuperados. Una pregunta nueva (o una paráfrasis) cuyo coseno con una
+guardada supera `SEMANTIC_CACHE_THRESHOLD` recibe la respuesta guardada sin
+recuperación ni generación, siempre que todos sus chunks sigan en el índice
+cargado. `save_vectorstore` invalida las entradas al reconstruir el índice:
+si se embebieron chunks nuevos se borran todas (un documento nuevo puede
+responder mejor) y si solo se borraron chunks, las que los usaban.
+
+Solo se cachean las preguntas que la cadena responde sin historial (las de
+seguimiento dependen de la conversación; ver `skips_condense` en
+app/condense.py) y solo en el chat y el servicio HTTP: la evaluación invoca la
+cadena directamente. Las entradas se separan por índice (directorio del
+vectorstore) y por cadena (modelo, prompt y k), así reconstruir los índices de
+un barrido no toca las respuestas del índice que sirve el chat. Un índice sin
+respuestas guardadas (temporales del registro, pruebas) no abre ni crea la base.
+
+Auditoría de falsos aciertos: una fracción de los aciertos
+(`SEMANTIC_CACHE_AUDIT_RATE`) vuelve a recuperar los chunks de la pregunta
+nueva en segundo plano; si comparten menos de `SEMANTIC_CACHE_AUDIT_MIN_OVERLAP`
+con los de la respuesta guardada, el acierto cuenta como falso y queda
+registrado en la tabla `audits` para revisarlo.
+
+Variables de entorno:
+    SEMANTIC_CACHE=0                    desactiva la caché
+    SEMANTIC_CACHE_PATH                 archivo SQLite (por defecto .cache/semantic_answers.sqlite)
+    SEMANTIC_CACHE_THRESHOLD            coseno mínimo para un acierto (0.95)
+    SEMANTIC_CACHE_MAX_ENTRIES          máximo de entradas; se expulsan las menos usadas
+    SEMANTIC_CACHE_AUDIT_RATE           fracción de aciertos auditados (0.1)
+    SEMANTIC_CACHE_AUDIT_MIN_OVERLAP    fracción mínima de chunks compartidos (0.5)
+"""
+
+import os
+import time
+import json
+import random
+import sqlite3
+import hashlib
+import threading
+import weakref
+from contextlib import closing
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.docstore import ColumnarDocstore
+
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "1") == "1"
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", ".cache/semantic_answers.sqlite")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 10_000))
+SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", 0.1))
+SEMANTIC_CACHE_AUDIT_MIN_OVERLAP = float(os.getenv("SEMANTIC_CACHE_AUDIT_MIN_OVERLAP", 0.5))
+
+
+def chain_namespace(chain):
+    """Huella de lo que determina la respuesta de la cadena: modelo, prompt y k."""
+    llm_chain = chain.combine_docs_chain.llm_chain
+    retriever = chain.retriever
+    k = getattr(retriever, "k", None) or getattr(retriever, "search_kwargs", {}).get("k")
+    model = getattr(llm_chain.llm, "model_name", type(llm_chain.llm).__name__)
+    raw = f"{model}|{k}|{llm_chain.prompt.template}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def live_chunk_ids(vectordb):
+    """Ids de los chunks presentes en el vectorstore cargado."""
+    docstore = getattr(vectordb, "docstore", None)
+    if isinstance(docstore, ColumnarDocstore):
+        return {docstore.chunk_id(position) for position in range(len(docstore))}
+    if docstore is not None:
+        return set(vectordb.index_to_docstore_id.values())
+    return set(getattr(vectordb, "store", {}))
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _dump_documents(documents):
+    return json.dumps([{"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata}
+                       for doc in documents], ensure_ascii=False)
+
+
+def _load_documents(blob):
+    return [Document(**doc) for doc in json.loads(blob)]
+
+
+class SemanticAnswerCache:
+    """Preguntas (embedding) -> respuesta y documentos fuente, en SQLite con búsqueda por coseno en memoria."""
+
+    def __init__(self, index, path=SEMANTIC_CACHE_PATH, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 max_entries=SEMANTIC_CACHE_MAX_ENTRIES, audit_rate=SEMANTIC_CACHE_AUDIT_RATE,
+                 audit_min_overlap=SEMANTIC_CACHE_AUDIT_MIN_OVERLAP, seed=None):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.index = os.path.abspath(index)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.audit_rate = audit_rate
+        self.audit_min_overlap = audit_min_overlap
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._matrices = {}   # namespace -> (ids de fila, matriz de embeddings normalizados)
+        self._live_ids = weakref.WeakKeyDictionary()   # vectordb -> ids de chunks presentes
+        self._stats = {"lookups": 0, "hits": 0, "stale": 0, "latency_saved": 0.0,
+                       "audits": 0, "false_hits": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " index_path TEXT NOT NULL,"
+            " namespace TEXT NOT NULL,"
+            " question TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " documents TEXT NOT NULL,"
+            " latency REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_namespace ON answers (index_path, namespace)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS audits ("
+            " created_at REAL NOT NULL,"
+            " index_path TEXT NOT NULL,"
+            " namespace TEXT NOT NULL,"
+            " question TEXT NOT NULL,"
+            " cached_question TEXT NOT NULL,"
+            " similarity REAL NOT NULL,"
+            " overlap REAL NOT NULL,"
+            " false_hit INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _matrix(self, namespace):
+        if namespace not in self._matrices:
+            rows = self._conn.execute("SELECT id, vector FROM answers WHERE index_path = ? AND namespace = ?",
+                                      (self.index, namespace)).fetchall()
+            ids = [row_id for row_id, _ in rows]
+            vectors = [np.frombuffer(blob, dtype=np.float32) for _, blob in rows]
+            self._matrices[namespace] = (ids, np.vstack(vectors) if vectors else None)
+        return self._matrices[namespace]
+
+    def _is_live(self, vectordb, documents):
+        if vectordb not in self._live_ids:
+            self._live_ids[vectordb] = live_chunk_ids(vectordb)
+        return all(doc.id in self._live_ids[vectordb] for doc in documents)
+
+    def lookup(self, chain, inputs):
+        """Busca la pregunta en la caché.
+
+        Devuelve None si la pregunta no se puede cachear (depende del historial) o un
+        dict con "hit" (la entrada guardada o None), "latency" de la búsqueda y
+        lo necesario para `store`.
+        """
+        skips_condense = getattr(chain, "skips_condense", None)
+        if inputs.get("chat_history") and not (skips_condense and skips_condense(inputs)):
+            return None
+        start = time.perf_counter()
+        vectordb = chain.retriever.vectorstore
+        namespace = chain_namespace(chain)
+        vector = _unit(vectordb.embeddings.embed_query(inputs["question"]))
+        lookup = {"namespace": namespace, "question": inputs["question"], "vector": vector, "hit": None}
+        with self._lock:
+            self._stats["lookups"] += 1
+            ids, matrix = self._matrix(namespace)
+            if matrix is not None:
+                similarities = matrix @ vector
+                for position in np.argsort(-similarities):
+                    if similarities[position] < self.threshold:
+                        break
+                    hit = self._entry(ids[position])
+                    if hit is None:
+                        continue
+                    if not self._is_live(vectordb, hit["source_documents"]):
+                        # Algún chunk ya no está en el índice cargado: la respuesta no vale
+                        self._stats["stale"] += 1
+                        continue
+                    hit["similarity"] = float(similarities[position])
+                    lookup["hit"] = hit
+                    break
+            lookup["latency"] = time.perf_counter() - start
+            if lookup["hit"]:
+                self._stats["hits"] += 1
+                self._stats["latency_saved"] += max(lookup["hit"]["latency"] - lookup["latency"], 0.0)
+                self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), lookup["hit"]["id"]))
+                self._conn.commit()
+        if lookup["hit"] and self._random.random() < self.audit_rate:
+            threading.Thread(target=self.audit, args=(chain.retriever, lookup), name="semantic_cache_audit",
+                             daemon=True).start()
+        return lookup
+
+    def _entry(self, row_id):
+        row = self._conn.execute(
+            "SELECT question, answer, documents, latency FROM answers WHERE id = ?", (row_id,)).fetchone()
+        if row is None:
+            return None
+        question, answer, documents, latency = row
+        return {"id": row_id, "question": question, "answer": answer,
+                "source_documents": _load_documents(documents), "latency": latency}
+
+    def store(self, lookup, answer, documents, latency):
+        """Guarda la respuesta generada para una pregunta que no estaba en la caché."""
+        if lookup is None or lookup["hit"] or not answer or not documents \
+                or any(doc.id is None for doc in documents):
+            return
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO answers (index_path, namespace, question, vector, answer, documents, latency,"
+                " created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.index, lookup["namespace"], lookup["question"], lookup["vector"].tobytes(), answer,
+                 _dump_documents(documents), latency or 0.0, now, now))
+            excess = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used ASC LIMIT ?)",
+                    (excess,))
+                self._matrices.clear()
+            self._conn.commit()
+            if lookup["namespace"] in self._matrices:
+                ids, matrix = self._matrices[lookup["namespace"]]
+                row = lookup["vector"][None, :]
+                self._matrices[lookup["namespace"]] = (
+                    ids + [cursor.lastrowid], row if matrix is None else np.vstack([matrix, row]))
+
+    def audit(self, retriever, lookup):
+        """Compara los chunks recuperados hoy para la pregunta con los de la respuesta guardada."""
+        hit = lookup["hit"]
+        fresh = {doc.id for doc in retriever.invoke(lookup["question"])}
+        cached = {doc.id for doc in hit["source_documents"]}
+        overlap = len(fresh & cached) / len(fresh) if fresh else 1.0
+        false_hit = overlap < self.audit_min_overlap
+        with self._lock:
+            self._stats["audits"] += 1
+            self._stats["false_hits"] += false_hit
+            self._conn.execute(
+                "INSERT INTO audits (created_at, index_path, namespace, question, cached_question, similarity,"
+                " overlap, false_hit) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), self.index, lookup["namespace"], lookup["question"], hit["question"], hit["similarity"],
+                 overlap, int(false_hit)))
+            self._conn.commit()
+        return false_hit
+
+    def false_hits(self, limit=20):
+        """Últimos falsos aciertos auditados: [{"question", "cached_question", "similarity", "overlap"}]."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question, cached_question, similarity, overlap FROM audits"
+                " WHERE index_path = ? AND false_hit = 1 ORDER BY created_at DESC LIMIT ?",
+                (self.index, limit)).fetchall()
+        return [dict(zip(("question", "cached_question", "similarity", "overlap"), row)) for row in rows]
+
+    def invalidate(self, chunk_ids=None):
+        """Borra las entradas del índice que usan alguno de `chunk_ids`, o todas si es None. Devuelve cuántas."""
+        with self._lock:
+            if chunk_ids is None:
+                removed = self._conn.execute("DELETE FROM answers WHERE index_path = ?", (self.index,)).rowcount
+            else:
+                chunk_ids = set(chunk_ids)
+                rows = self._conn.execute("SELECT id, documents FROM answers WHERE index_path = ?", (self.index,))
+                stale = [row_id for row_id, documents in rows
+                         if any(doc["id"] in chunk_ids for doc in json.loads(documents))]
+                self._conn.executemany("DELETE FROM answers WHERE id = ?", [(row_id,) for row_id in stale])
+                removed = len(stale)
+            self._conn.commit()
+            self._matrices.clear()
+            self._live_ids.clear()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM answers WHERE index_path = ?", (self.index,)).fetchone()[0]
+        lookups, hits, audits = stats["lookups"], stats["hits"], stats["audits"]
+        return {
+            "lookups": lookups,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "stale": stats["stale"],
+            "latency_saved_s": stats["latency_saved"],
+            "mean_latency_saved_s": stats["latency_saved"] / hits if hits else 0.0,
+            "audits": audits,
+            "false_hits": stats["false_hits"],
+            "false_hit_rate": stats["false_hits"] / audits if audits else 0.0,
+            "entries": entries,
+        }
+
+
+_caches = {}   # directorio del índice -> SemanticAnswerCache
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache(persist_path):
+    """Caché del proceso para el índice en `persist_path`, o None si SEMANTIC_CACHE=0."""
+    if not SEMANTIC_CACHE:
+        return None
+    index = os.path.abspath(persist_path)
+    with _cache_lock:
+        if index not in _caches:
+            _caches[index] = SemanticAnswerCache(index, path=SEMANTIC_CACHE_PATH)
+        return _caches[index]
+
+
+def has_cached_answers(persist_path, path=None):
+    """True si la base de la caché ya existe y tiene respuestas del índice; no la crea."""
+    path = os.path.abspath(path or SEMANTIC_CACHE_PATH)
+    if not os.path.exists(path):
+        return False
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            row = conn.execute("SELECT 1 FROM answers WHERE index_path = ? LIMIT 1",
+                               (os.path.abspath(persist_path),)).fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return row is not None
+
+
+def existing_semantic_cache(persist_path):
+    """Caché del índice solo si ya está abierta en el proceso o tiene respuestas guardadas (si no, None)."""
+    if not SEMANTIC_CACHE:
+        return None
+    with _cache_lock:
+        cached = _caches.get(os.path.abspath(persist_path))
+    if cached is not None:
+        return cached
+    return get_semantic_cache(persist_path) if has_cached_answers(persist_path) else None
+
+
+def semantic_cache_metrics(persist_path):
+    """Contadores acumulados de la caché con prefijo `semantic_cache_` ({} si está desactivada)."""
+    cache = get_semantic_cache(persist_path)
+    if cache is None:
+        return {}
+    return {f"semantic_cache_{name}": value for name, value in cache.stats().items()}
@@ -0,0 +1,210 @@
+# app/serving_store.py
+"""
+Formato de servicio del vectorstore: memoria compartida entre procesos.
+
+`FAISS.load_local` copia el índice y el docstore (pickle) al heap de cada
+proceso. Aquí el índice se abre con mmap de solo lectura y el docstore es el
+formato columnar de `app/docstore.py`, también mapeado, de modo que varios
+workers en el mismo host comparten las mismas páginas de la caché del sistema
+operativo.
+
+Archivos que `export_serving_files` escribe junto a `index.faiss`:
+    serving.json                     metadatos (métrica, dimensiones) y versión vigente
+    serving/<versión>/vectors.npy,   vectores float32 del índice plano y sus normas
+                     norms.npy
+    serving/<versión>/docstore/      docstore columnar, en el orden del índice
+
+Cada exportación escribe una versión nueva y la publica reemplazando
+serving.json de forma atómica, así un worker que recarga a mitad de una
+reconstrucción ve la versión vieja o la nueva completas, nunca una mezcla. Se
+conservan la versión vigente y la anterior (la que aún puedan tener abierta
+otros procesos).
+
+`index.faiss` siempre es plano; los índices ANN (app/ann_index.py) ya se abren
+con IO_FLAG_MMAP desde `index.ann.faiss` y no necesitan copia de servicio.
+"""
+
+import os
+import json
+import time
+import shutil
+
+import numpy as np
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from app.docstore import ColumnarDocstore, write_columnar_docstore
+
+SERVING_META = "serving.json"
+SERVING_DIR = "serving"
+_EXPORT_BLOCK = 65536
+_SEARCH_BLOCK = 65536
+
+
+def _replace(tmp_path, path):
+    # Renombrado atómico: los procesos que ya mapearon el archivo viejo siguen viéndolo
+    os.replace(tmp_path, path)
+
+
+def export_serving_files(vectordb, persist_path):
+    index = vectordb.index
+    if not isinstance(index, faiss.IndexFlat):
+        raise ValueError(f"Los archivos de servicio se exportan del índice plano, no de {type(index).__name__}")
+    ntotal, d = index.ntotal, index.d
+    previous = _read_meta(persist_path).get("files") if has_serving_files(persist_path) else None
+    files = os.path.join(SERVING_DIR, f"{time.time_ns():x}")
+    files_path = os.path.join(persist_path, files)
+    os.makedirs(files_path)
+    meta = {
+        "files": files,
+        "metric": "ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2",
+        "ntotal": ntotal,
+        "d": d,
+        "distance_strategy": vectordb.distance_strategy.value,
+        "normalize_L2": vectordb._normalize_L2,
+    }
+
+    vectors = np.lib.format.open_memmap(os.path.join(files_path, "vectors.npy"), mode="w+",
+                                        dtype=np.float32, shape=(ntotal, d))
+    norms = np.lib.format.open_memmap(os.path.join(files_path, "norms.npy"), mode="w+",
+                                      dtype=np.float32, shape=(ntotal,))
+    for start in range(0, ntotal, _EXPORT_BLOCK):
+        n = min(_EXPORT_BLOCK, ntotal - start)
+        block = index.reconstruct_n(start, n)
+        vectors[start:start + n] = block
+        norms[start:start + n] = (block * block).sum(axis=1)
+    vectors.flush()
+    norms.flush()
+    del vectors, norms
+
+    def records():
+        for position in range(ntotal):
+            doc_id = vectordb.index_to_docstore_id[position]
+            yield doc_id, vectordb.docstore.search(doc_id)
+
+    write_columnar_docstore(records(), os.path.join(files_path, "docstore"))
+
+    # Publicar la versión nueva es el último paso
+    meta_tmp = os.path.join(persist_path, SERVING_META + ".tmp")
+    with open(meta_tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    _replace(meta_tmp, os.path.join(persist_path, SERVING_META))
+
+    keep = {os.path.basename(files)} | ({os.path.basename(previous)} if previous else set())
+    for name in os.listdir(os.path.join(persist_path, SERVING_DIR)):
+        if name not in keep:
+            shutil.rmtree(os.path.join(persist_path, SERVING_DIR, name), ignore_errors=True)
+
+
+class MmapFlatIndex:
+    """Búsqueda exacta (como IndexFlatL2/IP) sobre vectores mapeados en memoria.
+
+    Implementa la parte de la interfaz de un índice faiss que usa el vectorstore
+    `FAISS`: `search` y `reconstruct`/`reconstruct_n` (búsqueda MMR).
+    """
+
+    def __init__(self, vectors, norms, metric="l2"):
+        self.vectors = vectors
+        self.norms = norms
+        self.metric = metric
+        self.ntotal, self.d = vectors.shape
+
+    def reconstruct(self, key):
+        key = int(key)
+        if not 0 <= key < self.ntotal:
+            raise KeyError(key)
+        return np.array(self.vectors[key], dtype=np.float32)
+
+    def reconstruct_n(self, start=0, n=None):
+        n = self.ntotal - start if n is None else n
+        return np.array(self.vectors[start:start + n], dtype=np.float32)
+
+    def search(self, x, k):
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        nq = x.shape[0]
+        # Para L2 se minimiza la distancia; para producto interno se minimiza -similitud
+        best_d = np.full((nq, 0), np.inf, dtype=np.float32)
+        best_i = np.full((nq, 0), -1, dtype=np.int64)
+        q_norms = (x * x).sum(axis=1)[:, None]
+        for start in range(0, self.ntotal, _SEARCH_BLOCK):
+            block = self.vectors[start:start + _SEARCH_BLOCK]
+            dots = x @ block.T
+            if self.metric == "l2":
+                dist = q_norms - 2 * dots + self.norms[start:start + len(block)][None, :]
+            else:
+                dist = -dots
+            ids = np.broadcast_to(np.arange(start, start + len(block)), dist.shape)
+            cand_d = np.concatenate([best_d, dist], axis=1)
+            cand_i = np.concatenate([best_i, ids], axis=1)
+            if cand_d.shape[1] > k:
+                top = np.argpartition(cand_d, k - 1, axis=1)[:, :k]
+                cand_d = np.take_along_axis(cand_d, top, axis=1)
+                cand_i = np.take_along_axis(cand_i, top, axis=1)
+            best_d, best_i = cand_d, cand_i
+        order = np.argsort(best_d, axis=1)
+        best_d = np.take_along_axis(best_d, order, axis=1)
+        best_i = np.take_along_axis(best_i, order, axis=1)
+        if best_d.shape[1] < k:
+            pad = k - best_d.shape[1]
+            best_d = np.pad(best_d, ((0, 0), (0, pad)), constant_values=np.inf)
+            best_i = np.pad(best_i, ((0, 0), (0, pad)), constant_values=-1)
+        if self.metric != "l2":
+            best_d = -best_d
+        return best_d.astype(np.float32), best_i
+
+
+class PositionIds:
+    """Reemplazo de `index_to_docstore_id`: la posición en el índice es la clave del docstore."""
+
+    def __init__(self, n):
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, position):
+        position = int(position)
+        if not 0 <= position < self.n:
+            raise KeyError(position)
+        return position
+
+    def __contains__(self, position):
+        return 0 <= int(position) < self.n
+
+    def get(self, position, default=None):
+        return self[position] if position in self else default
+
+    def items(self):
+        return ((i, i) for i in range(self.n))
+
+    def values(self):
+        return iter(range(self.n))
+
+
+def has_serving_files(persist_path):
+    return os.path.exists(os.path.join(persist_path, SERVING_META))
+
+
+def _read_meta(persist_path):
+    with open(os.path.join(persist_path, SERVING_META), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_mmap_vectorstore(persist_path, embeddings):
+    """Abre el vectorstore en modo servicio (solo lectura, memoria compartida, sin pickle)."""
+    meta = _read_meta(persist_path)
+    # Todo se lee de la versión que publica serving.json
+    files_path = os.path.join(persist_path, meta.get("files", "."))
+    vectors = np.load(os.path.join(files_path, "vectors.npy"), mmap_mode="r")
+    norms = np.load(os.path.join(files_path, "norms.npy"), mmap_mode="r")
+    index = MmapFlatIndex(vectors, norms, meta["metric"])
+
+    return FAISS(
+        embeddings,
+        index,
+        ColumnarDocstore(os.path.join(files_path, "docstore")),
+        PositionIds(meta["ntotal"]),
+        normalize_L2=meta["normalize_L2"],
+        distance_strategy=DistanceStrategy(meta["distance_strategy"]),
+    )
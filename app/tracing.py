@@ -0,0 +1,195 @@
+# app/tracing.py
+"""
+Instrumentación por etapa de las invocaciones de la cadena RAG y del juez.
+
+`StageTracer` es un callback de LangChain que se pasa en cada invocación
+(`chain.invoke(inputs, config={"callbacks": [tracer]})`) y mide:
+
+- retrieval:  búsqueda en el índice (eventos del retriever),
+- condense:   reformulación de la pregunta con el historial (`question_generator`),
+- generation: respuesta con los documentos recuperados (`combine_docs_chain`),
+- grading:    evaluadores del juez (`grading_metrics` en app/eval_engine.py),
+- total:      la invocación completa (run raíz),
+- first_token: hasta el primer token de la respuesta (solo con streaming),
+- cache:      búsqueda en la caché semántica (app/semantic_cache.py, solo en el chat).
+
+`build_chain` etiqueta las subcadenas con `stage:<etapa>`; las llamadas al LLM
+heredan la etapa de la cadena que las contiene y sus tokens y costo estimado
+se cuentan con el `OpenAICallbackHandler` de esa etapa. Con reintentos, los
+intentos fallidos también suman.
+
+En la evaluación las métricas van a MLflow por pregunta (`<etapa>_latency`,
+`<etapa>_total_tokens`, `<etapa>_cost_usd`, ...) y a la run padre con sus
+percentiles. En el chat se acumulan en `ChatHistogram`, una ventana móvil en
+memoria con p50/p95/p99 por etapa.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_community.callbacks.openai_info import OpenAICallbackHandler
+
+STAGES = ("retrieval", "condense", "generation", "grading")
+STAGE_TAG_PREFIX = "stage:"
+CHAT_TRACE_WINDOW = int(os.getenv("CHAT_TRACE_WINDOW", 500))
+CHAT_PERCENTILES = (50, 95, 99)
+
+
+def stage_tag(stage):
+    return f"{STAGE_TAG_PREFIX}{stage}"
+
+
+def _stage_from_tags(tags):
+    for tag in tags or ():
+        if tag.startswith(STAGE_TAG_PREFIX):
+            return tag[len(STAGE_TAG_PREFIX):]
+    return None
+
+
+class StageTracer(BaseCallbackHandler):
+    """Tiempos, tokens y costo por etapa de una invocación (un tracer por invocación)."""
+
+    # En invocaciones async se llama en el hilo del event loop, sin pasar por un executor
+    run_inline = True
+
+    def __init__(self, on_token=None):
+        self.on_token = on_token   # recibe los tokens de la etapa generation (streaming)
+        self.latency = {}   # etapa -> segundos
+        self.usage = {}     # etapa -> OpenAICallbackHandler
+        self.documents = []   # documentos recuperados (caché semántica)
+        self._stage_of = {}   # run_id -> etapa
+        self._starts = {}     # run_id -> (etapa, inicio)
+        self._root_start = None
+        self._lock = threading.Lock()
+
+    def add_latency(self, stage, seconds):
+        with self._lock:
+            self.latency[stage] = self.latency.get(stage, 0.0) + seconds
+
+    def _start(self, run_id, parent_run_id, tags, timed_stage=None):
+        stage = timed_stage or _stage_from_tags(tags)
+        with self._lock:
+            if stage:
+                self._starts[run_id] = (stage, time.perf_counter())
+            elif parent_run_id is None:
+                self._starts[run_id] = ("total", time.perf_counter())
+                self._root_start = self._starts[run_id][1]
+            self._stage_of[run_id] = stage or self._stage_of.get(parent_run_id)
+
+    def _end(self, run_id):
+        with self._lock:
+            self._stage_of.pop(run_id, None)
+            started = self._starts.pop(run_id, None)
+        if started:
+            self.add_latency(started[0], time.perf_counter() - started[1])
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._start(run_id, parent_run_id, tags)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._start(run_id, parent_run_id, tags, timed_stage="retrieval")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        with self._lock:
+            self.documents.extend(documents)
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._start(run_id, parent_run_id, tags)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._start(run_id, parent_run_id, tags)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            stage = self._stage_of.get(run_id) or "other"
+            handler = self.usage.setdefault(stage, OpenAICallbackHandler())
+        handler.on_llm_end(response)
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        # Solo con modelos en modo streaming; el primer token marca first_token_latency
+        if not token or self._stage_of.get(run_id) != "generation":
+            return
+        with self._lock:
+            if "first_token" not in self.latency and self._root_start is not None:
+                self.latency["first_token"] = time.perf_counter() - self._root_start
+        if self.on_token:
+            self.on_token(token)
+
+    def metrics(self):
+        """{"<etapa>_latency", "<etapa>_prompt_tokens", ..., "<etapa>_cost_usd", "<etapa>_llm_calls"}."""
+        with self._lock:
+            metrics = {f"{stage}_latency": seconds for stage, seconds in self.latency.items()}
+            for stage, handler in self.usage.items():
+                metrics[f"{stage}_prompt_tokens"] = handler.prompt_tokens
+                metrics[f"{stage}_completion_tokens"] = handler.completion_tokens
+                metrics[f"{stage}_total_tokens"] = handler.total_tokens
+                metrics[f"{stage}_cost_usd"] = handler.total_cost
+                metrics[f"{stage}_llm_calls"] = handler.successful_requests
+        return metrics
+
+
+def stage_summary_lines(summary):
+    """Líneas "etapa: p50 | p95 | p99" a partir de los agregados de una configuración."""
+    return [f"{stage}: p50 {summary[f'{stage}_latency_p50']:.2f}s | p95 {summary[f'{stage}_latency_p95']:.2f}s "
+            f"| p99 {summary[f'{stage}_latency_p99']:.2f}s"
+            for stage in STAGES if f"{stage}_latency_p50" in summary]
+
+
+class ChatHistogram:
+    """Ventana móvil en memoria de las últimas `window` invocaciones del chat, por etapa."""
+
+    def __init__(self, window=CHAT_TRACE_WINDOW):
+        self.window = window
+        self._samples = {}   # métrica -> deque
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        with self._lock:
+            for key, value in metrics.items():
+                self._samples.setdefault(key, deque(maxlen=self.window)).append(value)
+
+    def percentiles(self, percentiles=CHAT_PERCENTILES):
+        """{etapa: {"n", "p50", "p95", "p99", "mean", "tokens_mean", "cost_usd_mean"}} en orden de STAGES."""
+        with self._lock:
+            samples = {key[:-len("_latency")]: list(values) for key, values in self._samples.items()
+                       if key.endswith("_latency")}
+            tokens = {key: float(np.mean(values)) for key, values in self._samples.items()
+                      if key.endswith(("_total_tokens", "_cost_usd"))}
+        order = [stage for stage in (*STAGES, "first_token", "total") if stage in samples]
+        order += sorted(set(samples) - set(order))
+        summary = {}
+        for stage in order:
+            values = samples[stage]
+            row = {"n": len(values)}
+            row.update({f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))})
+            row["mean"] = float(np.mean(values))
+            row["tokens_mean"] = tokens.get(f"{stage}_total_tokens", 0.0)
+            row["cost_usd_mean"] = tokens.get(f"{stage}_cost_usd", 0.0)
+            summary[stage] = row
+        return summary
+
+
+_chat_histogram = ChatHistogram()
+
+
+def get_chat_histogram():
+    """Histograma del proceso: compartido por todas las sesiones de Streamlit."""
+    return _chat_histogram
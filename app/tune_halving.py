@@ -0,0 +1,190 @@
+"""
+Búsqueda por successive halving sobre configuraciones RAG.
+
+Todas las configuraciones del grid se evalúan primero sobre un subconjunto
+pequeño de preguntas; en cada etapa se conserva la mejor fracción 1/eta según
+avg_criteria_score y el subconjunto crece eta veces para las sobrevivientes,
+hasta que queda una o se usa el dataset completo. Las sobrevivientes finales
+se evalúan con todas las preguntas.
+
+Cada configuración es una run padre en el experimento `halving_eval` que crece
+de etapa en etapa (las preguntas ya evaluadas no se repiten). La run
+`halving_tuner` registra cada etapa (step = etapa) y el presupuesto de
+llamadas al LLM usado frente al de un grid completo.
+
+Uso:
+    python app/tune_halving.py --prompt v1_asistente_creg_didactico --prompt v2_creg_conciso \\
+        --chunk-size 512 --chunk-size 1024 --k 4 --k 8 --initial-questions 6 --eta 2
+"""
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import math
+import random
+import argparse
+import threading
+
+import mlflow
+from mlflow.tracking import MlflowClient
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+from app import run_sweep
+from app.eval_engine import GRADER_MODE, build_evaluators
+from app.llm_cache import get_llm_cache
+from app.mlflow_buffer import buffered_run
+
+load_dotenv()
+
+# Sin el prefijo eval_, igual que el barrido (ver SWEEP_EXPERIMENT en app/run_sweep.py)
+HALVING_EXPERIMENT = os.getenv("HALVING_EXPERIMENT", "halving_eval")
+HALVING_INITIAL_QUESTIONS = int(os.getenv("HALVING_INITIAL_QUESTIONS", 6))
+HALVING_ETA = int(os.getenv("HALVING_ETA", 2))
+HALVING_SEED = int(os.getenv("HALVING_SEED", 1234))
+
+
+def llm_calls(result):
+    """Llamadas al LLM de una pregunta: 1 generación + las de cada evaluador."""
+    return 1 + sum(grade.get("llm_calls", 1) for grade in result["grades"].values())
+
+
+def stage_sizes(n_questions, initial, eta):
+    """Tamaños crecientes del subconjunto: initial, initial*eta, ... hasta n_questions."""
+    if initial < 1 or eta < 2:
+        raise ValueError(f"Se necesita initial >= 1 y eta >= 2 (initial={initial}, eta={eta})")
+    sizes = [min(initial, n_questions)]
+    while sizes[-1] < n_questions:
+        sizes.append(min(sizes[-1] * eta, n_questions))
+    return sizes
+
+
+class CallCounter:
+    def __init__(self):
+        self.calls = 0
+        self.questions = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, result, record, reasonings):
+        with self._lock:
+            self.calls += llm_calls(result)
+            self.questions += 1
+
+
+def successive_halving(configs, dataset, evaluators, indices, initial=HALVING_INITIAL_QUESTIONS,
+                       eta=HALVING_ETA, seed=HALVING_SEED, dataset_path=run_sweep.DATASET_PATH,
+                       max_parallel=run_sweep.SWEEP_CONCURRENCY, client=None):
+    """Devuelve {"ranking": [(config, agregados)], "stages": [...], "budget": {...}}."""
+    client = client or MlflowClient()
+    order = list(range(len(dataset)))
+    random.Random(seed).shuffle(order)
+    sizes = stage_sizes(len(dataset), initial, eta)
+
+    # Un checkpoint por configuración para toda la búsqueda: cada etapa agrega preguntas a la misma run padre
+    checkpoints = {}
+    for config in configs:
+        vectordb, index_path = indices[(config["chunk_size"], config["chunk_overlap"])]
+        checkpoints[run_sweep.config_name(config)] = run_sweep.make_checkpoint(
+            config, index_path, dataset_path, script="tune_halving")
+
+    experiment_id = mlflow.set_experiment(HALVING_EXPERIMENT).experiment_id
+    counter = CallCounter()
+    survivors = list(configs)
+    stages, ranking = [], []
+    with buffered_run("halving_tuner", experiment_id=experiment_id, tags={"eval_level": "tuner"},
+                      client=client) as tuner:
+        tuner.log_params({"n_configs": len(configs), "n_questions": len(dataset), "initial_questions": initial,
+                          "eta": eta, "seed": seed, "grader_mode": GRADER_MODE})
+
+        for stage, size in enumerate(sizes):
+            last = len(survivors) == 1 or size == len(dataset)
+            size = len(dataset) if last else size
+            print(f"\n🔎 Etapa {stage}: {len(survivors)} configuraciones × {size} preguntas")
+            results = run_sweep.run_sweep(
+                survivors, dataset, evaluators, indices, dataset_path=dataset_path, max_parallel=max_parallel,
+                question_indices=order[:size], finish=False, on_logged=counter, checkpoints=checkpoints,
+            )
+            ranking = sorted(results, key=lambda item: -item[1].get("avg_criteria_score", 0))
+            keep = len(ranking) if last else max(1, math.ceil(len(ranking) / eta))
+            stages.append({
+                "stage": stage,
+                "n_questions": size,
+                "configs": [{"name": run_sweep.config_name(config),
+                             "avg_criteria_score": summary.get("avg_criteria_score", 0),
+                             "kept": rank < keep} for rank, (config, summary) in enumerate(ranking)],
+            })
+            tuner.log_metric("n_configs", len(ranking), step=stage)
+            tuner.log_metric("n_questions", size, step=stage)
+            tuner.log_metric("best_avg_criteria_score", ranking[0][1].get("avg_criteria_score", 0), step=stage)
+            tuner.log_metric("llm_calls_used", counter.calls, step=stage)
+            tuner.flush()
+
+            # Las eliminadas cierran su checkpoint: otra búsqueda empieza de cero para ellas
+            for config, _ in ranking[keep:]:
+                checkpoints[run_sweep.config_name(config)].mark_finished()
+            survivors = [config for config, _ in ranking[:keep]]
+            if last:
+                for config in survivors:
+                    checkpoints[run_sweep.config_name(config)].mark_finished()
+                break
+
+        # Presupuesto frente al grid completo: todas las configuraciones con todas las preguntas
+        calls_per_question = counter.calls / max(1, counter.questions)
+        full_questions = len(configs) * len(dataset)
+        full_calls = full_questions * calls_per_question
+        budget = {
+            "questions_evaluated": counter.questions,
+            "full_grid_questions": full_questions,
+            "llm_calls_used": counter.calls,
+            "full_grid_llm_calls": round(full_calls),
+            "llm_calls_saved": round(full_calls - counter.calls),
+            "llm_calls_saved_pct": 100 * (1 - counter.calls / full_calls) if full_calls else 0.0,
+        }
+        winner, winner_summary = ranking[0]
+        tuner.log_metrics(budget)
+        tuner.log_metric("winner_avg_criteria_score", winner_summary.get("avg_criteria_score", 0))
+        tuner.log_params({f"winner_{key}": value for key, value in winner.items()})
+        tuner.log_text(json.dumps(stages, indent=2, ensure_ascii=False), "stages.json")
+    return {"ranking": ranking, "stages": stages, "budget": budget}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive halving sobre configuraciones RAG")
+    run_sweep.add_grid_arguments(parser)
+    parser.add_argument("--initial-questions", type=int, default=HALVING_INITIAL_QUESTIONS)
+    parser.add_argument("--eta", type=int, default=HALVING_ETA, help="Se conserva 1/eta de las configuraciones por etapa")
+    parser.add_argument("--seed", type=int, default=HALVING_SEED)
+    args = parser.parse_args()
+    if args.eta < 2:
+        parser.error("--eta debe ser al menos 2")
+    if args.initial_questions < 1:
+        parser.error("--initial-questions debe ser al menos 1")
+
+    configs = run_sweep.expand_grid(run_sweep.load_grid(args))
+    with open(args.dataset) as f:
+        dataset = json.load(f)
+
+    print("="*80)
+    print(f"✂️  Successive halving: {len(configs)} configuraciones, {len(dataset)} preguntas, "
+          f"inicio {args.initial_questions}, eta {args.eta}")
+    print("="*80)
+
+    indices = run_sweep.build_indices(configs)
+    evaluators = build_evaluators(ChatOpenAI(model="gpt-4o", temperature=0, cache=get_llm_cache()))
+    outcome = successive_halving(configs, dataset, evaluators, indices, initial=args.initial_questions,
+                                 eta=args.eta, seed=args.seed, dataset_path=args.dataset, max_parallel=args.parallel)
+
+    budget = outcome["budget"]
+    winner, summary = outcome["ranking"][0]
+    print("\n" + "="*80)
+    print(f"🏆 Mejor configuración: {run_sweep.config_name(winner)} "
+          f"(avg_criteria_score={summary.get('avg_criteria_score', 0):.3f})")
+    print(f"🧮 Llamadas al LLM: {budget['llm_calls_used']} de ~{budget['full_grid_llm_calls']} del grid completo "
+          f"({budget['llm_calls_saved']} ahorradas, {budget['llm_calls_saved_pct']:.0f}%)")
+    print(f"📂 Etapas y presupuesto en MLflow (experimento {HALVING_EXPERIMENT}, run halving_tuner)")
+    print("="*80)
+
+
+if __name__ == "__main__":
+    main()
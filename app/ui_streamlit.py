@@ -5,7 +5,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import streamlit as st
 st.set_page_config(page_title="Chatbot CREG - Regulación Energética", layout="centered")
 
-from app.rag_pipeline import load_vectorstore_from_disk, build_chain
+import pandas as pd
+
+from app.resources import get_chain, get_answer_cache
+from app.rag_pipeline import stream_answer
+from app.tracing import StageTracer, get_chat_histogram
 
 
 st.title("🤖 Asistente de Regulación Energética CREG")
@@ -16,17 +20,40 @@ question = st.text_input("Escribe tu pregunta sobre regulación energética:")
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-# Cargar vectorstore y cadena
-vectordb = load_vectorstore_from_disk()
-chain = build_chain(vectordb)
+# Vectorstore y cadena compartidos por el proceso (se recargan solo si cambia el índice)
+chain = get_chain(streaming=True)
 
+previous = st.session_state.chat_history
 if question:
-    with st.spinner("Pensando..."):
-        result = chain.invoke({"question": question, "chat_history": st.session_state.chat_history})
-        st.session_state.chat_history.append((question, result["answer"]))
-
-if st.session_state.chat_history:
+    # La respuesta se muestra token por token; al terminar queda en el historial
+    st.markdown("---")
+    st.markdown(f"**🧑 Usuario:** {question}")
+    st.markdown("**🤖 Bot:**")
+    tracer = StageTracer()
+    answer = st.write_stream(stream_answer(
+        chain, {"question": question, "chat_history": st.session_state.chat_history}, tracer, get_answer_cache()))
+    previous = list(st.session_state.chat_history)
+    st.session_state.chat_history.append((question, answer))
+    get_chat_histogram().record(tracer.metrics())
+
+if previous:
     st.markdown("---")    
-    for q, a in reversed(st.session_state.chat_history):
+    for q, a in reversed(previous):
         st.markdown(f"**🧑 Usuario:** {q}")
         st.markdown(f"**🤖 Bot:** {a}")
+
+# Latencia por etapa de las últimas consultas del proceso (todas las sesiones)
+stage_latency = get_chat_histogram().percentiles()
+if stage_latency:
+    with st.expander("⏱️ Latencia por etapa"):
+        st.dataframe(pd.DataFrame.from_dict(stage_latency, orient="index").round(4))
+
+# Caché semántica de respuestas: aciertos, latencia ahorrada y falsos aciertos auditados
+answer_cache = get_answer_cache()
+if answer_cache is not None and answer_cache.stats()["lookups"]:
+    with st.expander("🧠 Caché semántica"):
+        st.dataframe(pd.DataFrame.from_dict(answer_cache.stats(), orient="index", columns=["valor"]))
+        false_hits = answer_cache.false_hits()
+        if false_hits:
+            st.markdown("**Falsos aciertos recientes**")
+            st.dataframe(pd.DataFrame(false_hits))
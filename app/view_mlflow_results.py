@@ -2,12 +2,14 @@
 Script para visualizar resultados de evaluación desde MLflow
 """
 
-import mlflow
-import pandas as pd
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.mlflow_queries import list_experiments, config_runs, config_results, run_metrics
 
 # Conectar al experimento
 experiment_name = "eval_advanced_v1_asistente_creg_didactico"
-experiment = mlflow.get_experiment_by_name(experiment_name)
+experiment = next((exp for exp in list_experiments(experiment_name) if exp.name == experiment_name), None)
 
 if experiment is None:
     print(f"❌ Experimento '{experiment_name}' no encontrado")
@@ -17,13 +19,17 @@ print(f"📊 Analizando experimento: {experiment_name}")
 print(f"🆔 Experiment ID: {experiment.experiment_id}")
 print("="*80)
 
-# Obtener todas las runs del experimento
-runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
+# Corrida más reciente: run padre con agregados y results.parquet con una fila por pregunta
+configs = config_runs(experiment.experiment_id)
 
-if runs.empty:
+if configs.empty:
     print("⚠️  No se encontraron runs en este experimento")
     exit(0)
 
+latest = configs.iloc[0]
+summary = run_metrics(latest)
+runs = config_results(experiment.experiment_id, latest["run_id"])
+
 print(f"\n✅ Total de runs encontradas: {len(runs)}")
 
 # Mostrar métricas clave
@@ -31,52 +37,45 @@ print("\n📈 RESUMEN DE MÉTRICAS POR PREGUNTA:")
 print("="*80)
 
 metrics_of_interest = [
-    'metrics.qa_is_correct',
-    'metrics.correctness_score',
-    'metrics.relevance_score',
-    'metrics.coherence_score',
-    'metrics.toxicity_score',
-    'metrics.harmfulness_score',
-    'metrics.helpfulness_score',
-    'metrics.conciseness_score',
-    'metrics.avg_criteria_score'
+    'qa_is_correct',
+    'correctness_score',
+    'relevance_score',
+    'coherence_score',
+    'toxicity_score',
+    'harmfulness_score',
+    'helpfulness_score',
+    'conciseness_score',
+    'avg_criteria_score'
 ]
 
 # Filtrar columnas que existen
 available_metrics = [col for col in metrics_of_interest if col in runs.columns]
 
 if available_metrics:
-    results = runs[['tags.mlflow.runName'] + available_metrics].copy()
-    
-    # Renombrar columnas para mejor visualización
-    results.columns = [col.replace('metrics.', '').replace('tags.mlflow.', '') 
-                       for col in results.columns]
-    
-    # Ordenar por nombre de run
-    results = results.sort_values('runName')
+    results = runs[['run_name'] + available_metrics].rename(columns={'run_name': 'runName'})
     
     print(results.to_string(index=False))
     
-    # Calcular estadísticas generales
+    # Estadísticas generales (precalculadas en la run padre)
     print("\n" + "="*80)
     print("📊 ESTADÍSTICAS GENERALES:")
     print("="*80)
     
     for metric in available_metrics:
-        metric_name = metric.replace('metrics.', '')
-        if metric in runs.columns:
-            mean_val = runs[metric].mean()
-            print(f"{metric_name:30s}: {mean_val:.2f} (promedio)")
+        if metric in summary:
+            print(f"{metric:30s}: {summary[metric]:.2f} (promedio)")
     
     # Contar correctas
-    if 'metrics.qa_is_correct' in runs.columns:
-        correctas = runs['metrics.qa_is_correct'].sum()
+    if 'qa_is_correct' in runs.columns:
+        correctas = runs['qa_is_correct'].sum()
         total = len(runs)
         print(f"\n✅ Preguntas correctas (QA básico): {correctas}/{total} ({correctas/total*100:.1f}%)")
     
-    if 'metrics.avg_criteria_score' in runs.columns:
-        avg_criteria = runs['metrics.avg_criteria_score'].mean()
-        print(f"📊 Score promedio de criterios: {avg_criteria:.2f}")
+    if 'avg_criteria_score' in summary:
+        print(f"📊 Score promedio de criterios: {summary['avg_criteria_score']:.2f}")
+    if 'latency_p50' in summary:
+        print(f"⏱️  Latencia p50/p95/p99: {summary['latency_p50']:.2f}s / "
+              f"{summary['latency_p95']:.2f}s / {summary['latency_p99']:.2f}s")
     
 else:
     print("⚠️  No se encontraron métricas en las runs")
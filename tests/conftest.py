@@ -0,0 +1,22 @@
+# tests/conftest.py
+
+import pytest
+
+from app import llm_cache, rag_pipeline, semantic_cache
+
+
+@pytest.fixture(autouse=True)
+def no_shared_caches(monkeypatch):
+    """Las pruebas no leen ni escriben las cachés de .cache/ (LLM, respuestas y embeddings)."""
+    monkeypatch.setattr(llm_cache, "LLM_CACHE", False)
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE", False)
+    monkeypatch.setattr(rag_pipeline, "EMBEDDING_CACHE", False)
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """(directorio de PDFs vacío, directorio del vectorstore) con MLflow en tmp_path."""
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    data_dir = tmp_path / "pdfs"
+    data_dir.mkdir()
+    return data_dir, tmp_path / "vectorstore"
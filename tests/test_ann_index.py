@@ -0,0 +1,77 @@
+# tests/test_ann_index.py
+
+import os
+import shutil
+
+import faiss
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.ann_index import ANN_INDEX_NAME, build_ann_index, parse_index_spec
+from app.rag_pipeline import save_vectorstore, load_vectorstore_from_disk, list_pdfs, DATA_DIR
+
+
+@pytest.mark.parametrize("spec, index_type, params", [
+    ("flat", "flat", {}),
+    ("ivf_flat:nlist=16,nprobe=4", "ivf_flat", {"nlist": 16, "nprobe": 4}),
+    ("ivf_pq:nlist=16,m=8,nbits=4", "ivf_pq", {"nlist": 16, "m": 8, "nbits": 4}),
+    ("hnsw:M=16,efSearch=32", "hnsw", {"M": 16, "efSearch": 32}),
+])
+def test_parse_index_spec(spec, index_type, params):
+    assert parse_index_spec(spec) == (index_type, params)
+
+
+@pytest.mark.parametrize("spec", ["ivf", "hnsw:M=dieciseis", "ivf_flat:nlist", "ivf_flat:efSearch=32", "flat:nlist=4"])
+def test_parse_index_spec_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_index_spec(spec)
+
+
+@pytest.mark.parametrize("spec", ["ivf_flat:nlist=16,nprobe=4", "ivf_pq:nlist=16,nprobe=4,m=8,nbits=4",
+                                  "hnsw:M=16,efConstruction=40,efSearch=32"])
+def test_build_ann_index_uses_parsed_params(spec):
+    index_type, params = parse_index_spec(spec)
+    vectors = np.random.default_rng(0).standard_normal((2000, 16)).astype(np.float32)
+    flat = faiss.IndexFlatL2(16)
+    flat.add(vectors)
+
+    index, resolved = build_ann_index(flat, index_type, params)
+    assert index.ntotal == flat.ntotal and index.is_trained
+    assert {k: resolved[k] for k in params} == params
+    if index_type == "hnsw":
+        assert (index.hnsw.efConstruction, index.hnsw.efSearch) == (40, 32)
+    else:
+        ivf = faiss.extract_index_ivf(index)
+        assert (ivf.nlist, ivf.nprobe) == (16, 4)
+    if index_type == "ivf_pq":
+        pq = faiss.downcast_index(ivf).pq
+        assert (pq.M, pq.nbits) == (8, 4)
+
+    # Las posiciones son las del índice plano: cada vector se encuentra a sí mismo
+    _, ids = index.search(vectors[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.9
+
+
+def test_ann_index_round_trips_through_load(corpus):
+    data_dir, persist_dir = corpus
+    for pdf in list_pdfs(DATA_DIR)[:2]:
+        shutil.copy(os.path.join(DATA_DIR, pdf), data_dir)
+    embeddings = DeterministicFakeEmbedding(size=16)
+    save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings,
+                     index_type="hnsw", index_params={"M": 16, "efSearch": 48})
+    assert os.path.exists(persist_dir / ANN_INDEX_NAME)
+
+    flat = load_vectorstore_from_disk(str(persist_dir), embeddings=embeddings, use_ann=False)
+    for mmap in (False, True):
+        ann = load_vectorstore_from_disk(str(persist_dir), embeddings=embeddings, mmap=mmap)
+        assert isinstance(ann.index, faiss.IndexHNSWFlat)
+        assert (ann.index.hnsw.efSearch, ann.index.ntotal) == (48, flat.index.ntotal)
+        doc = flat.docstore.search(flat.index_to_docstore_id[0])
+        assert ann.similarity_search(doc.page_content, k=1)[0].id == doc.id
+
+    # Volver a "flat" borra el índice ANN
+    save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings, index_type="flat")
+    assert not os.path.exists(persist_dir / ANN_INDEX_NAME)
+    reloaded = load_vectorstore_from_disk(str(persist_dir), embeddings=embeddings)
+    assert not isinstance(reloaded.index, faiss.IndexHNSWFlat)
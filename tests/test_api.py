@@ -0,0 +1,62 @@
+# tests/test_api.py
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from app import rag_pipeline
+from app.api import create_app, http_clients
+from app.fake_openai_server import start_in_thread
+
+
+@pytest.fixture
+def client(monkeypatch):
+    server, base_url = start_in_thread(answer_tokens=12)
+    monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    monkeypatch.setattr(rag_pipeline, "get_llm_cache", lambda: None)
+    vectordb = InMemoryVectorStore.from_texts(
+        ["Resolución CREG 015 de 2018: metodología de distribución", "Tarifas de transmisión"],
+        DeterministicFakeEmbedding(size=8), metadatas=[{"source": "data/pdfs/creg_015.pdf", "page": 3}, {}])
+    sync_client, async_client = http_clients(max_connections=4)
+    chain = rag_pipeline.build_chain(vectordb, k=1, streaming=True, return_sources=True,
+                                     http_client=sync_client, http_async_client=async_client)
+    with TestClient(create_app(chain=chain)) as test_client:
+        yield test_client
+    server.shutdown()
+
+
+def test_query_returns_answer_and_sources(client):
+    response = client.post("/query", json={"question": "¿Qué regula la CREG 015?"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["answer"].startswith("Respuesta simulada")
+    assert len(body["answer"].split()) == 12
+    assert len(body["sources"]) == 1
+    assert body["stages"]["generation_total_tokens"] > 0
+    assert "retrieval" in client.get("/metrics").json()
+
+
+def test_query_streams_server_sent_events(client):
+    with client.stream("POST", "/query", json={"question": "¿Qué regula la CREG 015?", "stream": True,
+                                               "chat_history": [["Hola", "Hola, ¿en qué ayudo?"]]}) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [block for block in response.read().decode("utf-8").split("\n\n") if block]
+
+    parsed = [(block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+              for block in events]
+    tokens = [payload["token"] for event, payload in parsed if event == "token"]
+    assert len(tokens) == 12
+    event, done = parsed[-1]
+    assert event == "done"
+    assert "".join(tokens) == done["answer"]
+    assert done["stages"]["condense_llm_calls"] == 1
+    assert done["stages"]["first_token_latency"] <= done["latency"]
+
+
+def test_empty_question_is_rejected(client):
+    assert client.post("/query", json={"question": ""}).status_code == 422
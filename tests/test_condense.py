@@ -0,0 +1,74 @@
+# tests/test_condense.py
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from app import rag_pipeline
+from app.condense import is_standalone
+from app.tracing import StageTracer
+
+HISTORY = [("¿Qué trata la Resolución CREG 101-076 de 2025?", "Trata de la subasta de energía firme.")]
+
+
+@pytest.mark.parametrize("question, standalone", [
+    ("¿Qué resolución modifica la Resolución CREG 101-078 de 2025?", True),
+    ("¿Qué es el Mercado de Energía Mayorista (MEM)?", True),
+    ("¿Y a quién aplica?", False),
+    ("¿Qué más establece sobre eso?", False),
+    ("¿En qué leyes se fundamenta la CREG para expedir estas resoluciones?", False),
+    ("¿Podrías resumirlo en una frase?", False),
+])
+def test_heuristic_detects_standalone_questions(question, standalone):
+    assert is_standalone(question, HISTORY) is standalone
+    assert is_standalone(question, [])
+
+
+def make_chain(monkeypatch, condense, replies):
+    models = []
+
+    def chat_openai(**kwargs):
+        models.append(kwargs["model"])
+        return GenericFakeChatModel(messages=iter([AIMessage(reply) for reply in replies]))
+
+    monkeypatch.setattr(rag_pipeline, "ChatOpenAI", chat_openai)
+    vectordb = InMemoryVectorStore.from_texts(["Resolución CREG 101-078 de 2025", "Mercado de Energía Mayorista"],
+                                              DeterministicFakeEmbedding(size=8))
+    return rag_pipeline.build_chain(vectordb, k=1, condense=condense), models
+
+
+def ask(chain, question):
+    tracer = StageTracer()
+    result = chain.invoke({"question": question, "chat_history": HISTORY}, config={"callbacks": [tracer]})
+    return result["answer"], tracer.metrics()
+
+
+def test_heuristic_skips_condense_only_for_standalone_turns(monkeypatch):
+    chain, _ = make_chain(monkeypatch, "heuristic", ["Respuesta directa.", "¿A quién aplica la 101-076?",
+                                                     "Aplica a los generadores."])
+
+    answer, metrics = ask(chain, "¿Qué resolución modifica la Resolución CREG 101-078 de 2025?")
+    assert answer == "Respuesta directa."
+    assert "condense_latency" not in metrics
+
+    answer, metrics = ask(chain, "¿Y a quién aplica?")
+    assert answer == "Aplica a los generadores."
+    assert "condense_latency" in metrics
+
+
+def test_none_never_condenses_and_llm_always_does(monkeypatch):
+    chain, _ = make_chain(monkeypatch, "none", ["Respuesta."])
+    assert "condense_latency" not in ask(chain, "¿Y a quién aplica?")[1]
+
+    chain, _ = make_chain(monkeypatch, "llm", ["¿Qué modifica la 101-078?", "Respuesta."])
+    assert "condense_latency" in ask(chain, "¿Qué resolución modifica la Resolución CREG 101-078 de 2025?")[1]
+
+
+def test_small_strategy_uses_the_condense_model(monkeypatch):
+    _, models = make_chain(monkeypatch, "small", [])
+    assert sorted(models) == sorted([rag_pipeline.CHAT_MODEL, rag_pipeline.CONDENSE_MODEL])
+
+    with pytest.raises(ValueError):
+        make_chain(monkeypatch, "rapida", [])
@@ -0,0 +1,59 @@
+# tests/test_embedding_cache.py
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    n_embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.n_embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_cache_hits_and_misses(tmp_path):
+    base = CountingEmbedding(size=8)
+    cached = CachedEmbeddings(base, EmbeddingCache(str(tmp_path / "emb.sqlite")))
+
+    first = cached.embed_documents(["a", "b", "a"])
+    assert base.n_embedded == 2
+    assert first[0] == first[2]
+
+    second = cached.embed_documents(["b", "c"])
+    assert base.n_embedded == 3
+    assert second[0] == first[1]
+
+    stats = cached.cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+    assert stats["entries"] == 3
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite"), max_entries=2)
+    cache.put_many("m", [("h1", [1.0])])
+    cache.put_many("m", [("h2", [2.0])])
+    cache.get_many("m", ["h1"])
+    cache.put_many("m", [("h3", [3.0])])
+
+    assert set(cache.get_many("m", ["h1", "h2", "h3"])) == {"h1", "h3"}
+
+
+def test_table_is_only_counted_past_the_limit(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite"), max_entries=100)
+    counts = []
+    count = cache._count
+    monkeypatch.setattr(cache, "_count", lambda: counts.append(1) or count())
+
+    for i in range(10):
+        cache.put_many("m", [(f"h{i}-{j}", [float(j)]) for j in range(10)])
+    assert counts == []
+
+    # Al pasarse se expulsa hasta el 90% y las escrituras siguientes no vuelven a contar
+    cache.put_many("m", [(f"extra{j}", [0.0]) for j in range(5)])
+    assert len(counts) == 1
+    assert cache.stats()["entries"] == 90
+    cache.put_many("m", [("otra", [0.0])])
+    assert len(counts) == 2   # solo el de stats()
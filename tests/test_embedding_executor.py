@@ -0,0 +1,71 @@
+# tests/test_embedding_executor.py
+
+import httpx
+import pytest
+from langchain_openai import OpenAIEmbeddings
+
+from app import rag_pipeline
+from app.embedding_executor import EmbeddingExecutor
+from app.rate_limit import RateLimiter
+from app.fake_openai_server import start_in_thread, fake_vector
+
+
+@pytest.fixture
+def fake_server():
+    server, base_url = start_in_thread(dim=16, fail_every=3)
+    yield server, base_url
+    server.shutdown()
+
+
+def test_executor_batches_and_retries(fake_server):
+    server, base_url = fake_server
+    base = OpenAIEmbeddings(
+        base_url=base_url, api_key="fake", max_retries=0,
+        check_embedding_ctx_length=False,
+    )
+    executor = EmbeddingExecutor(base, batch_size=5, max_concurrency=3,
+                                 requests_per_minute=6000, max_retries=5)
+
+    texts = [f"chunk {i}" for i in range(23)]
+    vectors = executor.embed_documents(texts)
+
+    assert vectors == [pytest.approx(fake_vector(t, 16)) for t in texts]
+    stats = executor.stats()
+    assert stats["batches"] == 5
+    assert stats["texts"] == 23
+    assert stats["retries"] == server.throttled > 0
+
+
+class CountingLimiter(RateLimiter):
+    acquired = 0
+
+    def acquire(self, tokens=0):
+        self.acquired += 1
+
+
+def test_every_attempt_takes_rate_limit_budget(fake_server):
+    server, base_url = fake_server
+    base = OpenAIEmbeddings(base_url=base_url, api_key="fake", max_retries=0, check_embedding_ctx_length=False)
+    limiter = CountingLimiter()
+    executor = EmbeddingExecutor(base, batch_size=5, max_concurrency=1, max_retries=5, limiter=limiter)
+
+    executor.embed_documents([f"chunk {i}" for i in range(23)])
+
+    assert server.throttled > 0
+    assert limiter.acquired == executor.stats()["batches"] + executor.stats()["retries"]
+
+
+def test_get_embeddings_shares_executor_per_provider(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    monkeypatch.setattr(rag_pipeline, "EMBEDDING_CACHE", False)
+
+    first, second = rag_pipeline.get_embeddings(), rag_pipeline.get_embeddings()
+    assert first is second
+    with httpx.Client() as client:
+        own_clients = rag_pipeline.get_embeddings(http_client=client)
+    assert own_clients is not first
+    assert (own_clients.limiter, own_clients._pool) == (first.limiter, first._pool)
+
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:10/v1")
+    assert rag_pipeline.get_embeddings().limiter is not first.limiter
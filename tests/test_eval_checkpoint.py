@@ -0,0 +1,75 @@
+# tests/test_eval_checkpoint.py
+
+import mlflow
+import pytest
+from mlflow.tracking import MlflowClient
+
+from app.eval_checkpoint import EvalCheckpoint, question_id
+from app.eval_engine import evaluate_dataset
+from tests.test_eval_engine import SlowChain, LengthGrader
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def tracking(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    mlflow.set_experiment("eval_checkpoint_test")
+    yield MlflowClient()
+    mlflow.end_run()
+
+
+def run_eval(checkpoint, dataset, fail_at=None):
+    def log_result(result):
+        if result["index"] == fail_at:
+            # El proceso muere a mitad de la run hija: queda huérfana
+            mlflow.start_run(run_name=f"q{result['index']}", nested=True)
+            raise Interrupted()
+        with mlflow.start_run(run_name=f"q{result['index']}", nested=True) as run:
+            mlflow.set_tag("question_id", question_id(result["question"]))
+            mlflow.log_metric("score", result["grades"]["g"]["score"])
+        checkpoint.mark_done(result["question"], run.info.run_id)
+
+    with checkpoint.parent_run("eval_test"):
+        evaluated = evaluate_dataset(SlowChain(), dataset, {"g": LengthGrader("g")}, max_concurrency=2,
+                                     on_result=log_result, indices=checkpoint.pending_indices(dataset))
+        checkpoint.mark_finished()
+    return evaluated
+
+
+def test_resume_skips_completed_and_reuses_parent(tmp_path, tracking):
+    dataset = [{"question": f"pregunta {i}", "answer": f"PREGUNTA {i}"} for i in range(6)]
+    config = {"prompt_version": "v1", "chunk_size": 512}
+
+    with pytest.raises(Interrupted):
+        run_eval(EvalCheckpoint(config, checkpoint_dir=str(tmp_path)), dataset, fail_at=3)
+    mlflow.end_run()
+
+    checkpoint = EvalCheckpoint(config, checkpoint_dir=str(tmp_path))
+    first_parent = checkpoint.parent_run_id
+    assert len(checkpoint.completed) == 3
+    assert checkpoint.pending_indices(dataset) == [3, 4, 5]
+
+    evaluated = run_eval(checkpoint, dataset)
+    assert [r["index"] for r in evaluated] == [3, 4, 5]
+    assert checkpoint.parent_run_id == first_parent
+
+    parents = tracking.search_runs([mlflow.get_experiment_by_name("eval_checkpoint_test").experiment_id],
+                                   filter_string="tags.config_hash != ''")
+    assert len(parents) == 1
+    children = tracking.search_runs([parents[0].info.experiment_id],
+                                    filter_string=f"tags.mlflow.parentRunId = '{first_parent}'")
+    assert sorted(r.info.run_name for r in children) == [f"q{i}" for i in range(6)]
+
+    # Una configuración terminada empieza una run padre nueva
+    assert EvalCheckpoint(config, checkpoint_dir=str(tmp_path)).parent_run_id is None
+
+
+def test_config_change_does_not_resume(tmp_path):
+    first = EvalCheckpoint({"chunk_size": 512}, checkpoint_dir=str(tmp_path))
+    first.mark_done("pregunta", "run-1")
+    assert EvalCheckpoint({"chunk_size": 512}, checkpoint_dir=str(tmp_path)).completed
+    assert not EvalCheckpoint({"chunk_size": 256}, checkpoint_dir=str(tmp_path)).completed
+    assert not EvalCheckpoint({"chunk_size": 512}, checkpoint_dir=str(tmp_path), resume=False).completed
@@ -0,0 +1,78 @@
+# tests/test_eval_engine.py
+
+import time
+import random
+import threading
+
+import httpx
+import openai
+
+from app import eval_engine
+from app.eval_engine import evaluate_dataset, rate_limited_call
+from app.rate_limit import RateLimiter
+
+
+class SlowChain:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def invoke(self, inputs, config=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(random.uniform(0, 0.02))
+        with self.lock:
+            self.in_flight -= 1
+        return {"answer": inputs["question"].upper()}
+
+
+class LengthGrader:
+    def __init__(self, name):
+        self.name = name
+
+    def evaluate_strings(self, input, prediction, reference):
+        time.sleep(random.uniform(0, 0.01))
+        return {"score": int(prediction == reference), "reasoning": self.name}
+
+
+def test_results_arrive_in_dataset_order():
+    dataset = [{"question": f"pregunta {i}", "answer": f"PREGUNTA {i}" if i % 2 else "otra"} for i in range(12)]
+    chain = SlowChain()
+    evaluators = {"b": LengthGrader("b"), "a": LengthGrader("a")}
+    emitted = []
+
+    results = evaluate_dataset(chain, dataset, evaluators, max_concurrency=4, on_result=emitted.append)
+
+    assert [r["index"] for r in emitted] == list(range(12))
+    assert emitted == results
+    assert chain.max_in_flight <= 4
+    for r in results:
+        assert list(r["grades"]) == ["b", "a"]
+        assert r["answer"] == r["question"].upper()
+        assert r["grades"]["a"]["score"] == r["index"] % 2
+        assert r["stages"]["grading_latency"] == max(g["latency"] for g in r["grades"].values())
+        assert r["stages"]["grading_llm_calls"] == 2
+
+
+class CountingLimiter(RateLimiter):
+    acquired = 0
+
+    def acquire(self, tokens=0):
+        self.acquired += 1
+
+
+def test_retries_take_rate_limit_budget(monkeypatch):
+    limiter = CountingLimiter()
+    monkeypatch.setitem(eval_engine._limiters, "prueba", limiter)
+    calls = []
+
+    def flaky(question):
+        calls.append(question)
+        if len(calls) == 1:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "http://proveedor/v1/chat"))
+        return question.upper()
+
+    assert rate_limited_call(flaky, "hola", provider="prueba", tokens=10) == "HOLA"
+    assert limiter.acquired == len(calls) == 2
@@ -0,0 +1,52 @@
+# tests/test_eval_summary.py
+
+import mlflow
+import pytest
+from mlflow.tracking import MlflowClient
+
+from app.eval_summary import CONFIG_FILTER, aggregate_metrics, log_config_summary, load_results
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    monkeypatch.chdir(tmp_path)
+    mlflow.set_experiment("eval_summary_test")
+    return MlflowClient()
+
+
+def records(n=10):
+    return [
+        {"index": i, "question": f"pregunta {i}", "latency": float(i + 1),
+         "qa_is_correct": i % 2, "correctness_score": 1, "avg_criteria_score": i / (n - 1)}
+        for i in reversed(range(n))
+    ]
+
+
+def test_aggregates():
+    import pandas as pd
+
+    metrics = aggregate_metrics(pd.DataFrame(records()), ["qa_is_correct", "correctness_score", "missing"],
+                                pass_column="avg_criteria_score", pass_threshold=0.5)
+    assert metrics["n_questions"] == 10
+    assert metrics["qa_is_correct"] == 0.5
+    assert metrics["correctness_score"] == 1
+    assert "missing" not in metrics
+    assert metrics["pass_rate"] == 0.5
+    assert metrics["latency_p50"] == 5.5
+    assert metrics["latency_p50"] <= metrics["latency_p95"] <= metrics["latency_p99"] <= 10
+
+
+def test_parent_run_holds_aggregates_and_parquet(client):
+    with mlflow.start_run(run_name="config", tags={"eval_level": "config"}) as parent:
+        pass
+    log_config_summary(parent.info.run_id, records(), ["qa_is_correct"], pass_column="qa_is_correct",
+                       client=client)
+
+    [run] = client.search_runs([parent.info.experiment_id], filter_string=CONFIG_FILTER)
+    assert run.data.metrics["qa_is_correct"] == 0.5
+    assert run.data.metrics["pass_rate"] == 0.5
+
+    df = load_results(client, parent.info.run_id)
+    assert df["index"].tolist() == list(range(10))
+    assert df.loc[3, "question"] == "pregunta 3"
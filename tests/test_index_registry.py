@@ -0,0 +1,65 @@
+# tests/test_index_registry.py
+
+import os
+import time
+import socket
+import sys
+import threading
+import subprocess
+
+from app.index_registry import _BuildLock
+
+
+def write_lock(path, owner, age=0):
+    path.write_text(owner)
+    past = time.time() - age
+    os.utime(path, (past, past))
+
+
+def acquired_within(lock, seconds):
+    done = threading.Event()
+
+    def acquire():
+        with lock:
+            done.set()
+
+    thread = threading.Thread(target=acquire, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    return done.is_set()
+
+
+def test_live_builder_keeps_its_lock_past_the_timeout(tmp_path):
+    path = tmp_path / "indice.lock"
+    # Construcción de más de LOCK_TIMEOUT de un proceso vivo (este)
+    write_lock(path, f"{socket.gethostname()} {os.getpid()}", age=7200)
+    assert not acquired_within(_BuildLock(str(path), timeout=1, poll=0.05), 0.5)
+    os.remove(path)
+
+
+def test_dead_builder_lock_is_taken_over(tmp_path):
+    path = tmp_path / "indice.lock"
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    write_lock(path, f"{socket.gethostname()} {dead.pid}")
+    assert acquired_within(_BuildLock(str(path), poll=0.05), 2)
+    assert not path.exists()
+
+
+def test_other_hosts_rely_on_the_heartbeat(tmp_path):
+    path = tmp_path / "indice.lock"
+    write_lock(path, "otro-host 4242")
+    assert not acquired_within(_BuildLock(str(path), timeout=60, poll=0.05), 0.3)
+    write_lock(path, "otro-host 4242", age=120)
+    assert acquired_within(_BuildLock(str(path), timeout=60, poll=0.05), 2)
+
+
+def test_holder_refreshes_the_lock_while_building(tmp_path):
+    path = tmp_path / "indice.lock"
+    with _BuildLock(str(path), timeout=4):
+        assert path.read_text() == f"{socket.gethostname()} {os.getpid()}"
+        past = time.time() - 3600
+        os.utime(path, (past, past))
+        time.sleep(1.3)
+        assert time.time() - os.path.getmtime(path) < 2
+    assert not path.exists()
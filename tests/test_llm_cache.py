@@ -0,0 +1,69 @@
+# tests/test_llm_cache.py
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.llm_cache import SQLiteLLMCache
+
+
+class CountingChatModel(FakeListChatModel):
+    n_calls: int = 0
+
+    @property
+    def _identifying_params(self):
+        # Mismo modelo para la caché aunque cambien las respuestas simuladas
+        return {"model_name": "fake", "temperature": 0}
+
+    def _call(self, *args, **kwargs):
+        self.n_calls += 1
+        return super()._call(*args, **kwargs)
+
+
+def test_repeated_prompt_is_served_from_cache(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "llm.sqlite"))
+    llm = CountingChatModel(responses=["uno", "dos", "tres"], cache=cache)
+
+    assert llm.invoke("pregunta").content == "uno"
+    assert llm.invoke("pregunta").content == "uno"
+    assert llm.invoke("otra pregunta").content == "dos"
+    assert llm.n_calls == 2
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+    # La caché persiste entre procesos
+    reopened = SQLiteLLMCache(str(tmp_path / "llm.sqlite"))
+    llm2 = CountingChatModel(responses=["nuevo"], cache=reopened)
+    assert llm2.invoke("pregunta").content == "uno"
+    assert llm2.n_calls == 0
+
+
+def test_bypass_forces_call_and_refreshes_entry(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    CountingChatModel(responses=["viejo"], cache=SQLiteLLMCache(path)).invoke("p")
+
+    llm = CountingChatModel(responses=["nuevo"], cache=SQLiteLLMCache(path, bypass=True))
+    assert llm.invoke("p").content == "nuevo"
+    assert llm.n_calls == 1
+
+    fresh = CountingChatModel(responses=["otro"], cache=SQLiteLLMCache(path))
+    assert fresh.invoke("p").content == "nuevo"
+
+
+def test_ttl_and_lru_eviction(tmp_path):
+    expired = SQLiteLLMCache(str(tmp_path / "ttl.sqlite"), ttl=-1)
+    expired.update("p", "m", [])
+    assert expired.lookup("p", "m") is None
+
+    cache = SQLiteLLMCache(str(tmp_path / "lru.sqlite"), max_entries=2)
+    llm = CountingChatModel(responses=["a", "b", "c"], cache=cache)
+    llm.invoke("1")
+    llm.invoke("2")
+    llm.invoke("1")
+    llm.invoke("3")
+    assert cache.lookup(*_key_of(llm, "2")) is None
+    assert cache.lookup(*_key_of(llm, "1")) is not None
+
+
+def _key_of(llm, text):
+    from langchain_core.load import dumps
+    from langchain_core.messages import HumanMessage
+
+    return dumps([HumanMessage(content=text)]), llm._get_llm_string()
@@ -0,0 +1,105 @@
+# tests/test_micro_batch.py
+
+import asyncio
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.micro_batch import (
+    MicroBatcher, BatchingRetriever, InflightCoalescer, close_batching, coalesce_key, search_batch,
+)
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return super().embed_documents(texts)
+
+
+def test_batcher_groups_concurrent_calls_and_dedups():
+    seen = []
+    batcher = MicroBatcher(lambda items: seen.append(list(items)) or [item * 2 for item in items],
+                           window_ms=50, max_batch=100)
+    barrier = threading.Barrier(8)
+
+    def call(item):
+        barrier.wait()
+        return batcher(item)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(call, [1, 2, 3, 1, 2, 3, 4, 4]))
+
+    assert results == [2, 4, 6, 2, 4, 6, 8, 8]
+    assert sorted(item for batch in seen for item in batch) == [1, 2, 3, 4]
+    assert batcher.stats()["requests"] == 8
+
+
+def test_close_stops_collector_and_pool_after_pending_items():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], window_ms=200, max_batch=100)
+    pending = [batcher.submit(i) for i in range(5)]
+
+    batcher.close()
+
+    assert [future.result(timeout=1) for future in pending] == [0, 2, 4, 6, 8]
+    assert not batcher._collector.is_alive()
+    assert batcher._pool._shutdown
+    # Después de cerrar se sigue respondiendo, sin lotes
+    assert batcher(7) == 14
+    assert batcher.stats()["requests"] == 5
+    batcher.close()
+
+
+def test_batched_search_matches_single_queries():
+    texts = [f"Resolución CREG {i} sobre tarifas de energía" for i in range(50)]
+    embeddings = CountingEmbeddings(size=16)
+    vectordb = FAISS.from_texts(texts, embeddings)
+    queries = ["tarifas CREG 7", "resolución 12", "energía 30"]
+
+    expected = [[doc.page_content for doc in vectordb.similarity_search(q, k=3)] for q in queries]
+    embeddings.calls = 0
+    batched = search_batch(vectordb, queries, k=3)
+
+    assert [[doc.page_content for doc in docs] for docs in batched] == expected
+    assert embeddings.calls == 1
+
+    retriever = BatchingRetriever(vectordb, k=3, window_ms=20)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        docs = list(pool.map(retriever.invoke, queries))
+    assert [[doc.page_content for doc in d] for d in docs] == expected
+
+    close_batching(SimpleNamespace(retriever=retriever))
+    assert not retriever.batcher._collector.is_alive()
+
+
+def test_identical_inflight_questions_share_one_generation():
+    generations = []
+
+    def start():
+        generations.append(1)
+
+        async def tokens():
+            for token in ["La ", "CREG ", "regula."]:
+                await asyncio.sleep(0.01)
+                yield token
+        return tokens(), {"n": len(generations)}
+
+    async def ask(coalescer, question):
+        shared, leader = coalescer.join(coalesce_key(question, []), start)
+        return "".join([token async for token in shared.subscribe()]), leader
+
+    async def main():
+        coalescer = InflightCoalescer()
+        answers = await asyncio.gather(ask(coalescer, "¿Qué regula?"), ask(coalescer, "  ¿qué  REGULA? "),
+                                       ask(coalescer, "Otra pregunta"))
+        return answers, coalescer.stats
+
+    answers, stats = asyncio.run(main())
+    assert [answer for answer, _ in answers] == ["La CREG regula."] * 3
+    assert [leader for _, leader in answers] == [True, False, True]
+    assert len(generations) == 2
+    assert stats == {"requests": 3, "coalesced": 1}
@@ -0,0 +1,96 @@
+# tests/test_mlflow_buffer.py
+
+import mlflow
+import pytest
+from mlflow.tracking import MlflowClient
+
+from app.mlflow_buffer import buffered_run, flush_pending, BufferedRun
+
+
+class CountingClient(MlflowClient):
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+        self.uploads = 0
+
+    def log_batch(self, *args, **kwargs):
+        self.batches += 1
+        return super().log_batch(*args, **kwargs)
+
+    def log_artifacts(self, *args, **kwargs):
+        self.uploads += 1
+        return super().log_artifacts(*args, **kwargs)
+
+
+@pytest.fixture
+def experiment_id(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    monkeypatch.chdir(tmp_path)
+    return mlflow.set_experiment("buffer_test").experiment_id
+
+
+def test_run_is_written_in_one_batch_and_one_upload(experiment_id):
+    client = CountingClient()
+    parent = client.create_run(experiment_id, run_name="padre")
+
+    with buffered_run("hija", parent_run_id=parent.info.run_id, tags={"question_id": "q1"},
+                      client=client) as run:
+        run.log_param("prompt_version", "v1")
+        for i in range(9):
+            run.log_metric(f"m{i}", i)
+        run.log_text("razonamiento", "reasoning/correctness_reasoning.txt")
+        run.log_text("pregunta", "question.txt")
+
+    assert client.batches == 1
+    assert client.uploads == 1
+    stored = client.get_run(run.run_id)
+    assert stored.info.status == "FINISHED"
+    assert stored.data.params == {"prompt_version": "v1"}
+    assert stored.data.metrics["m8"] == 8
+    assert stored.data.tags["mlflow.parentRunId"] == parent.info.run_id
+    artifacts = {a.path for a in client.list_artifacts(run.run_id)}
+    assert artifacts == {"question.txt", "reasoning"}
+
+
+def test_large_runs_are_split_and_pending_buffers_flush_at_exit(experiment_id):
+    client = CountingClient()
+    run_id = client.create_run(experiment_id).info.run_id
+    buffered = BufferedRun(run_id, client, owns_run=True)
+    for i in range(1500):
+        buffered.log_metric(f"m{i}", i)
+
+    flush_pending()
+
+    assert client.batches == 2
+    stored = client.get_run(run_id)
+    assert len(stored.data.metrics) == 1500
+    assert stored.info.status == "FAILED"
+    # Nada pendiente: un segundo vaciado no vuelve a escribir
+    flush_pending()
+    assert client.batches == 2
+
+
+def test_runs_we_do_not_own_are_only_flushed_at_exit(experiment_id):
+    client = CountingClient()
+    with mlflow.start_run() as parent:
+        buffered = BufferedRun(parent.info.run_id, client)
+        buffered.log_metric("accuracy", 0.5)
+        flush_pending()
+
+        stored = client.get_run(parent.info.run_id)
+        assert stored.data.metrics["accuracy"] == 0.5
+        assert stored.info.status == "RUNNING"
+        # La run abierta con start_run no queda pendiente tras el vaciado
+        flush_pending()
+        assert client.batches == 1
+
+
+def test_owned_run_without_logs_still_fails_at_exit(experiment_id):
+    client = CountingClient()
+    run_id = client.create_run(experiment_id).info.run_id
+    BufferedRun(run_id, client, owns_run=True)
+
+    flush_pending()
+
+    assert client.get_run(run_id).info.status == "FAILED"
+    assert client.batches == 0
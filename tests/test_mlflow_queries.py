@@ -0,0 +1,63 @@
+# tests/test_mlflow_queries.py
+
+import mlflow
+import pytest
+from mlflow.tracking import MlflowClient
+
+from app import mlflow_queries
+from app.mlflow_queries import config_runs, list_experiments, run_metrics, runs_frame
+
+
+class CountingClient(MlflowClient):
+    def __init__(self):
+        super().__init__()
+        self.pages = 0
+
+    def search_runs(self, *args, max_results=1000, **kwargs):
+        if max_results > 1:
+            self.pages += 1
+        return super().search_runs(*args, max_results=max_results, **kwargs)
+
+
+@pytest.fixture
+def experiment_id(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    monkeypatch.setattr(mlflow_queries, "SEARCH_PAGE_SIZE", 2)
+    mlflow_queries.clear_cache()
+    experiment_id = mlflow.set_experiment("eval_queries_test").experiment_id
+    for i in range(5):
+        with mlflow.start_run(run_name=f"cfg{i}", tags={"eval_level": "config"}):
+            mlflow.log_params({"prompt_version": f"v{i % 2}", "chunk_size": 256 * (i + 1)})
+            mlflow.log_metrics({"avg_criteria_score": i / 4, "n_questions": 10})
+    with mlflow.start_run(run_name="pregunta", tags={"eval_level": "question"}):
+        mlflow.log_metric("qa_is_correct", 1)
+    yield experiment_id
+    mlflow_queries.clear_cache()
+
+
+def test_paged_typed_frame(experiment_id):
+    client = CountingClient()
+    df = config_runs(experiment_id, client)
+
+    assert client.pages == 3
+    assert df["run_name"].tolist() == [f"cfg{i}" for i in reversed(range(5))]
+    assert df["params.chunk_size"].dtype.kind == "i"
+    assert df["params.prompt_version"].tolist()[0] == "v0"
+    assert df["metrics.avg_criteria_score"].dtype == "float64"
+    assert "metrics.qa_is_correct" not in df.columns
+    assert run_metrics(df.iloc[0]) == {"avg_criteria_score": 1.0, "n_questions": 10.0}
+    assert [exp.name for exp in list_experiments("eval_queries", client)] == ["eval_queries_test"]
+
+
+def test_cache_is_invalidated_by_new_runs(experiment_id):
+    client = CountingClient()
+    first = runs_frame(experiment_id, client=client)
+    pages = client.pages
+    assert runs_frame(experiment_id, client=client) is first
+    assert client.pages == pages
+
+    with mlflow.start_run(run_name="nueva"):
+        mlflow.log_metric("avg_criteria_score", 0.9)
+    refreshed = runs_frame(experiment_id, client=client)
+    assert client.pages > pages
+    assert len(refreshed) == len(first) + 1
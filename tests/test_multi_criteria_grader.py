@@ -0,0 +1,29 @@
+# tests/test_multi_criteria_grader.py
+
+import json
+
+from langchain_core.language_models import FakeListChatModel
+
+from app.multi_criteria_grader import MultiCriteriaGrader, parse_grades
+
+CRITERIA = {"correctness": "¿Es correcta?", "conciseness": "¿Es concisa?"}
+
+
+def test_parse_grades_accepts_fenced_json_and_skips_invalid():
+    text = '```json\n{"correctness": {"reasoning": "Coincide", "score": 1}, "conciseness": {"score": "talvez"}}\n```'
+    grades = parse_grades(text, list(CRITERIA))
+    assert grades == {"correctness": {"score": 1, "reasoning": "Coincide", "value": "Y"}}
+    assert parse_grades("no es json", list(CRITERIA)) == {}
+
+
+def test_single_call_with_per_criterion_fallback():
+    combined = json.dumps({"correctness": {"reasoning": "Coincide con la referencia", "score": 1}})
+    llm = FakeListChatModel(responses=[combined, "Es demasiado extensa.\nN"])
+    grader = MultiCriteriaGrader(llm, CRITERIA)
+
+    result = grader.evaluate_strings(prediction="respuesta", reference="referencia", input="pregunta")
+
+    assert result["criteria"]["correctness"]["score"] == 1
+    assert result["criteria"]["conciseness"]["score"] == 0
+    assert result["fallback"] == ["conciseness"]
+    assert result["llm_calls"] == 2
@@ -0,0 +1,56 @@
+# tests/test_resources.py
+
+import os
+import threading
+
+import pytest
+
+from app import resources
+from app.resources import index_signature
+
+
+def test_signature_changes_with_any_index_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        index_signature(str(tmp_path))
+
+    for name in ("index.faiss", "index.pkl", "serving.json", "manifest.json"):
+        (tmp_path / name).write_text("v1")
+    signature = index_signature(str(tmp_path))
+    assert index_signature(str(tmp_path)) == signature
+
+    # Reconstrucción que solo cambia el docstore o los archivos de servicio
+    for name in ("index.pkl", "serving.json"):
+        (tmp_path / name).write_text(f"v2 {name}")
+        os.utime(tmp_path / name, ns=(1, 1))
+        assert index_signature(str(tmp_path)) != signature
+        signature = index_signature(str(tmp_path))
+
+
+def test_replaced_chain_is_closed_outside_the_lock(monkeypatch):
+    signatures = iter(["v1", "v2"])
+    monkeypatch.setattr(resources, "_chains", {})
+    monkeypatch.setattr(resources, "index_signature", lambda persist_path: next(signatures))
+    monkeypatch.setattr(resources, "get_vectorstore", lambda persist_path: None)
+    monkeypatch.setattr(resources, "build_chain", lambda vectordb, **kwargs: object())
+    closed = []
+
+    def lock_is_free():
+        if resources._lock.acquire(timeout=1):
+            resources._lock.release()
+            return True
+        return False
+
+    def close_batching(chain):
+        # Otra sesión debe poder tomar el bloqueo mientras se cierra la cadena vieja
+        free = []
+        other = threading.Thread(target=lambda: free.append(lock_is_free()))
+        other.start()
+        other.join()
+        closed.append((chain, free[0]))
+
+    monkeypatch.setattr(resources, "close_batching", close_batching)
+    first = resources.get_chain(persist_path="vs")
+    second = resources.get_chain(persist_path="vs")
+
+    assert second is not first
+    assert closed == [(first, True)]
@@ -3,6 +3,8 @@
 import mlflow
 import pytest
 
+from app.eval_summary import CONFIG_FILTER
+
 def test_relevancia_minima():
     client = mlflow.tracking.MlflowClient()
     experiments = [e for e in client.search_experiments() if e.name.startswith("eval_")]
@@ -10,10 +12,11 @@ def test_relevancia_minima():
     assert experiments, "No hay experimentos con nombre 'eval_'"
 
     for exp in experiments:
-        runs = client.search_runs(experiment_ids=[exp.experiment_id])
+        # Runs padre por configuración: lc_is_correct ya es el promedio de sus preguntas
+        runs = client.search_runs(experiment_ids=[exp.experiment_id], filter_string=CONFIG_FILTER)
         assert runs, f"No hay ejecuciones en el experimento {exp.name}"
 
-        scores = [r.data.metrics.get("lc_is_correct", 0) for r in runs if "lc_is_correct" in r.data.metrics]
+        scores = [r.data.metrics["lc_is_correct"] for r in runs if "lc_is_correct" in r.data.metrics]
         if scores:
             promedio = sum(scores) / len(scores)
             print(f"Precisión promedio en {exp.name}: {promedio:.2f}")
@@ -0,0 +1,72 @@
+# tests/test_run_sweep.py
+
+import mlflow
+import pytest
+from mlflow.tracking import MlflowClient
+
+from app import run_sweep
+from app.eval_engine import CRITERIA_DEFINITIONS
+from app.eval_summary import CONFIG_FILTER, QUESTION_FILTER
+
+
+class PromptChain:
+    """Responde bien solo con el prompt v1 y k >= 4."""
+
+    def __init__(self, prompt_version, k):
+        self.good = prompt_version == "v1" and k >= 4
+
+    def invoke(self, inputs, config=None):
+        return {"answer": inputs["question"].upper() if self.good else "no sé"}
+
+
+class ExactGrader:
+    def evaluate_strings(self, input, prediction, reference):
+        return {"score": int(prediction == reference), "reasoning": "ok"}
+
+
+class CriteriaGrader:
+    def evaluate_strings(self, input, prediction, reference):
+        score = int(prediction == reference)
+        return {"criteria": {name: {"score": score, "reasoning": "ok"} for name in CRITERIA_DEFINITIONS},
+                "llm_calls": 1, "fallback": []}
+
+
+@pytest.fixture
+def tracking(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_sweep, "build_chain",
+                        lambda vectordb, prompt_version, k, model: PromptChain(prompt_version, k))
+    monkeypatch.setattr(run_sweep, "make_checkpoint",
+                        lambda config, index_path, dataset_path, script="run_sweep": run_sweep.EvalCheckpoint(
+                            {"config": config, "script": script}, checkpoint_dir=str(tmp_path / "checkpoints")))
+    mlflow.set_experiment("sweep_eval_test")
+    return MlflowClient()
+
+
+def test_expand_grid_fills_defaults_and_dedups():
+    configs = run_sweep.expand_grid({"prompt_version": ["v1", "v2"], "chunk_size": [512, 1024, 512], "k": [4]})
+    assert len(configs) == 4
+    assert {c["chunk_overlap"] for c in configs} == {run_sweep.default_grid()["chunk_overlap"][0]}
+    with pytest.raises(ValueError):
+        run_sweep.expand_grid({"temperature": [0]})
+
+
+def test_sweep_logs_one_parent_per_config(tracking):
+    dataset = [{"question": f"pregunta {i}", "answer": f"PREGUNTA {i}"} for i in range(5)]
+    configs = run_sweep.expand_grid({"prompt_version": ["v1", "v2"], "chunk_size": [512], "k": [2, 4]})
+    indices = {(512, configs[0]["chunk_overlap"]): (None, "registry/x")}
+    evaluators = {"qa": ExactGrader(), "criteria": CriteriaGrader()}
+
+    results = run_sweep.run_sweep(configs, dataset, evaluators, indices, max_parallel=3, max_concurrency=2)
+
+    scores = {(c["prompt_version"], c["k"]): summary["avg_criteria_score"] for c, summary in results}
+    assert scores == {("v1", 2): 0.0, ("v1", 4): 1.0, ("v2", 2): 0.0, ("v2", 4): 0.0}
+
+    experiment_id = mlflow.get_experiment_by_name("sweep_eval_test").experiment_id
+    parents = tracking.search_runs([experiment_id], filter_string=CONFIG_FILTER)
+    assert sorted(run.info.run_name for run in parents) == sorted(run_sweep.config_name(c) for c in configs)
+    assert all(run.data.metrics["n_questions"] == 5 for run in parents)
+    children = tracking.search_runs([experiment_id], filter_string=QUESTION_FILTER)
+    assert len(children) == 20
+    assert {run.data.params["k"] for run in children} == {"2", "4"}
@@ -0,0 +1,157 @@
+# tests/test_semantic_cache.py
+
+import os
+import shutil
+import asyncio
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from app import rag_pipeline, semantic_cache
+from app.rag_pipeline import save_vectorstore, list_pdfs, DATA_DIR
+from app.semantic_cache import SemanticAnswerCache
+from app.tracing import StageTracer
+
+KEYWORDS = ("015", "distribución", "tarifas", "transmisión")
+
+
+class KeywordEmbeddings(Embeddings):
+    """Paráfrasis con las mismas palabras clave tienen el mismo vector."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        text = text.lower()
+        return [float(keyword in text) for keyword in KEYWORDS] + [0.1]
+
+
+def make_chain(monkeypatch, replies, texts=("Resolución CREG 015: metodología de distribución",
+                                            "Tarifas de transmisión")):
+    llm = GenericFakeChatModel(messages=iter([AIMessage(reply) for reply in replies]))
+    monkeypatch.setattr(rag_pipeline, "ChatOpenAI", lambda **kwargs: llm)
+    vectordb = InMemoryVectorStore.from_texts(list(texts), KeywordEmbeddings())
+    return rag_pipeline.build_chain(vectordb, k=1)
+
+
+def ask(chain, question, cache, chat_history=()):
+    tracer = StageTracer()
+    answer = "".join(rag_pipeline.stream_answer(
+        chain, {"question": question, "chat_history": list(chat_history)}, tracer, cache))
+    return answer, tracer.metrics()
+
+
+def test_paraphrase_is_served_from_cache(monkeypatch, tmp_path):
+    cache = SemanticAnswerCache("vectorstore", path=str(tmp_path / "semantic.sqlite"), audit_rate=0.0)
+    # Una sola respuesta simulada: una segunda generación fallaría
+    chain = make_chain(monkeypatch, ["La metodología de distribución."])
+
+    first, _ = ask(chain, "¿Qué regula la Resolución CREG 015?", cache)
+    second, metrics = ask(chain, "¿De qué trata la resolución 015 de la CREG?", cache)
+
+    assert first == second == "La metodología de distribución."
+    assert "generation_latency" not in metrics
+    assert metrics["total_latency"] == metrics["cache_latency"]
+    stats = cache.stats()
+    assert (stats["lookups"], stats["hits"], stats["entries"]) == (2, 1, 1)
+    assert stats["hit_rate"] == 0.5
+    assert stats["latency_saved_s"] > 0
+
+
+def test_follow_ups_and_other_questions_miss(monkeypatch, tmp_path):
+    cache = SemanticAnswerCache("vectorstore", path=str(tmp_path / "semantic.sqlite"), audit_rate=0.0)
+    chain = make_chain(monkeypatch, ["Distribución.", "Transmisión.", "¿Qué regula la CREG 015?", "Otra vez."])
+
+    ask(chain, "¿Qué regula la CREG 015?", cache)
+    assert ask(chain, "¿Y las tarifas de transmisión?", cache)[0] == "Transmisión."
+    assert ask(chain, "¿Qué regula?", cache, chat_history=[("Hola", "Hola")])[0] == "Otra vez."
+    assert cache.stats()["hits"] == 0
+
+
+def test_entries_are_dropped_when_their_chunks_change(monkeypatch, tmp_path):
+    cache = SemanticAnswerCache("vectorstore", path=str(tmp_path / "semantic.sqlite"), audit_rate=0.0)
+    chain = make_chain(monkeypatch, ["Distribución.", "Distribución (nueva versión)."])
+    ask(chain, "¿Qué regula la CREG 015?", cache)
+
+    # Índice reconstruido sin el chunk que respaldaba la respuesta
+    rebuilt = make_chain(monkeypatch, ["Distribución (nueva versión)."],
+                         texts=("Resolución CREG 015 modificada: distribución", "Tarifas de transmisión"))
+    assert ask(rebuilt, "¿Qué regula la CREG 015?", cache)[0] == "Distribución (nueva versión)."
+    assert cache.stats()["stale"] == 1
+
+    removed = cache.invalidate([doc.id for doc in rebuilt.retriever.invoke("CREG 015")])
+    assert removed == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_audit_flags_hits_grounded_on_other_chunks(monkeypatch, tmp_path):
+    cache = SemanticAnswerCache("vectorstore", path=str(tmp_path / "semantic.sqlite"), audit_rate=0.0)
+    chain = make_chain(monkeypatch, [])
+    question = "¿Qué regula la CREG 015?"
+    wrong_sources = chain.retriever.invoke("tarifas de transmisión")
+    cache.store(cache.lookup(chain, {"question": question, "chat_history": []}),
+                "Respuesta sobre transmisión", wrong_sources, latency=2.0)
+
+    lookup = cache.lookup(chain, {"question": "¿qué regula la creg 015?", "chat_history": []})
+    assert lookup["hit"]["answer"] == "Respuesta sobre transmisión"
+    assert cache.audit(chain.retriever, lookup) is True
+
+    stats = cache.stats()
+    assert (stats["audits"], stats["false_hits"], stats["false_hit_rate"]) == (1, 1, 1.0)
+    assert cache.false_hits()[0]["cached_question"] == question
+
+
+def test_async_hit_returns_cached_sources(monkeypatch, tmp_path):
+    cache = SemanticAnswerCache("vectorstore", path=str(tmp_path / "semantic.sqlite"), audit_rate=0.0)
+    chain = make_chain(monkeypatch, ["La metodología de distribución."])
+
+    async def ask_async(question):
+        result = {}
+        tokens = [token async for token in rag_pipeline.astream_answer(
+            chain, {"question": question, "chat_history": []}, StageTracer(), result, cache=cache)]
+        return "".join(tokens), result
+
+    _, first = asyncio.run(ask_async("¿Qué regula la CREG 015?"))
+    answer, second = asyncio.run(ask_async("¿Qué dice la CREG 015?"))
+
+    assert answer == "La metodología de distribución."
+    assert second["cached_question"] == "¿Qué regula la CREG 015?"
+    assert [doc.id for doc in second["source_documents"]] == [doc.id for doc in chain.retriever.invoke("015")]
+    assert "cached_question" not in first
+
+
+def test_rebuild_only_invalidates_existing_answer_caches(corpus, monkeypatch, tmp_path):
+    data_dir, persist_dir = corpus
+    cache_path = tmp_path / "semantic.sqlite"
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE", True)
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_PATH", str(cache_path))
+    monkeypatch.setattr(semantic_cache, "_caches", {})
+    embeddings = DeterministicFakeEmbedding(size=16)
+    pdfs = list_pdfs(DATA_DIR)[:3]
+
+    def cached_answer(cache):
+        lookup = {"namespace": "ns", "question": "¿Qué regula?", "vector": np.ones(4, dtype=np.float32), "hit": None}
+        cache.store(lookup, "Respuesta", [Document(id="chunk", page_content="texto")], latency=1.0)
+        return cache
+
+    def add_pdf_and_rebuild(pdf, **kwargs):
+        shutil.copy(os.path.join(DATA_DIR, pdf), data_dir)
+        save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings, **kwargs)
+
+    # Índice sin respuestas guardadas: no se crea la base de la caché
+    add_pdf_and_rebuild(pdfs[0])
+    assert not cache_path.exists()
+
+    # Con respuestas del índice en la base, los chunks nuevos las invalidan
+    cache = cached_answer(SemanticAnswerCache(str(persist_dir), path=str(cache_path), audit_rate=0.0))
+    add_pdf_and_rebuild(pdfs[1])
+    assert cache.stats()["entries"] == 0
+
+    # Una caché pasada explícitamente se invalida aunque no sea la del proceso
+    other = cached_answer(SemanticAnswerCache(str(persist_dir), path=str(tmp_path / "otra.sqlite"), audit_rate=0.0))
+    add_pdf_and_rebuild(pdfs[2], answer_cache=other)
+    assert other.stats()["entries"] == 0
@@ -0,0 +1,87 @@
+# tests/test_tracing.py
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from app import rag_pipeline
+from app.tracing import StageTracer, ChatHistogram
+
+
+def fake_reply(content, prompt_tokens, completion_tokens):
+    return AIMessage(content, usage_metadata={"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                              "total_tokens": prompt_tokens + completion_tokens})
+
+
+def make_chain(monkeypatch, replies):
+    llm = GenericFakeChatModel(messages=iter(replies))
+    monkeypatch.setattr(rag_pipeline, "ChatOpenAI", lambda **kwargs: llm)
+    vectordb = InMemoryVectorStore.from_texts(["Resolución CREG 015 de 2018", "Tarifas de distribución"],
+                                              DeterministicFakeEmbedding(size=8))
+    return rag_pipeline.build_chain(vectordb, k=1)
+
+
+def test_stages_are_timed_and_tokens_split(monkeypatch):
+    chain = make_chain(monkeypatch, [fake_reply("¿Qué regula la CREG 015?", 30, 10),
+                                     fake_reply("La metodología de distribución.", 200, 20)])
+    tracer = StageTracer()
+    result = chain.invoke({"question": "¿y qué regula?", "chat_history": [("Hola", "Hola")]},
+                          config={"callbacks": [tracer]})
+
+    assert result["answer"] == "La metodología de distribución."
+    metrics = tracer.metrics()
+    assert {"retrieval_latency", "condense_latency", "generation_latency", "total_latency"} <= set(metrics)
+    assert metrics["total_latency"] >= metrics["generation_latency"]
+    assert (metrics["condense_prompt_tokens"], metrics["condense_completion_tokens"]) == (30, 10)
+    assert metrics["generation_total_tokens"] == 220
+    assert metrics["generation_llm_calls"] == 1
+
+
+def test_without_history_there_is_no_condense_stage(monkeypatch):
+    chain = make_chain(monkeypatch, [fake_reply("Respuesta", 100, 5)])
+    tracer = StageTracer()
+    chain.invoke({"question": "¿Qué regula la CREG 015?", "chat_history": []}, config={"callbacks": [tracer]})
+
+    assert not any(key.startswith("condense_") for key in tracer.metrics())
+
+
+def test_chat_histogram_keeps_a_rolling_window():
+    histogram = ChatHistogram(window=3)
+    for latency in (10.0, 1.0, 2.0, 3.0):
+        histogram.record({"generation_latency": latency, "generation_total_tokens": 100, "retrieval_latency": 0.1})
+
+    summary = histogram.percentiles()
+    assert list(summary) == ["retrieval", "generation"]
+    assert summary["generation"]["n"] == 3
+    assert summary["generation"]["p50"] == 2.0
+    assert summary["generation"]["p99"] < 10.0
+    assert summary["generation"]["tokens_mean"] == 100
+
+
+class StreamingFakeChatModel(GenericFakeChatModel):
+    streaming: bool = False
+
+
+def test_stream_answer_yields_generation_tokens_only(monkeypatch):
+    llm = StreamingFakeChatModel(messages=iter([fake_reply("¿Qué regula la CREG 015?", 30, 10),
+                                                fake_reply("La metodología de distribución.", 200, 20)]),
+                                 streaming=True)
+    monkeypatch.setattr(rag_pipeline, "ChatOpenAI", lambda **kwargs: llm)
+    vectordb = InMemoryVectorStore.from_texts(["Resolución CREG 015 de 2018"], DeterministicFakeEmbedding(size=8))
+    chain = rag_pipeline.build_chain(vectordb, k=1, streaming=True)
+    tracer = StageTracer()
+
+    tokens = list(rag_pipeline.stream_answer(
+        chain, {"question": "¿y qué regula?", "chat_history": [("Hola", "Hola")]}, tracer))
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == "La metodología de distribución."
+    metrics = tracer.metrics()
+    assert 0 < metrics["first_token_latency"] <= metrics["total_latency"]
+
+
+def test_stream_answer_falls_back_to_full_answer(monkeypatch):
+    chain = make_chain(monkeypatch, [fake_reply("Respuesta completa", 100, 5)])
+    tokens = list(rag_pipeline.stream_answer(chain, {"question": "¿Qué regula?", "chat_history": []}))
+    assert tokens == ["Respuesta completa"]
@@ -0,0 +1,61 @@
+# tests/test_tune_halving.py
+
+import mlflow
+import pytest
+from mlflow.tracking import MlflowClient
+
+from app import run_sweep, tune_halving
+from app.eval_summary import CONFIG_FILTER, QUESTION_FILTER
+from tests.test_run_sweep import PromptChain, ExactGrader, CriteriaGrader
+
+
+@pytest.fixture
+def tracking(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tune_halving, "HALVING_EXPERIMENT", "halving_eval_test")
+    monkeypatch.setattr(run_sweep, "build_chain",
+                        lambda vectordb, prompt_version, k, model: PromptChain(prompt_version, k))
+    monkeypatch.setattr(run_sweep, "make_checkpoint",
+                        lambda config, index_path, dataset_path, script="run_sweep": run_sweep.EvalCheckpoint(
+                            {"config": config, "script": script}, checkpoint_dir=str(tmp_path / "checkpoints")))
+    return MlflowClient()
+
+
+def test_stage_sizes():
+    assert tune_halving.stage_sizes(20, 4, 2) == [4, 8, 16, 20]
+    assert tune_halving.stage_sizes(3, 8, 2) == [3]
+    for initial in (0, -2):
+        with pytest.raises(ValueError):
+            tune_halving.stage_sizes(20, initial, 2)
+
+
+def test_halving_keeps_best_config_and_saves_budget(tracking):
+    dataset = [{"question": f"pregunta {i}", "answer": f"PREGUNTA {i}"} for i in range(8)]
+    configs = run_sweep.expand_grid({"prompt_version": ["v1", "v2"], "chunk_size": [512], "k": [2, 4]})
+    indices = {(512, configs[0]["chunk_overlap"]): (None, "registry/x")}
+    evaluators = {"qa": ExactGrader(), "criteria": CriteriaGrader()}
+
+    outcome = tune_halving.successive_halving(configs, dataset, evaluators, indices, initial=2, eta=2,
+                                              max_parallel=2, client=tracking)
+
+    winner, summary = outcome["ranking"][0]
+    assert (winner["prompt_version"], winner["k"]) == ("v1", 4)
+    assert summary["avg_criteria_score"] == 1.0
+    assert [len(stage["configs"]) for stage in outcome["stages"]] == [4, 2, 1]
+    assert [stage["n_questions"] for stage in outcome["stages"]] == [2, 4, 8]
+
+    # 4×2 + 2×2 + 1×4 preguntas frente a 4×8 del grid completo; 3 llamadas por pregunta (generación, QA y criterios)
+    budget = outcome["budget"]
+    assert budget["questions_evaluated"] == 16
+    assert budget["llm_calls_used"] == 48
+    assert budget["full_grid_llm_calls"] == 96
+    assert budget["llm_calls_saved_pct"] == pytest.approx(50.0)
+
+    experiment_id = mlflow.get_experiment_by_name("halving_eval_test").experiment_id
+    parents = tracking.search_runs([experiment_id], filter_string=CONFIG_FILTER)
+    assert len(parents) == 4
+    assert len(tracking.search_runs([experiment_id], filter_string=QUESTION_FILTER)) == 16
+    tuner = tracking.search_runs([experiment_id], filter_string="tags.eval_level = 'tuner'")[0]
+    assert tuner.data.metrics["llm_calls_saved"] == 48
+    assert [m.value for m in tracking.get_metric_history(tuner.info.run_id, "n_configs")] == [4, 2, 1]
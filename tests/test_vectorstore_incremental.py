@@ -0,0 +1,198 @@
+# tests/test_vectorstore_incremental.py
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app import rag_pipeline
+from app.rag_pipeline import save_vectorstore, load_vectorstore_from_disk, list_pdfs, iter_pdf_pages, DATA_DIR
+from app.index_manifest import load_manifest
+from app.index_registry import get_or_build_index
+from app.semantic_cache import SemanticAnswerCache
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    n_embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.n_embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_rebuild_incremental(corpus):
+    data_dir, persist_dir = corpus
+    first, second = list_pdfs(DATA_DIR)[:2]
+    shutil.copy(os.path.join(DATA_DIR, first), data_dir)
+
+    embeddings = CountingEmbedding(size=16)
+    vectordb = save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings)
+    n_first = len(vectordb.index_to_docstore_id)
+    assert embeddings.n_embedded == n_first
+
+    # Sin cambios: no se embebe nada
+    embeddings.n_embedded = 0
+    save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings)
+    assert embeddings.n_embedded == 0
+
+    # Un PDF nuevo: solo se embeben sus chunks
+    shutil.copy(os.path.join(DATA_DIR, second), data_dir)
+    vectordb = save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings)
+    n_second = len(load_manifest(str(persist_dir))["files"][second]["chunks"])
+    assert embeddings.n_embedded == n_second
+    assert len(vectordb.index_to_docstore_id) == n_first + n_second
+
+    # Archivo eliminado: sus vectores salen del índice
+    os.remove(data_dir / first)
+    vectordb = save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings)
+    assert len(vectordb.index_to_docstore_id) == n_second
+    assert list(load_manifest(str(persist_dir))["files"]) == [second]
+
+
+def test_registry_reuses_index(corpus):
+    data_dir, persist_dir = corpus
+    shutil.copy(os.path.join(DATA_DIR, list_pdfs(DATA_DIR)[0]), data_dir)
+
+    embeddings = CountingEmbedding(size=16)
+    _, hit = get_or_build_index(256, 20, str(data_dir), embeddings, registry_dir=str(persist_dir / "registry"))
+    assert not hit
+    n_embedded = embeddings.n_embedded
+
+    vectordb, hit = get_or_build_index(256, 20, str(data_dir), embeddings, registry_dir=str(persist_dir / "registry"))
+    assert hit
+    assert embeddings.n_embedded == n_embedded
+    assert len(vectordb.index_to_docstore_id) > 0
+
+    # Otra configuración de chunks es otra entrada del registro
+    _, hit = get_or_build_index(512, 20, str(data_dir), embeddings, registry_dir=str(persist_dir / "registry"))
+    assert not hit
+
+
+def test_mmap_load_matches_load_local(corpus):
+    data_dir, persist_dir = corpus
+    for pdf in list_pdfs(DATA_DIR)[:2]:
+        shutil.copy(os.path.join(DATA_DIR, pdf), data_dir)
+    embeddings = DeterministicFakeEmbedding(size=16)
+    save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings)
+
+    local = load_vectorstore_from_disk(str(persist_dir), embeddings=embeddings, mmap=False)
+    mapped = load_vectorstore_from_disk(str(persist_dir), embeddings=embeddings, mmap=True)
+
+    query = "garantías y pagos anticipados en el Mercado de Energía Mayorista"
+    expected = local.similarity_search_with_score(query, k=5)
+    result = mapped.similarity_search_with_score(query, k=5)
+    assert [d.page_content for d, _ in result] == [d.page_content for d, _ in expected]
+    assert [s for _, s in result] == pytest.approx([s for _, s in expected], rel=1e-4)
+    assert [d.id for d, _ in result] == [d.id for d, _ in expected]
+    assert [d.metadata for d, _ in result] == [d.metadata for d, _ in expected]
+
+    # MMR reconstruye los vectores candidatos desde el índice mapeado
+    mmr = mapped.max_marginal_relevance_search(query, k=3, fetch_k=10)
+    assert [d.id for d in mmr] == [d.id for d in local.max_marginal_relevance_search(query, k=3, fetch_k=10)]
+    np.testing.assert_array_equal(mapped.index.reconstruct_n(0, 4), local.index.reconstruct_n(0, 4))
+
+
+def test_serving_files_are_published_before_index_faiss(corpus, monkeypatch):
+    data_dir, persist_dir = corpus
+    embeddings = DeterministicFakeEmbedding(size=16)
+    events = []
+    export = rag_pipeline.export_serving_files
+    save_local = rag_pipeline.FAISS.save_local
+    monkeypatch.setattr(rag_pipeline, "export_serving_files", lambda *a: events.append("serving") or export(*a))
+    monkeypatch.setattr(rag_pipeline.FAISS, "save_local",
+                        lambda self, *a, **kw: events.append("index.faiss") or save_local(self, *a, **kw))
+
+    pdfs = list_pdfs(DATA_DIR)[:3]
+    shutil.copy(os.path.join(DATA_DIR, pdfs[0]), data_dir)
+    save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings)
+    assert events == ["serving", "index.faiss"]
+    before = load_vectorstore_from_disk(str(persist_dir), embeddings=embeddings, mmap=True)
+    n_before = before.index.ntotal
+
+    for pdf in pdfs[1:]:
+        shutil.copy(os.path.join(DATA_DIR, pdf), data_dir)
+        save_vectorstore(persist_path=str(persist_dir), data_path=str(data_dir), embeddings=embeddings)
+
+    # Quedan la versión vigente y la anterior; un proceso que ya mapeó una versión borrada sigue respondiendo
+    assert len(os.listdir(persist_dir / "serving")) == 2
+    assert len(before.similarity_search("tarifas", k=2)) == 2
+    after = load_vectorstore_from_disk(str(persist_dir), embeddings=embeddings, mmap=True)
+    local = load_vectorstore_from_disk(str(persist_dir), embeddings=embeddings, mmap=False)
+    assert after.index.ntotal == local.index.ntotal > n_before
+    assert [d.id for d in after.similarity_search("tarifas", k=3)] == \
+        [d.id for d in local.similarity_search("tarifas", k=3)]
+def test_parallel_ingestion_keeps_serial_order_and_skips_corrupt_pdfs(corpus):
+    data_dir, persist_dir = corpus
+    for pdf in list_pdfs(DATA_DIR):
+        shutil.copy(os.path.join(DATA_DIR, pdf), data_dir)
+    (data_dir / "corrupto.pdf").write_bytes(b"esto no es un PDF")
+    files = list_pdfs(str(data_dir))
+
+    def pages_by_file(workers):
+        return [(file, [page.page_content for page in pages])
+                for file, pages in iter_pdf_pages(files, str(data_dir), workers)]
+
+    serial = pages_by_file(1)
+    assert pages_by_file(2) == serial
+    assert "corrupto.pdf" not in [file for file, _ in serial]
+    assert len(serial) == len(files) - 1
+
+    embeddings = DeterministicFakeEmbedding(size=16)
+    one = save_vectorstore(persist_path=str(persist_dir / "serial"), data_path=str(data_dir),
+                           embeddings=embeddings, workers=1)
+    two = save_vectorstore(persist_path=str(persist_dir / "parallel"), data_path=str(data_dir),
+                           embeddings=embeddings, workers=2)
+    assert list(two.index_to_docstore_id.values()) == list(one.index_to_docstore_id.values())
+    assert "corrupto.pdf" not in load_manifest(str(persist_dir / "parallel"))["files"]
+
+    # Un PDF ya indexado que se corrompe sale del índice y de las respuestas cacheadas
+    manifest = load_manifest(str(persist_dir / "serial"))["files"]
+    damaged, kept = sorted(manifest)[0], sorted(manifest)[-1]
+    damaged_ids, kept_ids = manifest[damaged]["chunks"], manifest[kept]["chunks"]
+    cache = SemanticAnswerCache(str(persist_dir / "serial"), path=str(persist_dir / "semantic.sqlite"), audit_rate=0.0)
+    for question, chunk_id in (("¿Qué dice el dañado?", damaged_ids[0]), ("¿Qué dice el otro?", kept_ids[0])):
+        lookup = {"namespace": "ns", "question": question, "vector": np.ones(4, dtype=np.float32), "hit": None}
+        cache.store(lookup, "Respuesta", [Document(id=chunk_id, page_content="texto")], latency=1.0)
+    (data_dir / damaged).write_bytes(b"ya no es un PDF")
+
+    rebuilt = save_vectorstore(persist_path=str(persist_dir / "serial"), data_path=str(data_dir),
+                               embeddings=embeddings, workers=1, answer_cache=cache)
+    assert damaged not in load_manifest(str(persist_dir / "serial"))["files"]
+    assert set(rebuilt.index_to_docstore_id.values()).isdisjoint(damaged_ids)
+    assert set(kept_ids) <= set(rebuilt.index_to_docstore_id.values())
+    assert cache.stats()["entries"] == 1
+
+
+def test_streamed_batches_build_the_same_index_with_bounded_batches(corpus, monkeypatch):
+    data_dir, persist_dir = corpus
+    for pdf in list_pdfs(DATA_DIR)[:2]:
+        shutil.copy(os.path.join(DATA_DIR, pdf), data_dir)
+
+    events = []
+    load_pdf = rag_pipeline.load_pdf
+    monkeypatch.setattr(rag_pipeline, "load_pdf", lambda path: events.append("load") or load_pdf(path))
+
+    class RecordingEmbedding(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            events.append(len(texts))
+            return super().embed_documents(texts)
+
+    embeddings = RecordingEmbedding(size=16)
+    single = save_vectorstore(persist_path=str(persist_dir / "single"), data_path=str(data_dir),
+                              embeddings=embeddings, workers=1, batch_size=100_000)
+    events.clear()
+    streamed = save_vectorstore(persist_path=str(persist_dir / "streamed"), data_path=str(data_dir),
+                                embeddings=embeddings, workers=1, batch_size=8)
+
+    assert list(streamed.index_to_docstore_id.values()) == list(single.index_to_docstore_id.values())
+    np.testing.assert_array_equal(streamed.index.reconstruct_n(0, streamed.index.ntotal),
+                                  single.index.reconstruct_n(0, single.index.ntotal))
+    # Cada llamada embebe a lo sumo batch_size chunks y el primer lote sale antes de leer el último PDF
+    batches = [event for event in events if event != "load"]
+    assert max(batches) <= 8 and len(batches) > 1
+    first_embed = next(i for i, event in enumerate(events) if event != "load")
+    last_load = max(i for i, event in enumerate(events) if event == "load")
+    assert first_embed < last_load